@@ -0,0 +1,330 @@
+# core/cache.py
+# In-process TTL response cache with ETag support and single-flight
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Iterable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from .config import settings
+
+try:
+    import orjson
+except ImportError:  # optional; fall back to the standard library encoder
+    orjson = None
+
+
+class CacheEntry:
+    """A cached, already-encoded response body."""
+    
+    __slots__ = ("body", "etag", "expires_at")
+    
+    def __init__(self, body: bytes, etag: str, expires_at: float):
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+
+
+class _Flight:
+    """A computation in progress that concurrent misses wait on."""
+    
+    __slots__ = ("event", "entry", "error")
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.entry: Optional[CacheEntry] = None
+        self.error: Optional[BaseException] = None
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of encoded responses with per-entry TTLs.
+    
+    Entries are keyed by request path, query string and the current
+    generation of each topic the response depends on. Writers call
+    ``bump(topic)`` so later reads miss instead of serving stale data.
+    Concurrent misses for the same key are coalesced: one caller
+    computes the response while the others wait for its result.
+    """
+    
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._inflight = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.not_modified = 0
+        
+    def bump(self, topic: str) -> None:
+        """Invalidate all cached responses that depend on ``topic``."""
+        with self._lock:
+            self._generations[topic] = self._generations.get(topic, 0) + 1
+            
+    def make_key(self, path: str, query: str, topics: Iterable[str]) -> str:
+        """Build a cache key from the request and topic generations."""
+        generations = ",".join(
+            f"{topic}:{self._generations.get(topic, 0)}" for topic in sorted(topics)
+        )
+        return f"{path}?{query}#{generations}"
+        
+    def get_or_compute(
+        self,
+        key: str,
+        ttl: float,
+        compute: Callable[[], bytes]
+    ) -> CacheEntry:
+        """
+        Return the cached entry for ``key``, computing it on a miss.
+        
+        Args:
+            key: Cache key from make_key
+            ttl: Time to live in seconds for a newly computed entry
+            compute: Callable returning the encoded response body
+            
+        Returns:
+            The cached or freshly computed entry
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+                
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._inflight[key] = flight
+                self.misses += 1
+            else:
+                self.coalesced += 1
+                
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.entry
+            
+        try:
+            body = compute()
+            etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+            entry = CacheEntry(body, etag, time.monotonic() + ttl)
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            flight.entry = entry
+            return entry
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+            
+    def record_not_modified(self) -> None:
+        """Count a request answered with 304 Not Modified."""
+        with self._lock:
+            self.not_modified += 1
+            
+    def clear(self) -> None:
+        """Drop all cached entries."""
+        with self._lock:
+            self._entries.clear()
+            
+    def stats(self) -> dict:
+        """Return hit-ratio metrics for the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "enabled": settings.RESPONSE_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "not_modified": self.not_modified,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+                "generations": dict(self._generations),
+            }
+
+
+response_cache = ResponseCache(max_entries=settings.RESPONSE_CACHE_MAX_ENTRIES)
+
+
+class PrincipalCache:
+    """
+    Bounded LRU cache of authenticated users keyed by bearer token.
+    
+    A token string fixes both its subject and its expiry, so a hit skips
+    JWT decoding and the user-table lookup entirely. Entries live until
+    the token expires or ``ttl_seconds`` pass, whichever is first; the
+    TTL bounds staleness for user changes made outside this process.
+    Local user changes call ``clear()``. Cached users are detached from
+    any session and must be treated as read-only.
+    """
+    
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._hit_seconds = 0.0
+        self._miss_seconds = 0.0
+        
+    def get(self, token: str) -> Any:
+        """Return the cached user for ``token``, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            user, expires_at = entry
+            if expires_at <= now:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return user
+            
+    def put(self, token: str, user: Any, token_expires_at: Optional[float] = None) -> None:
+        """Cache ``user`` for ``token`` until the token or the TTL expires."""
+        expires_at = time.time() + self.ttl_seconds
+        if token_expires_at is not None:
+            expires_at = min(expires_at, token_expires_at)
+        with self._lock:
+            self._entries[token] = (user, expires_at)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                
+    def clear(self) -> None:
+        """Drop every cached principal (called when users change)."""
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+            
+    def record(self, hit: bool, seconds: float) -> None:
+        """Record one resolution and how long it took."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+                self._hit_seconds += seconds
+            else:
+                self.misses += 1
+                self._miss_seconds += seconds
+                
+    def stats(self) -> dict:
+        """Return hit-rate and time-saved metrics."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            avg_hit = self._hit_seconds / self.hits if self.hits else 0.0
+            avg_miss = self._miss_seconds / self.misses if self.misses else 0.0
+            saved = max(avg_miss - avg_hit, 0.0) if self.hits and self.misses else 0.0
+            return {
+                "enabled": settings.PRINCIPAL_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "avg_hit_us": round(avg_hit * 1e6, 1),
+                "avg_miss_us": round(avg_miss * 1e6, 1),
+                "saved_per_request_us": round(saved * 1e6, 1),
+                "time_saved_ms": round(saved * self.hits * 1000, 1),
+            }
+
+
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
+
+def _encode_default(value: Any) -> Any:
+    """Fallback for values the fast encoder does not handle natively."""
+    if isinstance(value, float):
+        return float(value)  # float subclasses such as numpy.float64
+    if isinstance(value, int):
+        return int(value)
+    return jsonable_encoder(value)
+
+
+def encode_json(data: Any) -> bytes:
+    """
+    Encode a response payload to compact JSON bytes.
+    
+    Plain dicts, lists, numbers, strings and datetimes are encoded
+    directly (with orjson when installed); anything else, such as
+    Pydantic models, goes through FastAPI's jsonable_encoder.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_encode_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_encode_default, separators=(",", ":")).encode("utf-8")
+
+
+def json_response(data: Any) -> Response:
+    """Build a JSON response from trusted, already-shaped data (no validation)."""
+    return Response(content=encode_json(data), media_type="application/json")
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag."""
+    if not if_none_match:
+        return False
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def cached_response(
+    request: Request,
+    topics: Iterable[str],
+    compute: Callable[[], Any],
+    ttl: Optional[float] = None
+) -> Response:
+    """
+    Serve a JSON response through the response cache.
+    
+    Args:
+        request: Incoming request (path and query string form the key)
+        topics: Topics whose writes invalidate this response
+        compute: Callable returning the JSON-serializable payload
+        ttl: Optional TTL in seconds (defaults to RESPONSE_CACHE_TTL_SECONDS)
+        
+    Returns:
+        200 response with an ETag, or 304 if If-None-Match matches
+    """
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return json_response(compute())
+        
+    key = response_cache.make_key(request.url.path, request.url.query, topics)
+    entry = response_cache.get_or_compute(
+        key,
+        settings.RESPONSE_CACHE_TTL_SECONDS if ttl is None else ttl,
+        lambda: encode_json(compute())
+    )
+    
+    headers = {"ETag": entry.etag, "Cache-Control": "private, no-cache"}
+    if _etag_matches(request.headers.get("if-none-match"), entry.etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -16,6 +16,18 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Password hashing - bcrypt runs on a bounded executor; changing rounds rehashes on next login
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_PROCESSES: bool = False
+    
+    # Login throttling - per username
+    LOGIN_MAX_FAILURES: int = 5
+    LOGIN_FAILURE_WINDOW_SECONDS: float = 300.0
+    LOGIN_LOCKOUT_SECONDS: float = 60.0
+    LOGIN_MAX_CONCURRENT_PER_USER: int = 2
+    
     # Agent API Key
     AGENT_API_KEY: str = "your-agent-api-key-here"
     
@@ -27,7 +39,112 @@ class Settings(BaseSettings):
     
     # CORS - Allow all origins for development (including file:// protocol)
     CORS_ORIGINS: str = "*"
-
+    
+    # Startup - trust app_metadata to skip schema introspection and seeding checks on restart
+    STARTUP_FAST: bool = True
+    
+    # Metrics - Prometheus text format on /metrics (optionally behind a bearer token)
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: Optional[str] = None
+    
+    # SQL query profiler - per-request counts/timing, Server-Timing header, slow query EXPLAIN
+    QUERY_PROFILER_ENABLED: bool = True
+    QUERY_SLOW_MS: float = 200.0
+    QUERY_EXPLAIN_SLOW: bool = True
+    QUERY_BUDGET_ENFORCE: bool = False
+    
+    # Sampling profiler - per request (X-Profile: 1 or ?_profile=1, authenticated) or a random share of requests
+    SAMPLING_PROFILER_ENABLED: bool = True
+    SAMPLING_PROFILER_RATE: float = 0.0
+    SAMPLING_PROFILER_INTERVAL_MS: float = 5.0
+    SAMPLING_PROFILER_MAX_SECONDS: float = 30.0
+    SAMPLING_PROFILER_MAX_CONCURRENT: int = 4
+    SAMPLING_PROFILER_KEEP: int = 50
+    SAMPLING_PROFILER_DIR: str = "./profiles"
+    
+    # Activity rollups - serve /api/activity/stats from pre-aggregated buckets
+    ACTIVITY_ROLLUPS_ENABLED: bool = True
+    
+    # Activity full-text search - FTS5 (SQLite) or GIN (PostgreSQL); disabling drops the index, enabling rebuilds it
+    ACTIVITY_SEARCH_ENABLED: bool = True
+    ACTIVITY_SEARCH_MAX_LIMIT: int = 500
+    
+    # Activity log string encoding - in-process cache of app/type/user lookup ids (entries per kind)
+    ACTIVITY_INTERN_CACHE_MAX_ENTRIES: int = 50000
+    
+    # Response cache for dashboard read endpoints
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_TTL_SECONDS: float = 5.0
+    RESPONSE_CACHE_MAX_ENTRIES: int = 256
+    
+    # Principal cache - reuse the resolved user for repeated bearer tokens
+    PRINCIPAL_CACHE_ENABLED: bool = True
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 1024
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 60.0
+    
+    # Server-Sent Events stream
+    EVENT_STREAM_QUEUE_SIZE: int = 256
+    EVENT_STREAM_KEEPALIVE_SECONDS: float = 15.0
+    EVENT_STREAM_RETRY_MS: int = 5000
+    
+    # Dashboard summary - run independent sections in parallel (PostgreSQL only)
+    DASHBOARD_CONCURRENT_QUERIES: bool = True
+    
+    # Activity log retention - archive and delete rows older than RETENTION_DAYS
+    RETENTION_ENABLED: bool = False
+    RETENTION_DAYS: int = 90
+    RETENTION_ARCHIVE_DIR: str = "./archive"
+    RETENTION_CHUNK_SIZE: int = 5000
+    RETENTION_CHUNK_PAUSE_SECONDS: float = 0.05
+    RETENTION_INTERVAL_SECONDS: int = 3600
+    
+    # Activity time series
+    TIMESERIES_MAX_POINTS: int = 1500
+    TIMESERIES_MAX_SERIES: int = 20
+    TIMESERIES_CACHE_GRACE_SECONDS: int = 30  # buckets are cached this long after they end (late commits)
+    TIMESERIES_CACHE_MAX_CELLS: int = 200000  # cached (bucket, series) values across all ranges
+    
+    # Agent risk trend analytics
+    ANALYTICS_WINDOW_DAYS: int = 30
+    ANALYTICS_MAX_DAYS: int = 90  # memory and response size grow with agents x days x 24
+    ANALYTICS_EWMA_ALPHA: float = 0.1
+    ANALYTICS_ZSCORE_WINDOW_HOURS: int = 24
+    ANALYTICS_CACHE_TTL_SECONDS: float = 60.0
+    
+    # Streaming per-agent risk anomaly detection
+    ANOMALY_DETECTION_ENABLED: bool = True
+    ANOMALY_ZSCORE_THRESHOLD: float = 4.0
+    ANOMALY_MIN_SAMPLES: int = 30
+    ANOMALY_MIN_STDDEV: float = 0.25
+    ANOMALY_MIN_DELTA: float = 2.0
+    ANOMALY_EWMA_ALPHA: float = 0.05
+    ANOMALY_ALERT_COOLDOWN_SECONDS: float = 300.0
+    ANOMALY_PERSIST_INTERVAL_SECONDS: float = 30.0
+    
+    # Alert deduplication - repeats per (agent, alert_type) within the window update the open alert
+    ALERT_DEDUP_WINDOW_SECONDS: float = 600.0
+    
+    # Alert rule engine - built-in high-risk rules, optional JSON rules file, plus rules in the DB
+    ALERT_RULES_BUILTIN: bool = True
+    ALERT_RULES_FILE: Optional[str] = None
+    
+    # Ingest rate limiting - token buckets per agent name and per API key or client address (keys may be shared by a fleet)
+    INGEST_RATE_LIMIT_ENABLED: bool = True
+    INGEST_RATE_PER_SECOND: float = 20.0
+    INGEST_BURST: int = 100
+    INGEST_KEY_RATE_PER_SECOND: float = 500.0
+    INGEST_KEY_BURST: int = 2000
+    INGEST_RATE_MAX_KEYS: int = 10000
+    
+    # Ingest load shedding - drop low-risk events first when too many requests are in flight
+    INGEST_SHEDDING_ENABLED: bool = True
+    INGEST_MAX_IN_FLIGHT: int = 32
+    INGEST_SHED_LOW_FRACTION: float = 0.5
+    INGEST_SHED_MEDIUM_FRACTION: float = 0.8
+    
+    # Agent offline detection - raise agent_offline when an agent is silent for the timeout
+    AGENT_OFFLINE_ENABLED: bool = True
+    AGENT_OFFLINE_TIMEOUT_SECONDS: float = 300.0
 
     
     model_config = SettingsConfigDict(
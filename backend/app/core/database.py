@@ -1,7 +1,12 @@
 # core/database.py
 # Database configuration and session management
 
-from sqlalchemy import create_engine
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import create_engine, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings, is_postgresql
@@ -38,26 +43,178 @@ def get_db():
         db.close()
 
 
-def init_db():
+def insert_on_conflict(table):
+    """
+    Return a dialect-specific INSERT that supports ``on_conflict_do_update``.
+    
+    Args:
+        table: Table to insert into
+        
+    Returns:
+        PostgreSQL or SQLite Insert construct
+    """
+    if is_postgresql():
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def init_db() -> bool:
     """
     Initialize database tables.
     Called on application startup.
+    
+    With STARTUP_FAST the schema is only synchronized (``create_all`` and
+    the missing column/index checks) when the models' fingerprint differs
+    from the one recorded in app_metadata, so a restart does no schema
+    introspection. Set STARTUP_FAST=false to force a full check.
+    
+    Returns:
+        True if the schema was synchronized, False if it was up to date
     """
     # Import all models to ensure they are registered
-    from app.models import user, agent, activity_log, alert
+    from app.models import user, agent, activity_log, activity_lookup, alert, activity_rollup, alert_counter, agent_risk_baseline, alert_rule, app_metadata
+    from app.services.storage_service import migrate_activity_logs
+    fingerprint = schema_fingerprint()
+    if settings.STARTUP_FAST and get_app_metadata("schema_fingerprint") == fingerprint:
+        return False
+        
+    drop_views()
+    migrate_activity_logs()
     Base.metadata.create_all(bind=engine)
+    ensure_columns()
+    ensure_indexes()
+    create_views()
+    set_app_metadata("schema_fingerprint", fingerprint)
+    return True
+
+
+def schema_fingerprint() -> str:
+    """Hash of every table, column, index and view the models declare."""
+    lines = []
+    for table in sorted(Base.metadata.tables.values(), key=lambda t: t.name):
+        lines.append(f"table {table.name}")
+        for column in table.columns:
+            default = column.server_default.arg if column.server_default is not None else None
+            lines.append(f"column {column.name} {column.type!r} nullable={column.nullable} default={default}")
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            lines.append(f"index {index.name} {[c.name for c in index.columns]} unique={index.unique}")
+    for name, sql in sorted(Base.metadata.info.get("views", {}).items()):
+        lines.append(f"view {name} {' '.join(sql.split())}")
+    return hashlib.sha256("\n".join(lines).encode("utf-8")).hexdigest()[:16]
+
+
+def get_app_metadata(key: str) -> Optional[str]:
+    """
+    Read a value from the app_metadata table.
+    
+    Returns:
+        The stored value, or None if unset or the table does not exist yet
+    """
+    from app.models.app_metadata import AppMetadata
+    
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(AppMetadata.value).where(AppMetadata.key == key)).scalar()
+    except SQLAlchemyError:
+        return None
+
+
+def set_app_metadata(key: str, value: str) -> None:
+    """Insert or replace a value in the app_metadata table."""
+    from app.models.app_metadata import AppMetadata
+    
+    now = datetime.utcnow()
+    statement = insert_on_conflict(AppMetadata.__table__).values(key=key, value=value, updated_at=now)
+    statement = statement.on_conflict_do_update(
+        index_elements=["key"],
+        set_={"value": value, "updated_at": now}
+    )
+    with engine.begin() as conn:
+        conn.execute(statement)
+
+
+def ensure_columns():
+    """
+    Add model columns missing from existing tables.
+    
+    ``create_all`` never alters existing tables, so nullable columns or
+    columns with a ``server_default`` that were added to a model later
+    are added here with ``ALTER TABLE ... ADD COLUMN``.
+    """
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            with engine.begin() as conn:
+                conn.execute(text(ddl))
+            print(f"Added column {table.name}.{column.name}")
+
+
+def ensure_indexes():
+    """
+    Create any model indexes missing from existing tables.
+    
+    ``create_all`` only creates indexes together with new tables, so
+    indexes added to a model later are created here.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def drop_views(bind=None):
+    """
+    Drop the views the models declare (``Base.metadata.info["views"]``).
+    
+    Views are dropped before the tables they read are altered and
+    created again afterwards by create_views.
+    
+    Args:
+        bind: Engine to use (defaults to the app's engine)
+    """
+    with (bind or engine).begin() as conn:
+        for name in Base.metadata.info.get("views", {}):
+            conn.execute(text(f"DROP VIEW IF EXISTS {name}"))
+
+
+def create_views(bind=None):
+    """Create the views the models declare from their current SQL."""
+    with (bind or engine).begin() as conn:
+        for name, sql in Base.metadata.info.get("views", {}).items():
+            conn.execute(text(f"DROP VIEW IF EXISTS {name}"))
+            conn.execute(text(sql))
 
 
 def init_default_data():
     """
     Initialize default data.
     Called after database tables are created.
+    
+    Once seeding has completed it is recorded in app_metadata and, with
+    STARTUP_FAST, skipped on later starts. Delete the
+    ``default_data_seeded`` row to seed again.
     """
+    if settings.STARTUP_FAST and get_app_metadata("default_data_seeded"):
+        return
+        
     from app.models.user import User
     from app.models.agent import Agent
     from app.models.activity_log import ActivityLog
     from app.models.alert import Alert
+    from app.models.activity_rollup import ActivityRollup
     from app.core.security import get_password_hash
+    from app.services.alert_service import adjust_alert_counter
+    from app.services.rollup_service import record_activity
     from datetime import datetime, timedelta
     import random
     
@@ -92,7 +249,9 @@ def init_default_data():
         agent = db.query(Agent).filter(Agent.name == "default-agent").first()
         if agent:
             # Check if we already have sample data
-            existing_logs = db.query(ActivityLog).count()
+            # Only whether a few rows exist matters, so count at most 5
+            # rather than scanning the whole table
+            existing_logs = db.query(ActivityLog.id).limit(5).count()
             if existing_logs < 5:
                 sample_activities = [
                     ("chrome.exe", "Browser Activity", "User accessed work portal", "low", 15.5),
@@ -107,6 +266,9 @@ def init_default_data():
                     ("cmd.exe", "System Activity", "Command prompt opened", "high", 72.8),
                 ]
                 
+                # Rollups that already exist are kept current; empty ones are
+                # backfilled from all rows on startup (ensure_rollups)
+                rollups_exist = db.query(ActivityRollup.id).first() is not None
                 for i, (app, activity_type, desc, risk_level, risk_score) in enumerate(sample_activities):
                     # Create timestamps spread over last 24 hours
                     timestamp = datetime.utcnow() - timedelta(hours=random.randint(1, 24), minutes=random.randint(0, 59))
@@ -122,11 +284,13 @@ def init_default_data():
                         timestamp=timestamp
                     )
                     db.add(log)
+                    if rollups_exist:
+                        record_activity(db, log)
                 
                 print(f"Created {len(sample_activities)} sample activity logs")
         
         # Create sample alerts for demo purposes
-        existing_alerts = db.query(Alert).count()
+        existing_alerts = db.query(Alert.id).limit(3).count()
         if existing_alerts < 3:
             sample_alerts = [
                 ("suspicious_activity", "High risk activity detected on workstation", "high", False),
@@ -152,10 +316,12 @@ def init_default_data():
                     created_at=created_at
                 )
                 db.add(alert)
+                adjust_alert_counter(db, severity, is_resolved, 1)
             
             print(f"Created {len(sample_alerts)} sample alerts")
         
         db.commit()
+        set_app_metadata("default_data_seeded", datetime.utcnow().isoformat())
         print("Sample data initialization complete!")
         
     except Exception as e:
@@ -0,0 +1,114 @@
+# core/events.py
+# In-process fan-out broker for Server-Sent Events
+
+import asyncio
+import itertools
+import threading
+from typing import Any, Optional
+
+from .cache import encode_json
+from .config import settings
+
+
+class Subscriber:
+    """
+    A connected stream client with a bounded queue of encoded events.
+    
+    The queue lives on the subscriber's event loop. When a slow client
+    lets it fill up, the backlog is discarded and replaced with a single
+    ``resync`` event so the client reloads its state instead of the
+    broker buffering without bound.
+    """
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.dropped = 0
+        
+    def deliver(self, message: str) -> None:
+        """Enqueue an encoded event (must run on the subscriber's loop)."""
+        if self.queue.full():
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(format_event("resync", {"dropped": self.dropped}))
+        self.queue.put_nowait(message)
+
+
+class EventBroker:
+    """
+    Fans out committed changes to all connected stream subscribers.
+    
+    ``publish`` may be called from any thread (sync routes run in the
+    threadpool); delivery is handed to each subscriber's event loop with
+    ``call_soon_threadsafe``, so publishing never blocks on a client.
+    """
+    
+    def __init__(self, max_queue: int = 256):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.published = 0
+        
+    def subscribe(self) -> Subscriber:
+        """Register a subscriber on the running event loop."""
+        subscriber = Subscriber(asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+        
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Remove a subscriber."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            
+    @property
+    def has_subscribers(self) -> bool:
+        """Whether any stream is connected; check it before building a costly payload."""
+        return bool(self._subscribers)
+        
+    def publish(self, event_type: str, data: Any) -> None:
+        """
+        Publish an event to every subscriber.
+        
+        Args:
+            event_type: SSE event name (activity, alert, ...)
+            data: JSON-serializable payload
+        """
+        if not self._subscribers:
+            return
+            
+        message = format_event(event_type, data, next(self._ids))
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+            
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.deliver, message)
+            except RuntimeError:
+                # Event loop already closed; the stream is gone
+                self.unsubscribe(subscriber)
+                
+    def stats(self) -> dict:
+        """Return broker metrics."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            "subscribers": len(subscribers),
+            "published": self.published,
+            "dropped": sum(s.dropped for s in subscribers),
+            "queued": sum(s.queue.qsize() for s in subscribers),
+        }
+
+
+def format_event(event_type: str, data: Any, event_id: Optional[int] = None) -> str:
+    """Encode an event in text/event-stream format."""
+    payload = encode_json(data).decode("utf-8")
+    if event_id is None:
+        return f"event: {event_type}\ndata: {payload}\n\n"
+    return f"id: {event_id}\nevent: {event_type}\ndata: {payload}\n\n"
+
+
+event_broker = EventBroker(max_queue=settings.EVENT_STREAM_QUEUE_SIZE)
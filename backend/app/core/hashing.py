@@ -0,0 +1,260 @@
+# core/hashing.py
+# Bounded password hashing executor and per-user login throttling
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from .config import settings
+from .security import pwd_context
+
+
+def _hash_password(password: str) -> str:
+    """Hash a password (runs on the hashing executor)."""
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password and return a new hash if the stored one is outdated."""
+    return pwd_context.verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated executor instead of the request pool.
+    
+    Login and register await the executor, so a burst of logins occupies
+    at most ``workers`` cores and never the threadpool that serves sync
+    routes such as ingest. bcrypt releases the GIL, so threads are enough
+    by default; ``use_processes`` moves hashing to a process pool. At most
+    ``max_pending`` hashes may be queued or running; beyond that callers
+    get a 503 with Retry-After instead of an unbounded queue.
+    """
+    
+    def __init__(self, workers: int = 2, max_pending: int = 64, use_processes: bool = False):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.use_processes = use_processes
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self._wait_seconds = 0.0
+        self._run_seconds = 0.0
+        
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.use_processes:
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(
+                            max_workers=self.workers, thread_name_prefix="password-hash"
+                        )
+        return self._executor
+        
+    async def _submit(self, func, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Authentication is busy, please retry",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        queued = time.perf_counter()
+        
+        def timed():
+            started = time.perf_counter()
+            return started, func(*args), time.perf_counter()
+            
+        try:
+            if self.use_processes:
+                started = time.perf_counter()
+                result = await asyncio.get_running_loop().run_in_executor(self._get_executor(), func, *args)
+                finished = time.perf_counter()
+            else:
+                started, result, finished = await asyncio.get_running_loop().run_in_executor(
+                    self._get_executor(), timed
+                )
+        finally:
+            with self._lock:
+                self._pending -= 1
+        with self._lock:
+            self.completed += 1
+            self._wait_seconds += started - queued
+            self._run_seconds += finished - started
+        return result
+        
+    async def hash(self, password: str) -> str:
+        """Hash a password on the hashing executor."""
+        return await self._submit(_hash_password, password)
+        
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password on the hashing executor.
+        
+        Args:
+            password: Plain password
+            hashed: Stored hash
+            
+        Returns:
+            (valid, new_hash) - new_hash is set when the stored hash uses
+            outdated CryptContext parameters and should be replaced
+        """
+        valid, new_hash = await self._submit(_verify_and_update, password, hashed)
+        if new_hash:
+            with self._lock:
+                self.rehashed += 1
+        return valid, new_hash
+        
+    def shutdown(self) -> None:
+        """Stop the executor (waits for running hashes)."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+            
+    def stats(self) -> dict:
+        """Return executor queue and latency metrics."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "use_processes": self.use_processes,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "avg_wait_ms": round(self._wait_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+                "avg_hash_ms": round(self._run_seconds / self.completed * 1000, 2) if self.completed else 0.0,
+            }
+
+
+class LoginThrottle:
+    """
+    Per-username login throttling.
+    
+    A username with ``max_failures`` failed attempts inside ``window_seconds``
+    is locked for ``lockout_seconds``, and each username may have at most
+    ``max_concurrent`` verifications in flight. Throttled attempts are
+    rejected before any hashing work is queued. Tracked usernames are
+    kept in a bounded LRU so spraying random names cannot grow memory.
+    """
+    
+    def __init__(
+        self,
+        max_failures: int = 5,
+        window_seconds: float = 300.0,
+        lockout_seconds: float = 60.0,
+        max_concurrent: int = 2,
+        max_entries: int = 10000
+    ):
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.lockout_seconds = lockout_seconds
+        self.max_concurrent = max_concurrent
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, list]" = OrderedDict()  # username -> [failures, window_start, locked_until, in_flight]
+        self._lock = threading.Lock()
+        self.throttled = 0
+        self.lockouts = 0
+        
+    def _entry(self, username: str, now: float) -> list:
+        entry = self._entries.get(username)
+        if entry is None:
+            entry = [0, now, 0.0, 0]
+            self._entries[username] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        else:
+            self._entries.move_to_end(username)
+        if now - entry[1] > self.window_seconds:
+            entry[0] = 0
+            entry[1] = now
+        return entry
+        
+    def acquire(self, username: str) -> None:
+        """
+        Reserve a login attempt for ``username``.
+        
+        Raises:
+            HTTPException: 429 with Retry-After if the user is locked out
+            or already has too many attempts in flight
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entry(username, now)
+            retry_after = None
+            if entry[2] > now:
+                retry_after = entry[2] - now
+            elif entry[3] >= self.max_concurrent:
+                retry_after = 1
+            if retry_after is not None:
+                self.throttled += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many login attempts, please retry later",
+                    headers={"Retry-After": str(max(int(retry_after + 0.999), 1))},
+                )
+            entry[3] += 1
+            
+    def release(self, username: str, success: Optional[bool]) -> None:
+        """
+        Finish an attempt started with ``acquire`` and record its outcome.
+        
+        ``success`` is None when the attempt failed before the password
+        was checked (hasher overloaded, database error); it frees the
+        slot without counting as a failure.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entry(username, now)
+            entry[3] = max(entry[3] - 1, 0)
+            if success is None:
+                return
+            if success:
+                entry[0] = 0
+                entry[2] = 0.0
+                return
+            entry[0] += 1
+            if entry[0] >= self.max_failures:
+                entry[0] = 0
+                entry[1] = now
+                entry[2] = now + self.lockout_seconds
+                self.lockouts += 1
+                
+    def stats(self) -> dict:
+        """Return throttling metrics."""
+        now = time.time()
+        with self._lock:
+            return {
+                "tracked_users": len(self._entries),
+                "locked_users": sum(1 for entry in self._entries.values() if entry[2] > now),
+                "throttled": self.throttled,
+                "lockouts": self.lockouts,
+                "max_failures": self.max_failures,
+                "lockout_seconds": self.lockout_seconds,
+            }
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    use_processes=settings.PASSWORD_HASH_PROCESSES
+)
+login_throttle = LoginThrottle(
+    max_failures=settings.LOGIN_MAX_FAILURES,
+    window_seconds=settings.LOGIN_FAILURE_WINDOW_SECONDS,
+    lockout_seconds=settings.LOGIN_LOCKOUT_SECONDS,
+    max_concurrent=settings.LOGIN_MAX_CONCURRENT_PER_USER
+)
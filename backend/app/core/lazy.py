@@ -0,0 +1,50 @@
+# core/lazy.py
+# Deferred imports for heavy optional-path modules
+
+import importlib
+import threading
+from types import ModuleType
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+    
+    Used for heavy modules that only some endpoints need (e.g. numpy for
+    the analytics routes), so importing the app does not pay for them.
+    Annotations that name the module must be strings.
+    """
+    
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+        
+    def _load(self) -> ModuleType:
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+        return self._module
+        
+    def __getattr__(self, attr: str):
+        module = self._module
+        if module is None:
+            module = self._load()
+        return getattr(module, attr)
+        
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule '{self._name}' ({state})>"
+
+
+def lazy_import(name: str) -> LazyModule:
+    """
+    Return a proxy for module ``name`` that imports it on first use.
+    
+    Args:
+        name: Absolute module name
+        
+    Returns:
+        LazyModule proxy
+    """
+    return LazyModule(name)
@@ -0,0 +1,450 @@
+# core/metrics.py
+# In-process metrics registry with Prometheus text exposition
+
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable, Tuple
+
+from sqlalchemy import event
+
+
+# Default latency buckets in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4"  # Response appends the charset
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Value:
+    """
+    A single counter or gauge sample, sharded per thread.
+    
+    Each thread adds into its own cell, so increments need no lock and
+    never lose updates; readers sum the cells at scrape time.
+    """
+    
+    __slots__ = ("_base", "_cells", "_lock")
+    
+    def __init__(self):
+        self._base = 0.0
+        self._cells = {}
+        self._lock = threading.Lock()
+        
+    def _new_cell(self, ident: int) -> list:
+        with self._lock:
+            return self._cells.setdefault(ident, [0.0])
+            
+    def inc(self, amount: float = 1.0) -> None:
+        ident = threading.get_ident()
+        cell = self._cells.get(ident)
+        if cell is None:
+            cell = self._new_cell(ident)
+        cell[0] += amount
+        
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+        
+    def set(self, value: float) -> None:
+        """Set the value (not atomic with concurrent inc/dec)."""
+        with self._lock:
+            self._base = value
+            for cell in self._cells.values():
+                cell[0] = 0.0
+                
+    @property
+    def value(self) -> float:
+        return self._base + sum(cell[0] for cell in list(self._cells.values()))
+
+
+class _HistogramValue:
+    """Bucket counts, sum and count for one label set, sharded per thread."""
+    
+    __slots__ = ("bounds", "_cells", "_lock")
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self._cells = {}  # thread id -> [bucket counts..., sum]
+        self._lock = threading.Lock()
+        
+    def observe(self, value: float) -> None:
+        ident = threading.get_ident()
+        cell = self._cells.get(ident)
+        if cell is None:
+            with self._lock:
+                cell = self._cells.setdefault(ident, [0] * (len(self.bounds) + 1) + [0.0])
+        cell[bisect_left(self.bounds, value)] += 1
+        cell[-1] += value
+        
+    def snapshot(self) -> Tuple[list, float]:
+        """Return (bucket counts, sum) summed over all threads."""
+        counts = [0] * (len(self.bounds) + 1)
+        total = 0.0
+        for cell in list(self._cells.values()):
+            for index in range(len(counts)):
+                counts[index] += cell[index]
+            total += cell[-1]
+        return counts, total
+
+
+class Metric:
+    """
+    A metric family with optional labels.
+    
+    ``labels(...)`` returns the child for a label set from a dict keyed
+    by the values exactly as passed, so a hot-path ``labels(...).inc()``
+    is one dict lookup plus a lock-free per-thread increment.
+    """
+    
+    kind = "untyped"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}  # label value strings -> child, for rendering
+        self._lookup = {}  # label values as passed -> child, for the hot path
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self.labels()
+            
+    def _new_child(self):
+        return _Value()
+        
+    def labels(self, *values):
+        """Return the child for the given label values (created on first use)."""
+        child = self._lookup.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            key = tuple(str(value) for value in values)
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+                self._lookup[values] = child
+        return child
+        
+    def collect(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class Counter(Metric):
+    kind = "counter"
+    
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+    
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+        
+    def dec(self, amount: float = 1.0) -> None:
+        self._default.dec(amount)
+        
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+        
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+        
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+        
+    def collect(self) -> Iterable[str]:
+        for values, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class CallbackMetric(Metric):
+    """
+    A metric whose samples are read at scrape time.
+    
+    ``func`` returns either a number or a list of (label values, number)
+    pairs; use it for state other components already track (pool usage,
+    cache counters) so the hot path pays nothing.
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        func: Callable,
+        labelnames: Iterable[str] = ()
+    ):
+        self.kind = kind
+        self.func = func
+        super().__init__(name, documentation, labelnames)
+        
+    def collect(self) -> Iterable[str]:
+        samples = self.func()
+        if not isinstance(samples, list):
+            samples = [((), samples)]
+        for values, value in samples:
+            yield f"{self.name}{_format_labels(self.labelnames, tuple(values))} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in the text exposition format."""
+    
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+        
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+        
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+        
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Tuple[float, ...] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+        
+    def callback(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        func: Callable,
+        labelnames: Iterable[str] = ()
+    ) -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, kind, func, labelnames))
+        
+    def render(self) -> str:
+        """Render every metric family; a failing callback is skipped."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.collect())
+            except Exception as e:
+                print(f"metrics: collecting {metric.name} failed: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# HTTP
+http_requests_total = registry.counter(
+    "http_requests_total", "HTTP requests by route template, method and status", ("method", "route", "status")
+)
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route")
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+)
+
+# Database
+db_statement_duration = registry.histogram(
+    "db_statement_duration_seconds", "Database statement execution time by statement type", ("statement",)
+)
+
+# Ingest and alerts
+ingest_events_total = registry.counter(
+    "ingest_events_total", "Agent activity events stored, by risk level", ("risk_level",)
+)
+alerts_created_total = registry.counter(
+    "alerts_created_total", "Alerts created (not deduplicated), by type and severity", ("alert_type", "severity")
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, status and in-flight requests.
+    
+    Routes are labelled with their path template (e.g.
+    ``/api/agents/{agent_id}``) so label cardinality stays bounded;
+    unmatched paths share the ``unmatched`` label. Latency is measured
+    until the response body has been sent.
+    """
+    
+    def __init__(self, app, exclude: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.exclude = set(exclude)
+        
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exclude:
+            await self.app(scope, receive, send)
+            return
+            
+        status_code = [500]
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_code[0] = message["status"]
+            await send(message)
+            
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_request_duration.labels(method, template).observe(elapsed)
+            http_requests_total.labels(method, template, status_code[0]).inc()
+
+
+def instrument_engine(engine) -> None:
+    """
+    Time every statement executed on ``engine`` and export pool usage.
+    
+    Args:
+        engine: SQLAlchemy engine
+    """
+    children = {}
+    
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+        
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        verb = statement.lstrip()[:6].upper()
+        child = children.get(verb)
+        if child is None:
+            label = verb if verb in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+            child = children.setdefault(verb, db_statement_duration.labels(label))
+        child.observe(time.perf_counter() - started)
+        
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+            
+    pool = engine.pool
+    
+    def pool_usage():
+        samples = []
+        for state, reader in (("checked_out", "checkedout"), ("idle", "checkedin"), ("size", "size"), ("overflow", "overflow")):
+            reader = getattr(pool, reader, None)
+            if reader is not None:
+                samples.append(((state,), reader()))
+        return samples
+        
+    registry.callback(
+        "db_pool_connections", "Database connection pool usage", "gauge", pool_usage, ("state",)
+    )
+
+
+def register_collectors() -> None:
+    """Export counters that core components already keep, read at scrape time."""
+    from .cache import response_cache, principal_cache
+    from .events import event_broker
+    from .hashing import password_hasher
+    from .ratelimit import ingest_limiter, ingest_key_limiter, ingest_shedder
+    
+    def cache_lookups():
+        response = response_cache.stats()
+        principal = principal_cache.stats()
+        return [
+            (("response", "hit"), response["hits"]),
+            (("response", "coalesced"), response["coalesced"]),
+            (("response", "miss"), response["misses"]),
+            (("principal", "hit"), principal["hits"]),
+            (("principal", "miss"), principal["misses"]),
+        ]
+        
+    def cache_hit_ratio():
+        return [
+            (("response",), response_cache.stats()["hit_ratio"]),
+            (("principal",), principal_cache.stats()["hit_ratio"]),
+        ]
+        
+    def ingest_rate_limited():
+        return [(("agent",), ingest_limiter.limited), (("api_key",), ingest_key_limiter.limited)]
+        
+    def ingest_shed():
+        return [((level,), count) for level, count in ingest_shedder.stats()["shed"].items()]
+        
+    registry.callback(
+        "cache_lookups_total", "Cache lookups by cache and result", "counter", cache_lookups, ("cache", "result")
+    )
+    registry.callback(
+        "cache_hit_ratio", "Cache hit ratio since start", "gauge", cache_hit_ratio, ("cache",)
+    )
+    registry.callback(
+        "ingest_rate_limited_total", "Ingest requests rejected by a rate limit bucket", "counter",
+        ingest_rate_limited, ("scope",)
+    )
+    registry.callback(
+        "ingest_shed_total", "Ingest events dropped by the overload shedder, by risk level", "counter",
+        ingest_shed, ("risk_level",)
+    )
+    registry.callback(
+        "ingest_in_flight", "Ingest requests currently admitted", "gauge",
+        lambda: ingest_shedder.stats()["in_flight"]
+    )
+    registry.callback(
+        "password_hash_pending", "Password hashes queued or running", "gauge",
+        lambda: password_hasher.stats()["pending"]
+    )
+    registry.callback(
+        "event_stream_subscribers", "Connected event stream clients", "gauge",
+        lambda: event_broker.stats()["subscribers"]
+    )
@@ -0,0 +1,222 @@
+# core/profiler.py
+# Per-request SQL query profiling, Server-Timing headers and query budgets
+
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional
+
+from sqlalchemy import event
+
+from .config import settings, is_postgresql
+
+
+class QueryProfile:
+    """Statements executed while a profile is active."""
+    
+    __slots__ = ("count", "seconds", "slow", "statements", "keep_statements", "_lock")
+    
+    def __init__(self, keep_statements: bool = False):
+        self.count = 0
+        self.seconds = 0.0
+        self.slow = 0
+        self.statements: List[str] = []
+        self.keep_statements = keep_statements
+        self._lock = threading.Lock()
+        
+    def record(self, statement: str, elapsed: float, slow: bool) -> None:
+        with self._lock:
+            self.count += 1
+            self.seconds += elapsed
+            self.slow += slow
+            if self.keep_statements:
+                self.statements.append(statement)
+
+
+# Profile for the current request; sync routes see it through the
+# context anyio copies into the threadpool
+_request_profile: ContextVar[Optional[QueryProfile]] = ContextVar("request_query_profile", default=None)
+
+# Profiles capturing every statement on the engine, from any thread (tests)
+_captures: List[QueryProfile] = []
+_captures_lock = threading.Lock()
+
+# Last EXPLAIN per statement text, so a hot slow query is explained once a minute
+_explained = {}
+EXPLAIN_INTERVAL_SECONDS = 60.0
+
+
+def query_budget(max_queries: int) -> Callable:
+    """
+    Declare how many statements a route may issue per request.
+    
+    Over-budget requests are logged, and fail with 500 when
+    QUERY_BUDGET_ENFORCE is set (intended for test runs). Apply it
+    below the router decorator::
+    
+        @router.get("/stats")
+        @query_budget(3)
+        def get_stats(...): ...
+    """
+    def decorator(func: Callable) -> Callable:
+        func.__query_budget__ = max_queries
+        return func
+    return decorator
+
+
+@contextmanager
+def capture_queries(keep_statements: bool = True):
+    """
+    Count statements executed on the engine inside the block, from any thread.
+    
+    For tests::
+    
+        with capture_queries() as profile:
+            client.get("/api/alerts/stats")
+        assert profile.count <= 2, profile.statements
+    """
+    profile = QueryProfile(keep_statements)
+    with _captures_lock:
+        _captures.append(profile)
+    try:
+        yield profile
+    finally:
+        with _captures_lock:
+            _captures.remove(profile)
+
+
+def _explain(conn, statement: str, parameters) -> Optional[str]:
+    """Return the query plan for a slow statement, or None if unavailable."""
+    now = time.monotonic()
+    if now - _explained.get(statement, -EXPLAIN_INTERVAL_SECONDS) < EXPLAIN_INTERVAL_SECONDS:
+        return None
+    _explained[statement] = now
+    if len(_explained) > 1000:
+        _explained.clear()
+        
+    # The plan runs on the request's own connection; on PostgreSQL an error
+    # aborts the whole transaction, so it is fenced off by a savepoint
+    postgresql = is_postgresql()
+    prefix = "EXPLAIN " if postgresql else "EXPLAIN QUERY PLAN "
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        if postgresql:
+            cursor.execute("SAVEPOINT profiler_explain")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = cursor.fetchall()
+        except Exception:
+            if postgresql:
+                cursor.execute("ROLLBACK TO SAVEPOINT profiler_explain")
+            raise
+        if postgresql:
+            cursor.execute("RELEASE SAVEPOINT profiler_explain")
+        return "\n".join("    " + " | ".join(str(value) for value in row) for row in plan)
+    except Exception as e:
+        return f"    (EXPLAIN failed: {e})"
+    finally:
+        cursor.close()
+
+
+def instrument_engine(engine) -> None:
+    """
+    Attach the profiler to ``engine``.
+    
+    Args:
+        engine: SQLAlchemy engine
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("profiler_started", []).append(time.perf_counter())
+        
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["profiler_started"].pop()
+        slow = elapsed * 1000 >= settings.QUERY_SLOW_MS
+        
+        profile = _request_profile.get()
+        if profile is not None:
+            profile.record(statement, elapsed, slow)
+        if _captures:
+            with _captures_lock:
+                for capture in _captures:
+                    capture.record(statement, elapsed, slow)
+                    
+        if slow:
+            print(f"Slow query ({elapsed * 1000:.1f}ms): {statement}")
+            verb = statement.lstrip()[:6].upper()
+            if settings.QUERY_EXPLAIN_SLOW and not executemany and verb in ("SELECT", "UPDATE", "DELETE"):
+                plan = _explain(conn, statement, parameters)
+                if plan:
+                    print(f"Query plan:\n{plan}")
+                    
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("profiler_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+
+
+class QueryProfilerMiddleware:
+    """
+    ASGI middleware that profiles the statements each request issues.
+    
+    Adds ``Server-Timing: db;dur=..;desc="N queries", app;dur=..`` to
+    every response (statements issued after the response starts, e.g.
+    by a streaming body, are not included) and checks the route's
+    ``query_budget``.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+            
+        profile = QueryProfile()
+        token = _request_profile.set(profile)
+        started = time.perf_counter()
+        
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                budget = getattr(getattr(scope.get("route"), "endpoint", None), "__query_budget__", None)
+                if budget is not None and profile.count > budget:
+                    print(f"Query budget exceeded: {scope['method']} {scope['path']} "
+                          f"issued {profile.count} queries (budget {budget})")
+                    if settings.QUERY_BUDGET_ENFORCE:
+                        message = {
+                            "type": "http.response.start",
+                            "status": 500,
+                            "headers": [(b"content-type", b"text/plain")],
+                        }
+                        await send(message)
+                        await send({
+                            "type": "http.response.body",
+                            "body": f"Query budget exceeded: {profile.count} > {budget}".encode(),
+                        })
+                        raise _BudgetExceeded()
+                        
+                total_ms = (time.perf_counter() - started) * 1000
+                timing = (
+                    f'db;dur={profile.seconds * 1000:.2f};desc="{profile.count} queries", '
+                    f"app;dur={total_ms:.2f}"
+                )
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode("latin-1"))
+                ]
+            await send(message)
+            
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except _BudgetExceeded:
+            pass
+        finally:
+            _request_profile.reset(token)
+
+
+class _BudgetExceeded(Exception):
+    """Stops a response whose route went over its query budget."""
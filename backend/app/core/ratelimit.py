@@ -0,0 +1,228 @@
+# core/ratelimit.py
+# In-memory token-bucket rate limiting and priority load shedding for ingest
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from typing import Iterable, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from .config import settings
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by arbitrary strings (API key, agent name, ...).
+    
+    Each bucket refills at ``rate`` tokens per second up to ``burst``.
+    Buckets are refilled lazily on access, so a check is O(1) per key with
+    no background work; idle keys are evicted LRU beyond ``max_keys``.
+    """
+    
+    def __init__(self, rate: float, burst: int, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()  # key -> [tokens, updated]
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+        
+    def _bucket(self, key: str, now: float, create: bool = True) -> list:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [float(self.burst), now]
+            if create:
+                self._buckets[key] = bucket
+                while len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+        
+    def acquire(self, keys: Iterable[str], now: Optional[float] = None) -> float:
+        """
+        Take one token from every bucket in ``keys``, all or nothing.
+        
+        Args:
+            keys: Bucket keys the request is charged to
+            now: Optional monotonic time (defaults to now)
+            
+        Returns:
+            0.0 if the request is allowed, otherwise seconds until every
+            bucket has a token again
+        """
+        return acquire_all([(self, keys)], now)
+        
+    def _wait(self, buckets: list) -> float:
+        """Seconds until every bucket in ``buckets`` has a token (0.0 if they all do)."""
+        short = max((1.0 - bucket[0] for bucket in buckets), default=0.0)
+        if short <= 0:
+            return 0.0
+        return short / self.rate if self.rate > 0 else float("inf")
+            
+    def stats(self, limit: int = 50) -> dict:
+        """Return limiter counters and the currently throttled keys."""
+        now = time.monotonic()
+        with self._lock:
+            throttled = []
+            for key, (tokens, updated) in self._buckets.items():
+                tokens = min(self.burst, tokens + (now - updated) * self.rate)
+                if tokens < 1.0:
+                    throttled.append({"key": _mask_key(key), "tokens": round(tokens, 2)})
+            return {
+                "enabled": settings.INGEST_RATE_LIMIT_ENABLED,
+                "rate_per_second": self.rate,
+                "burst": self.burst,
+                "keys": len(self._buckets),
+                "max_keys": self.max_keys,
+                "allowed": self.allowed,
+                "limited": self.limited,
+                "throttled_keys": throttled[:limit],
+            }
+
+
+def acquire_all(charges: Iterable[Tuple[TokenBucketLimiter, Iterable[str]]], now: Optional[float] = None) -> float:
+    """
+    Take one token from every bucket of several limiters, all or nothing.
+    
+    For requests charged to limiters with different rates (per agent and
+    per API key): every limiter is locked, every bucket checked, and
+    nothing is debited unless all of them have a token, so a request
+    rejected by one limiter costs nothing in the others. Buckets for new
+    keys are only stored once the request is allowed, so rejected
+    requests with made-up keys cannot evict real ones.
+    
+    Args:
+        charges: (limiter, keys) pairs the request is charged to
+        now: Optional monotonic time (defaults to now)
+        
+    Returns:
+        0.0 if the request is allowed, otherwise seconds until every
+        bucket has a token again
+    """
+    now = time.monotonic() if now is None else now
+    charges = [(limiter, list(keys)) for limiter, keys in charges]
+    # Lock in a fixed order so concurrent callers cannot deadlock
+    limiters = sorted({id(limiter): limiter for limiter, _ in charges}.values(), key=id)
+    with ExitStack() as stack:
+        for limiter in limiters:
+            stack.enter_context(limiter._lock)
+        charged = [(limiter, [limiter._bucket(key, now, create=False) for key in keys]) for limiter, keys in charges]
+        waits = [(limiter, limiter._wait(buckets)) for limiter, buckets in charged]
+        retry_after = max((wait for _, wait in waits), default=0.0)
+        if retry_after > 0:
+            for limiter, wait in waits:
+                if wait > 0:
+                    limiter.limited += 1
+            return retry_after
+        for limiter, keys in charges:
+            for key in keys:
+                limiter._bucket(key, now)[0] -= 1.0
+            limiter.allowed += 1
+        return 0.0
+
+
+def _mask_key(key: str) -> str:
+    """Hide most of an API key in limiter output."""
+    kind, _, value = key.partition(":")
+    if kind == "key" and len(value) > 4:
+        value = value[:4] + "..."
+    return f"{kind}:{value}"
+
+
+class LoadShedder:
+    """
+    Global overload protection for ingest that sheds low-risk events first.
+    
+    Tracks ingest requests in flight. Above ``low_fraction`` of
+    ``max_in_flight`` low-risk events are rejected, above
+    ``medium_fraction`` medium-risk ones too, and only at ``max_in_flight``
+    are high and critical events turned away, so the events that can raise
+    alerts keep flowing longest when the database falls behind.
+    """
+    
+    LEVELS = ("low", "medium", "high", "critical")
+    
+    def __init__(self, max_in_flight: int, low_fraction: float = 0.5, medium_fraction: float = 0.8):
+        self.max_in_flight = max_in_flight
+        self.limits = {
+            "low": max(int(max_in_flight * low_fraction), 1),
+            "medium": max(int(max_in_flight * medium_fraction), 1),
+            "high": max_in_flight,
+            "critical": max_in_flight,
+        }
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.admitted = {level: 0 for level in self.LEVELS}
+        self.shed = {level: 0 for level in self.LEVELS}
+        
+    @contextmanager
+    def admit(self, risk_level: str):
+        """
+        Hold an ingest slot for the duration of the block.
+        
+        Raises:
+            HTTPException: 503 with Retry-After if the event is shed
+        """
+        level = risk_level if risk_level in self.limits else "high"
+        with self._lock:
+            if settings.INGEST_SHEDDING_ENABLED and self.in_flight >= self.limits[level]:
+                self.shed[level] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Server overloaded, event dropped",
+                    headers={"Retry-After": "1"},
+                )
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.admitted[level] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+                
+    def stats(self) -> dict:
+        """Return in-flight, admitted and shed counts per risk level."""
+        with self._lock:
+            return {
+                "enabled": settings.INGEST_SHEDDING_ENABLED,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "limits": dict(self.limits),
+                "admitted": dict(self.admitted),
+                "shed": dict(self.shed),
+            }
+
+
+# Longest Retry-After sent; a limiter with rate 0 never refills (infinite wait)
+MAX_RETRY_AFTER_SECONDS = 3600
+
+
+def retry_after_header(seconds: float) -> dict:
+    """Build a Retry-After header (whole seconds, between 1 and MAX_RETRY_AFTER_SECONDS)."""
+    return {"Retry-After": str(max(math.ceil(min(seconds, MAX_RETRY_AFTER_SECONDS)), 1))}
+
+
+ingest_limiter = TokenBucketLimiter(
+    rate=settings.INGEST_RATE_PER_SECOND,
+    burst=settings.INGEST_BURST,
+    max_keys=settings.INGEST_RATE_MAX_KEYS
+)
+ingest_key_limiter = TokenBucketLimiter(
+    rate=settings.INGEST_KEY_RATE_PER_SECOND,
+    burst=settings.INGEST_KEY_BURST,
+    max_keys=settings.INGEST_RATE_MAX_KEYS
+)
+ingest_shedder = LoadShedder(
+    max_in_flight=settings.INGEST_MAX_IN_FLIGHT,
+    low_fraction=settings.INGEST_SHED_LOW_FRACTION,
+    medium_fraction=settings.INGEST_SHED_MEDIUM_FRACTION
+)
@@ -0,0 +1,351 @@
+# core/sampler.py
+# Opt-in statistical sampling profiler for individual requests
+
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextvars import Context, ContextVar
+from datetime import datetime
+from typing import List, Optional
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+
+from .config import settings
+
+
+# Profile of the request being handled. The sampler finds it in the
+# Context held by the frame that runs the request's code on each thread
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("sampling_profile", default=None)
+
+# Paths never profiled (profile downloads would profile themselves)
+EXCLUDED_PREFIXES = ("/api/admin/profiles", "/metrics")
+
+
+class RequestProfile:
+    """Folded stack samples collected for one request."""
+    
+    def __init__(self, method: str, path: str, trigger: str, max_seconds: float):
+        self.id = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.method = method
+        self.path = path
+        self.trigger = trigger
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.deadline = self.started + max_seconds
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.truncated = False
+        self.duration_ms = 0.0
+        self.status_code: Optional[int] = None
+        
+    def summary(self) -> dict:
+        """Metadata shown in the admin listing."""
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "trigger": self.trigger,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": round(self.duration_ms, 2),
+            "status_code": self.status_code,
+            "samples": self.samples,
+            "truncated": self.truncated,
+        }
+
+
+def _frame_label(code, cache: dict) -> str:
+    """``qualname (path:line)`` for a code object, with site-packages stripped."""
+    label = cache.get(code)
+    if label is None:
+        path = code.co_filename
+        marker = path.rfind("site-packages" + os.sep)
+        if marker >= 0:
+            path = path[marker + len("site-packages") + 1:]
+        elif path.startswith(os.getcwd()):
+            path = os.path.relpath(path)
+        label = f"{getattr(code, 'co_qualname', code.co_name)} ({path}:{code.co_firstlineno})"
+        cache[code] = label
+    return label
+
+
+def _frame_context(frame) -> Optional[Context]:
+    """
+    The Context a thread is currently running request code in, if any.
+    
+    Request code runs inside ``Context.run`` called from one of three
+    places: asyncio's ``Handle._run`` (the event loop, ``self._context``),
+    anyio's worker thread (sync routes and dependencies, local
+    ``context``) or a ``concurrent.futures`` work item submitted with
+    ``copy_context().run`` (``self.fn.__self__``). Only frames named
+    ``run``/``_run`` are inspected; the innermost match wins.
+    """
+    while frame is not None:
+        if frame.f_code.co_name in ("run", "_run"):
+            local = frame.f_locals
+            context = local.get("context")
+            if not isinstance(context, Context):
+                owner = local.get("self")
+                context = getattr(owner, "_context", None)
+                if not isinstance(context, Context):
+                    context = getattr(getattr(owner, "fn", None), "__self__", None)
+            if isinstance(context, Context):
+                return context
+        frame = frame.f_back
+    return None
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of threads running profiled requests.
+    
+    A single daemon thread wakes every ``interval`` seconds while at least
+    one profile is active and exits when the last one finishes, so there
+    is no sampling work at all when nothing is being profiled. Each
+    sample walks ``sys._current_frames()`` and attributes a thread's stack
+    to the profile found in the Context it is running, which covers the
+    event loop, the threadpool running sync routes and executors fed
+    with ``copy_context().run``. Finished profiles are written as
+    collapsed stacks (``frame;frame;frame count``), the input format of
+    flamegraph.pl and speedscope; the newest ``keep`` are listed.
+    """
+    
+    def __init__(
+        self,
+        interval: float = 0.005,
+        directory: str = "./profiles",
+        keep: int = 50,
+        max_concurrent: int = 4,
+        max_seconds: float = 30.0
+    ):
+        self.interval = interval
+        self.directory = directory
+        self.keep = keep
+        self.max_concurrent = max_concurrent
+        self.max_seconds = max_seconds
+        self._active: dict = {}
+        self._recent: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._labels: dict = {}
+        self.profiles = 0
+        self.rejected = 0
+        self.samples = 0
+        self._sampling_seconds = 0.0
+        
+    def start(self, method: str, path: str, trigger: str) -> Optional[RequestProfile]:
+        """
+        Begin profiling a request.
+        
+        Returns:
+            The profile, or None if ``max_concurrent`` profiles are running
+        """
+        profile = RequestProfile(method, path, trigger, self.max_seconds)
+        with self._lock:
+            if len(self._active) >= self.max_concurrent:
+                self.rejected += 1
+                return None
+            self._active[id(profile)] = profile
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        return profile
+        
+    def finish(self, profile: RequestProfile, status_code: Optional[int]) -> None:
+        """Stop sampling ``profile`` and write its collapsed stacks."""
+        with self._lock:
+            self._active.pop(id(profile), None)
+        profile.duration_ms = (time.perf_counter() - profile.started) * 1000
+        profile.status_code = status_code
+        
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._path(profile.id), "w") as f:
+            for stack, count in profile.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+                
+        evicted = []
+        with self._lock:
+            self.profiles += 1
+            self._recent[profile.id] = profile.summary()
+            while len(self._recent) > self.keep:
+                evicted.append(self._recent.popitem(last=False)[0])
+        for profile_id in evicted:
+            try:
+                os.remove(self._path(profile_id))
+            except OSError:
+                pass
+                
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.directory, f"{profile_id}.folded")
+        
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                active = dict(self._active)
+            started = time.perf_counter()
+            self._sample(own, active, started)
+            self._sampling_seconds += time.perf_counter() - started
+            time.sleep(self.interval)
+            
+    def _sample(self, own: int, active: dict, now: float) -> None:
+        taken = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            context = _frame_context(frame)
+            if context is None:
+                continue
+            profile = context.get(_current_profile)
+            if profile is None or active.get(id(profile)) is not profile:
+                continue
+            if now > profile.deadline:
+                profile.truncated = True
+                continue
+                
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code, self._labels))
+                frame = frame.f_back
+            labels.reverse()
+            taken.append((profile, ";".join(labels)))
+            
+        # Record under the lock so a profile that finished meanwhile is left alone
+        with self._lock:
+            for profile, stack in taken:
+                if id(profile) in self._active:
+                    profile.stacks[stack] += 1
+                    profile.samples += 1
+                    self.samples += 1
+                    
+    def list(self) -> List[dict]:
+        """Return the retained profiles, newest first."""
+        with self._lock:
+            return list(reversed(self._recent.values()))
+            
+    def read(self, profile_id: str) -> Optional[str]:
+        """Return a retained profile's collapsed stacks, or None if unknown."""
+        with self._lock:
+            if profile_id not in self._recent:
+                return None
+        try:
+            with open(self._path(profile_id)) as f:
+                return f.read()
+        except OSError:
+            return None
+            
+    def stats(self) -> dict:
+        """Return profiler counters."""
+        with self._lock:
+            return {
+                "enabled": settings.SAMPLING_PROFILER_ENABLED,
+                "rate": settings.SAMPLING_PROFILER_RATE,
+                "interval_ms": self.interval * 1000,
+                "active": len(self._active),
+                "retained": len(self._recent),
+                "profiles": self.profiles,
+                "rejected": self.rejected,
+                "samples": self.samples,
+                "sampling_ms": round(self._sampling_seconds * 1000, 2),
+                "directory": os.path.abspath(self.directory),
+            }
+
+
+def _requested(scope) -> bool:
+    """True if the request asks to be profiled (X-Profile header or ?_profile=1)."""
+    for name, value in scope["headers"]:
+        if name == b"x-profile":
+            return value.lower() in (b"1", b"true", b"yes")
+    query = scope.get("query_string", b"")
+    if b"_profile" in query:
+        values = parse_qs(query.decode("latin-1")).get("_profile", [])
+        return any(value.lower() in ("1", "true", "yes") for value in values)
+    return False
+
+
+def _authenticated(scope) -> bool:
+    """True if the request carries a bearer token for a known user."""
+    from fastapi import HTTPException
+    from .database import SessionLocal
+    from .security import resolve_user
+    
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return False
+            db = SessionLocal()
+            try:
+                resolve_user(token, db)
+                return True
+            except HTTPException:
+                return False
+            finally:
+                db.close()
+    return False
+
+
+class SamplingProfilerMiddleware:
+    """
+    ASGI middleware that profiles selected requests.
+    
+    A request is profiled when an authenticated caller sends
+    ``X-Profile: 1`` (or ``?_profile=1``), or at random with probability
+    SAMPLING_PROFILER_RATE. Profiled responses carry ``X-Profile-Id``;
+    the collapsed stacks are listed under /api/admin/profiles. Other
+    requests pay one header scan.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(EXCLUDED_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+            
+        trigger = None
+        if _requested(scope):
+            if await run_in_threadpool(_authenticated, scope):
+                trigger = "request"
+        elif settings.SAMPLING_PROFILER_RATE > 0 and random.random() < settings.SAMPLING_PROFILER_RATE:
+            trigger = "sampled"
+        profile = sampling_profiler.start(scope["method"], scope["path"], trigger) if trigger else None
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+            
+        status_code = None
+        
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message = dict(message)
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile.id.encode("latin-1"))
+                ]
+            await send(message)
+            
+        token = _current_profile.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_profile.reset(token)
+            sampling_profiler.finish(profile, status_code)
+
+
+sampling_profiler = SamplingProfiler(
+    interval=settings.SAMPLING_PROFILER_INTERVAL_MS / 1000,
+    directory=settings.SAMPLING_PROFILER_DIR,
+    keep=settings.SAMPLING_PROFILER_KEEP,
+    max_concurrent=settings.SAMPLING_PROFILER_MAX_CONCURRENT,
+    max_seconds=settings.SAMPLING_PROFILER_MAX_SECONDS
+)
@@ -1,18 +1,24 @@
   # core/security.py
 # Security utilities: JWT tokens and API key validation
 
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer, APIKeyHeader
 from sqlalchemy.orm import Session
+from .cache import principal_cache
 from .config import settings
 from .database import get_db
 
 # Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/token")
@@ -44,7 +50,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    
+        
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
@@ -75,25 +81,33 @@ def decode_token(token: str) -> dict:
         raise credentials_exception
 
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-):
+def resolve_user(token: str, db: Session):
     """
-    Get the current authenticated user from JWT token.
+    Resolve the user a JWT token belongs to.
+    
+    Repeated tokens are served from the principal cache without decoding
+    or querying. The returned user is detached from ``db`` and shared
+    between requests, so it must not be modified.
     
     Args:
-        token: JWT token from Authorization header
+        token: JWT token string
         db: Database session
         
     Returns:
-        User object
+        User object (detached)
         
     Raises:
         HTTPException: If token is invalid or user not found
     """
     from app.models.user import User
     
+    started = time.perf_counter()
+    if settings.PRINCIPAL_CACHE_ENABLED:
+        user = principal_cache.get(token)
+        if user is not None:
+            principal_cache.record(True, time.perf_counter() - started)
+            return user
+            
     payload = decode_token(token)
     username: str = payload.get("sub")
     if username is None:
@@ -102,7 +116,7 @@ async def get_current_user(
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    
+        
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise HTTPException(
@@ -110,9 +124,57 @@ async def get_current_user(
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    db.expunge(user)
+    
+    if settings.PRINCIPAL_CACHE_ENABLED:
+        principal_cache.put(token, user, payload.get("exp"))
+        principal_cache.record(False, time.perf_counter() - started)
     return user
 
 
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the current authenticated user from JWT token.
+    
+    Args:
+        token: JWT token from Authorization header
+        db: Database session
+        
+    Returns:
+        User object
+        
+    Raises:
+        HTTPException: If token is invalid or user not found
+    """
+    return resolve_user(token, db)
+
+
+def get_stream_user(token: str = Query(...)):
+    """
+    Get the authenticated user for a long-lived stream from a query token.
+    
+    Browsers' EventSource cannot send an Authorization header, so the
+    token is passed as ``?token=``. The session is closed before the
+    stream starts so a connected client does not hold a pooled connection.
+    
+    Args:
+        token: JWT token from the query string
+        
+    Returns:
+        User object (detached from its session)
+    """
+    from .database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        return resolve_user(token, db)
+    finally:
+        db.close()
+
+
 def verify_api_key(api_key: str) -> bool:
     """
     Verify an API key for agent authentication.
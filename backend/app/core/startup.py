@@ -0,0 +1,63 @@
+# core/startup.py
+# Startup phase timings
+
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+
+class StartupTimer:
+    """
+    Records how long each startup phase took.
+    
+    Phases are timed with ``phase()`` (or ``record()`` for spans measured
+    elsewhere, such as module imports) and reported once at the end of
+    startup and under /api/admin/startup.
+    """
+    
+    def __init__(self):
+        self.phases: "OrderedDict[str, float]" = OrderedDict()
+        self.notes: dict = {}
+        self.completed_at: Optional[datetime] = None
+        
+    def record(self, name: str, seconds: float, note: Optional[str] = None) -> None:
+        """Record a phase measured by the caller."""
+        self.phases[name] = seconds
+        if note:
+            self.notes[name] = note
+            
+    def note(self, name: str, note: str) -> None:
+        """Attach a short note (e.g. "skipped") to a phase."""
+        self.notes[name] = note
+        
+    @contextmanager
+    def phase(self, name: str):
+        """Time the enclosed block as phase ``name``."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+            
+    def complete(self) -> None:
+        """Mark startup finished and print a one-line summary."""
+        self.completed_at = datetime.utcnow()
+        total_ms = sum(self.phases.values()) * 1000
+        phases = ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in self.phases.items())
+        print(f"Startup complete in {total_ms:.1f}ms ({phases})")
+        
+    def report(self) -> dict:
+        """Return phase timings in milliseconds."""
+        return {
+            "completed_at": self.completed_at.isoformat() if self.completed_at else None,
+            "total_ms": round(sum(self.phases.values()) * 1000, 2),
+            "phases": [
+                {"name": name, "ms": round(seconds * 1000, 2), "note": self.notes.get(name)}
+                for name, seconds in self.phases.items()
+            ],
+        }
+
+
+startup_timer = StartupTimer()
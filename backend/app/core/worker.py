@@ -0,0 +1,39 @@
+# core/worker.py
+# Background thread that runs a job at a fixed interval
+
+import threading
+from typing import Any, Callable, Optional
+
+
+class PeriodicWorker:
+    """Background thread that runs a job periodically."""
+    
+    def __init__(self, name: str, interval_seconds: float, job: Callable[[], Any]):
+        self.name = name
+        self.interval_seconds = interval_seconds
+        self.job = job
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.last_run: Any = None
+        
+    def start(self) -> None:
+        """Start the worker thread (no-op if already running)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=self.name, daemon=True)
+        self._thread.start()
+        
+    def stop(self) -> None:
+        """Signal the worker to stop and wait briefly for it."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.last_run = self.job()
+            except Exception as e:
+                print(f"{self.name} run failed: {e}")
+            self._stop.wait(self.interval_seconds)
@@ -1,14 +1,39 @@
 # main.py
 # Main FastAPI application for Backend API
 
+import time
+
+# Taken before the framework and app imports so startup timings include them
+_import_started = time.perf_counter()
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
-from app.core.database import init_db, init_default_data
-
-from app.routes import auth_router, agents_router, activity_router, alerts_router
+from app.core.database import init_db, init_default_data, SessionLocal, engine
+from app.core.metrics import MetricsMiddleware, instrument_engine, register_collectors
+from app.core.profiler import QueryProfilerMiddleware, instrument_engine as instrument_profiler
+from app.core.sampler import SamplingProfilerMiddleware
+from app.core.hashing import password_hasher
+from app.core.startup import startup_timer
+from app.services.rollup_service import ensure_rollups
+from app.services.search_service import ensure_search_index
+from app.services.alert_service import ensure_alert_counters, open_alert_index
+from app.services.retention_service import retention_worker
+from app.services.rule_engine import load_alert_rules
+from app.services.offline_service import offline_detector
+from app.services.risk_service import anomaly_detector, anomaly_persist_worker, persist_anomaly_state
+
+from app.routes import (
+    auth_router,
+    agents_router,
+    activity_router,
+    alerts_router,
+    admin_router,
+    events_router,
+    dashboard_router,
+    metrics_router,
+)
 
 # Create FastAPI app
 app = FastAPI(
@@ -32,12 +57,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Metrics: per-route latency, DB statement timing and component counters
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    instrument_engine(engine)
+    register_collectors()
+    
+# SQL query profiler: Server-Timing headers, slow query plans, query budgets
+if settings.QUERY_PROFILER_ENABLED:
+    app.add_middleware(QueryProfilerMiddleware)
+    instrument_profiler(engine)
+    
+# Sampling profiler: collapsed-stack profiles of requested or sampled requests
+if settings.SAMPLING_PROFILER_ENABLED:
+    app.add_middleware(SamplingProfilerMiddleware)
+
 
 # Register routers
 app.include_router(auth_router)
 app.include_router(agents_router)
 app.include_router(activity_router)
 app.include_router(alerts_router)
+app.include_router(admin_router)
+app.include_router(events_router)
+app.include_router(dashboard_router)
+app.include_router(metrics_router)
+
+startup_timer.record("import", time.perf_counter() - _import_started)
 
 
 # Health check endpoint (no auth required)
@@ -65,9 +111,61 @@ def root():
 # Create tables on startup
 @app.on_event("startup")
 def startup_event():
-    """Initialize database tables on startup."""
-    init_db()
-    init_default_data()
+    """
+    Initialize database tables and in-memory state on startup.
+    
+    Every phase is bounded by schema size, agent count or the alert
+    dedup window rather than by the number of activity logs or alerts
+    (building the search index for an existing database is a one-time
+    exception), and is timed into startup_timer.
+    """
+    with startup_timer.phase("schema"):
+        synchronized = init_db()
+    startup_timer.note("schema", "synchronized" if synchronized else "up to date")
+    with startup_timer.phase("default_data"):
+        init_default_data()
+    
+    db = SessionLocal()
+    try:
+        with startup_timer.phase("rollups_and_counters"):
+            ensure_rollups(db)
+            ensure_alert_counters(db)
+        with startup_timer.phase("search_index"):
+            built = ensure_search_index(db)
+        if settings.ACTIVITY_SEARCH_ENABLED:
+            startup_timer.note("search_index", "built" if built else "present")
+        with startup_timer.phase("alert_index"):
+            open_alert_index.load(db)
+        with startup_timer.phase("alert_rules"):
+            load_alert_rules(db)
+        if settings.AGENT_OFFLINE_ENABLED:
+            with startup_timer.phase("offline_detector"):
+                offline_detector.load(db)
+        if settings.ANOMALY_DETECTION_ENABLED:
+            with startup_timer.phase("anomaly_detector"):
+                anomaly_detector.load(db)
+    finally:
+        db.close()
+    
+    with startup_timer.phase("workers"):
+        if settings.RETENTION_ENABLED:
+            retention_worker.start()
+        if settings.ANOMALY_DETECTION_ENABLED:
+            anomaly_persist_worker.start()
+        if settings.AGENT_OFFLINE_ENABLED:
+            offline_detector.start()
+    startup_timer.complete()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    """Stop background workers."""
+    retention_worker.stop()
+    anomaly_persist_worker.stop()
+    offline_detector.stop()
+    password_hasher.shutdown()
+    if settings.ANOMALY_DETECTION_ENABLED:
+        persist_anomaly_state()
 
 
 
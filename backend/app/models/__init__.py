@@ -4,11 +4,25 @@
 from app.models.user import User
 from app.models.agent import Agent
 from app.models.activity_log import ActivityLog
+from app.models.activity_lookup import ActivityApp, ActivityType, ActivityUser
 from app.models.alert import Alert
+from app.models.activity_rollup import ActivityRollup
+from app.models.alert_counter import AlertCounter
+from app.models.agent_risk_baseline import AgentRiskBaseline
+from app.models.alert_rule import AlertRule
+from app.models.app_metadata import AppMetadata
 
 __all__ = [
     "User",
     "Agent",
     "ActivityLog",
+    "ActivityApp",
+    "ActivityType",
+    "ActivityUser",
     "Alert",
+    "ActivityRollup",
+    "AlertCounter",
+    "AgentRiskBaseline",
+    "AlertRule",
+    "AppMetadata",
 ]
@@ -1,10 +1,89 @@
 # models/activity_log.py
 # ActivityLog model for storing PC activity data
 
-from sqlalchemy import Column, Integer, String, DateTime, Float, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, SmallInteger, String, DateTime, Float, ForeignKey, MetaData, Table, case, event
+from sqlalchemy.orm import Session, object_session, relationship
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime
 from app.core.database import Base
+from app.models.activity_lookup import LOOKUP_FIELDS, activity_lookups
+
+
+# Risk levels in order; the column stores the index
+RISK_LEVELS = ("low", "medium", "high", "critical")
+RISK_LEVEL_CODES = {level: code for code, level in enumerate(RISK_LEVELS)}
+
+# Description the agent ingest endpoint generates. It is not stored: rows
+# without a description read it back from their app name
+GENERATED_DESCRIPTION = "Activity in {app_name}"
+
+
+class RiskLevel(TypeDecorator):
+    """
+    Risk level stored as a SMALLINT code and read back as its name.
+    
+    Comparisons, IN lists and GROUP BY on the column work with names as
+    before. Codes bind as-is (bulk loaders). Writing an unknown name or
+    code raises ValueError; compared against the column, an unknown name
+    binds as -1, which matches no row. Codes outside RISK_LEVELS read
+    back as None.
+    """
+    impl = SmallInteger
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        code = value if isinstance(value, int) else RISK_LEVEL_CODES.get(value)
+        if code is None or not 0 <= code < len(RISK_LEVELS):
+            raise ValueError(f"risk_level must be one of: {', '.join(RISK_LEVELS)}")
+        return code
+        
+    def process_result_value(self, value, dialect):
+        if value is None or not 0 <= value < len(RISK_LEVELS):
+            return None
+        return RISK_LEVELS[value]
+        
+    def coerce_compared_value(self, op, value):
+        return _RiskLevelFilter()
+
+
+class _RiskLevelFilter(RiskLevel):
+    """RiskLevel for values compared against the column: unknown names bind as -1."""
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        return RISK_LEVEL_CODES.get(value, -1)
+        
+
+def risk_level_name(column):
+    """
+    SQL expression naming a risk level code, for INSERT ... SELECT into string columns.
+    
+    Codes outside RISK_LEVELS name as NULL, as RiskLevel reads them back.
+    """
+    return case({code: level for level, code in RISK_LEVEL_CODES.items()}, value=column, else_=None)
+
+
+def _lookup_property(field: str) -> property:
+    """String attribute stored as a lookup id (see LOOKUP_FIELDS)."""
+    kind, id_column = LOOKUP_FIELDS[field]
+    
+    def getter(self):
+        strings = self.__dict__.get("_strings")
+        if strings is not None and field in strings:
+            return strings[field]
+        return activity_lookups.name(object_session(self), kind, getattr(self, id_column))
+        
+    def setter(self, value):
+        # Resolved to an id when the session flushes (encode_strings)
+        self.__dict__.setdefault("_strings", {})[field] = value
+        self.__dict__.setdefault("_unencoded", set()).add(field)
+        setattr(self, id_column, activity_lookups.cached_id(kind, value))
+        
+    return property(getter, setter)
 
 
 class ActivityLog(Base):
@@ -12,17 +91,42 @@ class ActivityLog(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     agent_id = Column(Integer, ForeignKey("agents.id"), nullable=True)
-    user_id = Column(String, nullable=True)  # For backward compatibility with agent
-    activity_type = Column(String, nullable=False)
-    description = Column(String, nullable=True)
-    app_name = Column(String, nullable=True)  # From agent
-    risk_level = Column(String, default="low")  # low, medium, high, critical
+    activity_user_id = Column(Integer, ForeignKey("activity_users.id"), nullable=True)  # user_id, from agent
+    activity_type_id = Column(Integer, ForeignKey("activity_types.id"), nullable=False)  # activity_type
+    app_id = Column(Integer, ForeignKey("activity_apps.id"), nullable=True)  # app_name, from agent
+    stored_description = Column("description", String, nullable=True)  # Only when not the generated one
+    risk_level = Column(RiskLevel, nullable=False, default="low")  # low, medium, high, critical
     risk_score = Column(Float, default=0.0)  # Numeric risk score from agent
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
     
     # Relationships
     agent = relationship("Agent", back_populates="activity_logs")
     
+    # Strings kept in lookup tables; set and read them as before
+    user_id = _lookup_property("user_id")
+    activity_type = _lookup_property("activity_type")
+    app_name = _lookup_property("app_name")
+    
+    @property
+    def description(self):
+        if self.stored_description is not None:
+            return self.stored_description
+        app_name = self.app_name
+        return GENERATED_DESCRIPTION.format(app_name=app_name) if app_name else None
+        
+    @description.setter
+    def description(self, value):
+        self.stored_description = value
+        
+    def encode_strings(self, db: Session) -> None:
+        """Intern strings set since the last flush and drop a generated description."""
+        for field in self.__dict__.pop("_unencoded", ()):
+            kind, id_column = LOOKUP_FIELDS[field]
+            setattr(self, id_column, activity_lookups.intern(db, kind, self._strings[field]))
+        app_name = self.app_name
+        if app_name is not None and self.stored_description == GENERATED_DESCRIPTION.format(app_name=app_name):
+            self.stored_description = None
+    
     def __repr__(self):
         return f"<ActivityLog(id={self.id}, type='{self.activity_type}', risk='{self.risk_level}')>"
     
@@ -30,3 +134,40 @@ class ActivityLog(Base):
     def is_suspicious(self) -> bool:
         """Check if this activity is suspicious based on risk level."""
         return self.risk_level in ["high", "critical"]
+
+
+@event.listens_for(Session, "before_flush")
+def _encode_activity_strings(session, flush_context, instances):
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, ActivityLog) and "_unencoded" in obj.__dict__:
+            obj.encode_strings(session)
+
+
+# activity_logs as it reads to clients: lookup strings joined back in and the
+# generated description filled in, under the old column names. Created by
+# init_db; list, export, search and archive queries select from it
+ACTIVITY_LOG_VIEW_SQL = """
+CREATE VIEW activity_log_view AS
+SELECT l.id, l.agent_id, u.name AS user_id, t.name AS activity_type,
+       COALESCE(l.description, 'Activity in ' || a.name) AS description,
+       a.name AS app_name, l.risk_level, l.risk_score, l.timestamp
+FROM activity_logs l
+LEFT JOIN activity_users u ON u.id = l.activity_user_id
+LEFT JOIN activity_types t ON t.id = l.activity_type_id
+LEFT JOIN activity_apps a ON a.id = l.app_id
+"""
+Base.metadata.info.setdefault("views", {})["activity_log_view"] = ACTIVITY_LOG_VIEW_SQL
+
+activity_log_view = Table(
+    "activity_log_view",
+    MetaData(),
+    Column("id", Integer, primary_key=True),
+    Column("agent_id", Integer),
+    Column("user_id", String),
+    Column("activity_type", String),
+    Column("description", String),
+    Column("app_name", String),
+    Column("risk_level", RiskLevel),
+    Column("risk_score", Float),
+    Column("timestamp", DateTime),
+)
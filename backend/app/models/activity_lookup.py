@@ -0,0 +1,211 @@
+# models/activity_lookup.py
+# Lookup tables for strings repeated on every activity log, and their intern cache
+
+import threading
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Column, Integer, String, event, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import Base, SessionLocal, insert_on_conflict
+
+
+class ActivityApp(Base):
+    __tablename__ = "activity_apps"
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)  # chrome.exe, ...
+
+
+class ActivityType(Base):
+    __tablename__ = "activity_types"
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)  # app, browser, usb, ...
+
+
+class ActivityUser(Base):
+    __tablename__ = "activity_users"
+    
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)  # Agent-reported userId
+
+
+# Lookup table per kind; ActivityLog stores the id in the matching column
+LOOKUP_MODELS = {
+    "app": ActivityApp,
+    "activity_type": ActivityType,
+    "user": ActivityUser,
+}
+
+# ActivityLog string attribute -> (lookup kind, id column)
+LOOKUP_FIELDS = {
+    "app_name": ("app", "app_id"),
+    "activity_type": ("activity_type", "activity_type_id"),
+    "user_id": ("user", "activity_user_id"),
+}
+
+
+class LookupCache:
+    """
+    Process-wide two-way map between lookup strings and their ids.
+    
+    Lookup rows are only ever inserted, so a committed id names the same
+    string for good and both directions are cached without invalidation.
+    A string first inserted by a session is kept on that session until
+    it commits (and dropped if it rolls back), so the cache never holds
+    an id the database does not have. Each kind caches at most
+    ``max_entries`` strings; beyond that lookups still work, uncached.
+    """
+    
+    def __init__(self, max_entries: int = 50000):
+        self.max_entries = max_entries
+        self._ids: Dict[str, Dict[str, int]] = {kind: {} for kind in LOOKUP_MODELS}
+        self._names: Dict[str, Dict[int, str]] = {kind: {} for kind in LOOKUP_MODELS}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        
+    def intern(self, db: Session, kind: str, name: Optional[str]) -> Optional[int]:
+        """
+        Return the id for ``name``, inserting it into the lookup table if new.
+        
+        Args:
+            db: Session the caller's activity log is written with
+            kind: Lookup kind (app, activity_type or user)
+            name: String to intern
+            
+        Returns:
+            Lookup id, or None for None
+        """
+        if name is None:
+            return None
+        lookup_id = self._ids[kind].get(name)
+        if lookup_id is not None:
+            self.hits += 1
+            return lookup_id
+        pending = db.info.setdefault("pending_lookups", {})
+        lookup_id = pending.get((kind, name))
+        if lookup_id is not None:
+            return lookup_id
+            
+        self.misses += 1
+        table = LOOKUP_MODELS[kind].__table__
+        lookup_id = db.execute(select(table.c.id).where(table.c.name == name)).scalar()
+        if lookup_id is not None:
+            self._store(kind, name, lookup_id)
+            return lookup_id
+        lookup_id = db.execute(
+            insert_on_conflict(table).values(name=name)
+            .on_conflict_do_nothing(index_elements=["name"])
+            .returning(table.c.id)
+        ).scalar()
+        if lookup_id is None:
+            # Inserted by another writer since the SELECT
+            lookup_id = db.execute(select(table.c.id).where(table.c.name == name)).scalar()
+        pending[(kind, name)] = lookup_id
+        self.inserts += 1
+        return lookup_id
+        
+    def cached_id(self, kind: str, name: Optional[str]) -> Optional[int]:
+        """Return the id for ``name`` if it is cached, without touching the database."""
+        return self._ids[kind].get(name)
+        
+    def name(self, db: Optional[Session], kind: str, lookup_id: Optional[int]) -> Optional[str]:
+        """
+        Return the string for a lookup id.
+        
+        Args:
+            db: Session to read a missing id with (a new one if None)
+            kind: Lookup kind
+            lookup_id: Id stored on the activity log
+        """
+        if lookup_id is None:
+            return None
+        name = self._names[kind].get(lookup_id)
+        if name is not None:
+            return name
+        if db is not None:
+            for (pending_kind, pending_name), pending_id in db.info.get("pending_lookups", {}).items():
+                if pending_kind == kind and pending_id == lookup_id:
+                    return pending_name
+        return self.names(db, kind, [lookup_id]).get(lookup_id)
+        
+    def names(self, db: Optional[Session], kind: str, ids: Iterable[int]) -> Dict[int, str]:
+        """Return the strings for many lookup ids, reading missing ones in one query."""
+        cached = self._names[kind]
+        found = {}
+        missing = set()
+        for lookup_id in ids:
+            if lookup_id is None:
+                continue
+            name = cached.get(lookup_id)
+            if name is None:
+                missing.add(lookup_id)
+            else:
+                found[lookup_id] = name
+        if not missing:
+            return found
+            
+        table = LOOKUP_MODELS[kind].__table__
+        session = db if db is not None else SessionLocal()
+        try:
+            rows = session.execute(select(table.c.id, table.c.name).where(table.c.id.in_(missing))).all()
+        finally:
+            if db is None:
+                session.close()
+        pending = db.info.get("pending_lookups", {}) if db is not None else {}
+        for lookup_id, name in rows:
+            found[lookup_id] = name
+            if (kind, name) not in pending:
+                self._store(kind, name, lookup_id)
+        return found
+        
+    def _store(self, kind: str, name: str, lookup_id: int) -> None:
+        with self._lock:
+            ids = self._ids[kind]
+            if len(ids) < self.max_entries:
+                ids[name] = lookup_id
+                self._names[kind][lookup_id] = name
+                
+    def commit(self, session: Session) -> None:
+        """Cache the strings ``session`` inserted, now that they are committed."""
+        for (kind, name), lookup_id in session.info.pop("pending_lookups", {}).items():
+            self._store(kind, name, lookup_id)
+            
+    def rollback(self, session: Session) -> None:
+        """Forget the strings ``session`` inserted; its transaction was rolled back."""
+        session.info.pop("pending_lookups", None)
+        
+    def clear(self) -> None:
+        """Drop every cached string (after the lookup tables were rebuilt)."""
+        with self._lock:
+            for kind in LOOKUP_MODELS:
+                self._ids[kind].clear()
+                self._names[kind].clear()
+                
+    def stats(self) -> dict:
+        """Return cache sizes and counters."""
+        return {
+            "entries": {kind: len(ids) for kind, ids in self._ids.items()},
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "inserts": self.inserts,
+        }
+
+
+activity_lookups = LookupCache(max_entries=settings.ACTIVITY_INTERN_CACHE_MAX_ENTRIES)
+
+
+@event.listens_for(Session, "after_commit")
+def _promote_pending_lookups(session):
+    activity_lookups.commit(session)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending_lookups(session, transaction):
+    # Runs after after_commit too, so only rolled-back strings are left here
+    if transaction.parent is None:
+        activity_lookups.rollback(session)
@@ -0,0 +1,36 @@
+# models/activity_rollup.py
+# ActivityRollup model for pre-aggregated activity time buckets
+
+from sqlalchemy import Column, Integer, String, DateTime, Float, UniqueConstraint
+from app.core.database import Base
+
+
+class ActivityRollup(Base):
+    __tablename__ = "activity_rollups"
+    __table_args__ = (
+        UniqueConstraint(
+            "granularity", "bucket_start", "agent_id", "risk_level",
+            name="uq_activity_rollups_bucket"
+        ),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String, nullable=False)  # minute, hour
+    bucket_start = Column(DateTime, nullable=False)
+    agent_id = Column(Integer, nullable=False, default=0)  # 0 when activity has no agent
+    risk_level = Column(String, nullable=False)
+    activity_count = Column(Integer, nullable=False, default=0)
+    risk_score_sum = Column(Float, nullable=False, default=0.0)
+    risk_score_min = Column(Float, nullable=True)
+    risk_score_max = Column(Float, nullable=True)
+    
+    def __repr__(self):
+        return (
+            f"<ActivityRollup(granularity='{self.granularity}', bucket='{self.bucket_start}', "
+            f"agent={self.agent_id}, risk='{self.risk_level}', count={self.activity_count})>"
+        )
+        
+    @property
+    def average_risk_score(self) -> float:
+        """Average risk score of the activities in this bucket."""
+        return self.risk_score_sum / self.activity_count if self.activity_count else 0.0
@@ -0,0 +1,20 @@
+# models/agent_risk_baseline.py
+# AgentRiskBaseline model persisting the streaming anomaly detector state
+
+from sqlalchemy import Column, Integer, Float, DateTime
+from datetime import datetime
+from app.core.database import Base
+
+
+class AgentRiskBaseline(Base):
+    __tablename__ = "agent_risk_baselines"
+    
+    agent_id = Column(Integer, primary_key=True)  # not a foreign key; AnomalyDetector.forget removes it with the agent
+    sample_count = Column(Integer, nullable=False, default=0)
+    mean = Column(Float, nullable=False, default=0.0)
+    m2 = Column(Float, nullable=False, default=0.0)  # Welford sum of squared deviations
+    ewma = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<AgentRiskBaseline(agent_id={self.agent_id}, n={self.sample_count}, mean={self.mean:.3f})>"
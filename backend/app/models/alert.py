@@ -16,9 +16,11 @@ class Alert(Base):
     alert_type = Column(String, nullable=False)  # high_risk, suspicious_activity, agent_offline, etc.
     message = Column(String, nullable=False)
     severity = Column(String, default="medium")  # low, medium, high, critical
-    is_resolved = Column(Boolean, default=False)
+    is_resolved = Column(Boolean, default=False, index=True)  # open alerts are few; startup and /active read them
     resolved_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    occurrence_count = Column(Integer, nullable=False, default=1, server_default="1")  # repeats folded into this alert
+    last_seen_at = Column(DateTime, nullable=True)  # last repeat; NULL means created_at
     
     # Relationships
     agent = relationship("Agent", back_populates="alerts")
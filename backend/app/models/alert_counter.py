@@ -0,0 +1,16 @@
+# models/alert_counter.py
+# AlertCounter model for materialized alert statistics
+
+from sqlalchemy import Column, Integer, String, Boolean
+from app.core.database import Base
+
+
+class AlertCounter(Base):
+    __tablename__ = "alert_counters"
+    
+    severity = Column(String, primary_key=True)  # low, medium, high, critical
+    is_resolved = Column(Boolean, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f"<AlertCounter(severity='{self.severity}', resolved={self.is_resolved}, count={self.count})>"
@@ -0,0 +1,23 @@
+# models/alert_rule.py
+# AlertRule model for declarative alerting rules
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean
+from datetime import datetime
+from app.core.database import Base
+
+
+class AlertRule(Base):
+    __tablename__ = "alert_rules"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    event_type = Column(String, nullable=True)  # NULL matches every event type
+    conditions = Column(Text, nullable=False, default="[]")  # JSON list of conditions
+    severity = Column(String, default="medium")  # low, medium, high, critical
+    alert_type = Column(String, nullable=True)  # defaults to "rule:<name>"
+    message = Column(String, nullable=True)  # format template, see rule_engine
+    enabled = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<AlertRule(id={self.id}, name='{self.name}', enabled={self.enabled})>"
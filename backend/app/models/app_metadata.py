@@ -0,0 +1,17 @@
+# models/app_metadata.py
+# AppMetadata model for schema and seeding state recorded across restarts
+
+from sqlalchemy import Column, String, DateTime
+from datetime import datetime
+from app.core.database import Base
+
+
+class AppMetadata(Base):
+    __tablename__ = "app_metadata"
+    
+    key = Column(String, primary_key=True)  # schema_fingerprint, default_data_seeded
+    value = Column(String, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<AppMetadata(key='{self.key}', value='{self.value}')>"
@@ -1,7 +1,7 @@
 # models/user.py
 # User model for authentication
 
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.core.database import Base
@@ -22,3 +22,11 @@ class User(Base):
     
     def __repr__(self):
         return f"<User(id={self.id}, username='{self.username}', role='{self.role}')>"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _invalidate_principals(mapper, connection, target):
+    """Drop cached principals when a user row changes."""
+    from app.core.cache import principal_cache
+    principal_cache.clear()
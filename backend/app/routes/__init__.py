@@ -5,10 +5,18 @@ from app.routes.auth import router as auth_router
 from app.routes.agents import router as agents_router
 from app.routes.activity import router as activity_router
 from app.routes.alerts import router as alerts_router
+from app.routes.admin import router as admin_router
+from app.routes.events import router as events_router
+from app.routes.dashboard import router as dashboard_router
+from app.routes.metrics import router as metrics_router
 
 __all__ = [
     "auth_router",
     "agents_router",
     "activity_router",
     "alerts_router",
+    "admin_router",
+    "events_router",
+    "dashboard_router",
+    "metrics_router",
 ]
@@ -1,11 +1,19 @@
 # routes/activity.py
 # Activity log routes
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from datetime import datetime
 
 from app.core.database import get_db
+from app.core.cache import cached_response, response_cache
+from app.core.config import settings
+from app.core.events import event_broker
+from app.core.metrics import ingest_events_total
+from app.core.ratelimit import acquire_all, ingest_limiter, ingest_key_limiter, ingest_shedder, retry_after_header
+from app.core.profiler import query_budget
 from app.core.security import get_current_user, get_api_key, get_optional_api_key
 from app.models.user import User
 from app.models.agent import Agent
@@ -14,22 +22,48 @@ from app.schemas.activity_log import (
     ActivityLogCreate,
     ActivityLogResponse,
     AgentActivityCreate,
-    ActivityLogListResponse
+    ActivityLogListResponse,
+    ActivitySearchResponse
 )
-from app.services.risk_service import (
-    evaluate_activity_risk,
-    calculate_risk_level,
-    get_risk_statistics
+from app.services.risk_service import evaluate_activity_risk, calculate_risk_level
+from app.services.alert_service import create_anomaly_alert, create_rule_alert
+from app.services.rule_engine import rule_engine, build_event
+from app.services.offline_service import offline_detector
+from app.services.rollup_service import record_activity
+from app.services.activity_service import (
+    list_activity_rows,
+    get_activity_statistics,
+    iter_activity_export,
+    EXPORT_FORMATS
 )
-from app.services.alert_service import create_high_risk_alert
+from app.services.search_service import search_activity, search_available
+from app.services.retention_service import query_archive, list_archive_partitions
+from app.services.timeseries_service import get_activity_timeseries
 
 router = APIRouter(prefix="/api/activity", tags=["Activity"])
 
 
+def publish_activity_event(activity: ActivityLog) -> None:
+    """Push a committed activity and its stats delta to stream subscribers."""
+    # Most ingests have no stream listening; skip building the payload
+    if not event_broker.has_subscribers:
+        return
+    event_broker.publish("activity", {
+        "activity": ActivityLogListResponse.model_validate(activity),
+        "delta": {
+            "total_activities": 1,
+            "risk_level": activity.risk_level,
+            "risk_score": activity.risk_score,
+        },
+    })
+
+
 # ============== BACKWARD COMPATIBLE ENDPOINT FOR AGENTS ==============
 @router.post("/log", status_code=status.HTTP_201_CREATED)
+@query_budget(20)
 def log_activity_from_agent(
     activity_data: AgentActivityCreate,
+    request: Request,
     db: Session = Depends(get_db),
     api_key: Optional[str] = Depends(get_optional_api_key)
 ):
@@ -45,7 +79,39 @@ def log_activity_from_agent(
     }
     
     Auto-creates agent if not exists (including API key auto-registration).
+    
+    Requests are charged to token buckets for the agent name and API key
+    (the client address without a key, as the agent name is chosen by
+    the client) before any database work (429 when empty), and low-risk
+    events are shed first when ingest is overloaded (503).
     """
+    risk_level = calculate_risk_level(activity_data.riskScore)
+    if settings.INGEST_RATE_LIMIT_ENABLED:
+        charges = [(ingest_limiter, [f"agent:{activity_data.userId}"])]
+        if api_key:
+            charges.append((ingest_key_limiter, [f"key:{api_key}"]))
+        else:
+            client = request.client.host if request.client else "unknown"
+            charges.append((ingest_key_limiter, [f"ip:{client}"]))
+        retry_after = acquire_all(charges)
+        if retry_after:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers=retry_after_header(retry_after),
+            )
+            
+    with ingest_shedder.admit(risk_level):
+        return _log_activity(activity_data, db, api_key, risk_level)
+
+
+def _log_activity(
+    activity_data: AgentActivityCreate,
+    db: Session,
+    api_key: Optional[str],
+    risk_level: str
+) -> dict:
+    """Store an admitted agent activity and run risk evaluation and alerting."""
     # Try to find agent by name first
     agent = db.query(Agent).filter(Agent.name == activity_data.userId).first()
     
@@ -69,11 +135,10 @@ def log_activity_from_agent(
     # Update agent's last_seen
     agent.update_last_seen()
     db.commit()
+    if settings.AGENT_OFFLINE_ENABLED:
+        offline_detector.touch(agent.id)
 
     
-    # Calculate risk level from score
-    risk_level = calculate_risk_level(activity_data.riskScore)
-    
     # Create activity log
     activity = ActivityLog(
         agent_id=agent.id,
@@ -86,14 +151,23 @@ def log_activity_from_agent(
     )
     
     db.add(activity)
+    db.flush()
+    record_activity(db, activity)
     db.commit()
     db.refresh(activity)
+    response_cache.bump("activity")
+    ingest_events_total.labels(risk_level).inc()
+    publish_activity_event(activity)
     
     # Evaluate risk and create alert if needed
-    risk_evaluation = evaluate_activity_risk(activity_data, db)
+    risk_evaluation = evaluate_activity_risk(activity_data, db, agent.id)
     
-    if risk_evaluation["should_alert"]:
-        create_high_risk_alert(db, activity, activity_data.riskScore)
+    # Alert rules, including the built-in high/critical risk rules
+    for rule in rule_engine.evaluate(build_event(activity), agent.id):
+        create_rule_alert(db, activity, rule)
+    
+    if risk_evaluation["anomaly"] and not risk_evaluation["should_alert"]:
+        create_anomaly_alert(db, activity, risk_evaluation["anomaly"])
     
     return {
         "message": "Activity logged successfully",
@@ -115,13 +189,19 @@ def create_activity_log(
     """
     new_activity = ActivityLog(**activity.dict())
     db.add(new_activity)
+    db.flush()
+    record_activity(db, new_activity)
     db.commit()
     db.refresh(new_activity)
+    response_cache.bump("activity")
+    publish_activity_event(new_activity)
     return new_activity
 
 
 @router.get("/", response_model=List[ActivityLogListResponse])
+@query_budget(2)
 def get_activity_logs(
+    request: Request,
     skip: int = 0,
     limit: int = 100,
     risk_level: Optional[str] = None,
@@ -130,26 +210,177 @@ def get_activity_logs(
 ):
     """
     Get activity logs (admin only).
-    """
-    query = db.query(ActivityLog)
     
-    if risk_level:
-        query = query.filter(ActivityLog.risk_level == risk_level)
-    
-    activities = query.order_by(ActivityLog.timestamp.desc()).offset(skip).limit(limit).all()
-    return activities
+    Rows are selected column-by-column and encoded without building ORM
+    or Pydantic objects; response_model only documents the shape.
+    """
+    return cached_response(
+        request,
+        ["activity"],
+        lambda: list_activity_rows(db, skip, limit, risk_level)
+    )
 
 
 @router.get("/stats")
-def get_activity_statistics(
+@query_budget(8)
+def get_activity_stats(
+    request: Request,
     hours: int = 24,
+    percentiles: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get activity statistics (admin only).
+    
+    Pass ``percentiles`` as a comma-separated list (e.g. "50,95,99") to
+    include risk score percentiles.
+    """
+    requested = None
+    if percentiles:
+        try:
+            requested = [float(p) for p in percentiles.split(",") if p.strip()]
+        except ValueError:
+            requested = None
+        if requested is None or not all(0.0 <= p <= 100.0 for p in requested):
+            # NaN fails the range check too
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="percentiles must be a comma-separated list of numbers between 0 and 100"
+            )
+    
+    return cached_response(
+        request,
+        ["activity"],
+        lambda: get_activity_statistics(db, hours, requested)
+    )
+
+
+@router.get("/timeseries")
+def get_timeseries(
+    request: Request,
+    bucket: str = "5m",
+    metric: str = "count",
+    group_by: Optional[str] = None,
+    hours: int = 24,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get activity count or average risk per time bucket (admin only).
+    
+    ``bucket`` is 1m, 5m or 1h; ``metric`` is count or avg_risk;
+    ``group_by`` optionally splits the series by risk_level, agent or app.
+    """
+    def compute():
+        try:
+            return get_activity_timeseries(db, bucket, metric, group_by, hours)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return cached_response(request, ["activity"], compute)
+
+
+@router.get("/search", response_model=ActivitySearchResponse)
+@query_budget(2)
+def search_activity_logs(
+    request: Request,
+    q: str,
+    order: str = "rank",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    risk_level: Optional[str] = None,
+    agent_id: Optional[int] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
     """
-    return get_risk_statistics(db, hours)
+    Full-text search over app names and descriptions (admin only).
+    
+    Every word in ``q`` must match, as a prefix. ``order`` is rank (best
+    match first) or recent; ``risk_level`` takes a comma-separated list.
+    Pass the returned ``next_cursor`` as ``cursor`` for the next page.
+    """
+    if not search_available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Activity search is not available"
+        )
+    if not 1 <= limit <= settings.ACTIVITY_SEARCH_MAX_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit must be between 1 and {settings.ACTIVITY_SEARCH_MAX_LIMIT}"
+        )
+    risk_levels = [level.strip() for level in risk_level.split(",") if level.strip()] if risk_level else None
+    
+    def compute():
+        try:
+            return search_activity(db, q, order, start, end, risk_levels, agent_id, limit, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return cached_response(request, ["activity"], compute)
+
+
+@router.get("/export")
+def export_activity_logs(
+    format: str = "ndjson",
+    gzip: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    agent_id: Optional[int] = None,
+    risk_level: Optional[str] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream activity logs as NDJSON or CSV, optionally gzipped (admin only).
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    # A gzipped export is served as a .gz file rather than with
+    # Content-Encoding, so clients save it compressed
+    filename = f"activity_logs.{format}" + (".gz" if gzip else "")
+    media_type = "application/gzip" if gzip else EXPORT_FORMATS[format]
+    
+    return StreamingResponse(
+        iter_activity_export(format, gzip, start, end, agent_id, risk_level),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/archive/partitions")
+def get_archive_partitions(current_user: User = Depends(get_current_user)):
+    """
+    List archived days (admin only).
+    """
+    return list_archive_partitions()
+
+
+@router.get("/archive", response_model=List[ActivityLogResponse])
+def get_archived_activity_logs(
+    start: datetime,
+    end: datetime,
+    agent_id: Optional[int] = None,
+    risk_level: Optional[str] = None,
+    limit: int = 1000,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get activity logs moved to the archive by retention (admin only).
+    """
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must be after start"
+        )
+    return query_archive(start, end, agent_id, risk_level, limit)
 
 
 @router.get("/{activity_id}", response_model=ActivityLogResponse)
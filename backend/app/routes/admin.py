@@ -0,0 +1,132 @@
+# routes/admin.py
+# Operational/admin routes
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from app.core.cache import response_cache, principal_cache
+from app.core.config import settings
+from app.core.events import event_broker
+from app.core.hashing import password_hasher, login_throttle
+from app.core.sampler import sampling_profiler
+from app.core.startup import startup_timer
+from app.core.ratelimit import ingest_limiter, ingest_key_limiter, ingest_shedder
+from app.core.database import get_db
+from app.core.security import get_current_user
+from app.models.user import User
+from app.services.retention_service import run_retention, retention_worker
+from app.services.risk_service import anomaly_detector
+from app.services.alert_service import open_alert_index
+from app.services.rule_engine import rule_engine
+from app.services.offline_service import offline_detector
+from app.services.storage_service import storage_report
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+
+@router.get("/cache")
+def get_cache_stats(current_user: User = Depends(get_current_user)):
+    """Get response cache hit-ratio metrics (admin only)."""
+    return response_cache.stats()
+
+
+@router.get("/principals")
+def get_principal_cache_stats(current_user: User = Depends(get_current_user)):
+    """Get principal cache hit-rate and time-saved metrics (admin only)."""
+    return principal_cache.stats()
+
+
+@router.get("/auth")
+def get_auth_stats(current_user: User = Depends(get_current_user)):
+    """Get password hashing executor and login throttling metrics (admin only)."""
+    return {"hashing": password_hasher.stats(), "throttle": login_throttle.stats()}
+
+
+@router.get("/ratelimit")
+def get_rate_limit_stats(current_user: User = Depends(get_current_user)):
+    """Get ingest rate limiter and load shedder state (admin only)."""
+    return {
+        "agents": ingest_limiter.stats(),
+        "api_keys": ingest_key_limiter.stats(),
+        "shedder": ingest_shedder.stats(),
+    }
+
+
+@router.get("/events")
+def get_event_stats(current_user: User = Depends(get_current_user)):
+    """Get event stream broker metrics (admin only)."""
+    return event_broker.stats()
+
+
+@router.post("/retention/run")
+def trigger_retention(current_user: User = Depends(get_current_user)):
+    """Archive and purge activity logs older than RETENTION_DAYS now (admin only)."""
+    return run_retention()
+
+
+@router.get("/retention")
+def get_retention_status(current_user: User = Depends(get_current_user)):
+    """Get retention settings and the last background run (admin only)."""
+    return {
+        "enabled": settings.RETENTION_ENABLED,
+        "retention_days": settings.RETENTION_DAYS,
+        "archive_dir": settings.RETENTION_ARCHIVE_DIR,
+        "last_run": retention_worker.last_run,
+    }
+
+
+@router.get("/anomaly")
+def get_anomaly_stats(current_user: User = Depends(get_current_user)):
+    """Get streaming risk anomaly detector metrics (admin only)."""
+    return anomaly_detector.stats()
+
+
+@router.get("/alerts")
+def get_alert_dedup_stats(current_user: User = Depends(get_current_user)):
+    """Get open alert index and deduplication metrics (admin only)."""
+    return open_alert_index.stats()
+
+
+@router.get("/rules")
+def get_rule_engine_stats(current_user: User = Depends(get_current_user)):
+    """Get alert rule engine metrics (admin only)."""
+    return rule_engine.stats()
+
+
+@router.get("/offline")
+def get_offline_detector_stats(current_user: User = Depends(get_current_user)):
+    """Get agent offline detector metrics (admin only)."""
+    return offline_detector.stats()
+
+
+@router.get("/storage")
+def get_storage_report(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """Get activity log bytes per row, lookup table sizes and intern cache metrics (admin only)."""
+    return storage_report(db)
+
+
+@router.get("/startup")
+def get_startup_timings(current_user: User = Depends(get_current_user)):
+    """Get the phase timings of the last startup (admin only)."""
+    return startup_timer.report()
+
+
+@router.get("/profiles")
+def list_profiles(current_user: User = Depends(get_current_user)):
+    """List recent request profiles and sampling profiler counters (admin only)."""
+    return {"stats": sampling_profiler.stats(), "profiles": sampling_profiler.list()}
+
+
+@router.get("/profiles/{profile_id}", response_class=PlainTextResponse)
+def get_profile(profile_id: str, current_user: User = Depends(get_current_user)):
+    """
+    Download a request profile as collapsed stacks (admin only).
+    
+    One ``frame;frame;frame count`` line per distinct stack, ready for
+    flamegraph.pl or speedscope.
+    """
+    folded = sampling_profiler.read(profile_id)
+    if folded is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    return PlainTextResponse(folded)
@@ -1,15 +1,21 @@
 # routes/agents.py
 # Agent management routes
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
 from app.core.database import get_db
+from app.core.cache import cached_response
+from app.core.config import settings
+from app.core.profiler import query_budget
 from app.core.security import get_current_user
 from app.models.user import User
 from app.models.agent import Agent
 from app.schemas.agent import AgentCreate, AgentUpdate, AgentResponse, AgentListResponse
+from app.services.analytics_service import get_agent_trend, get_fleet_trend_ranking
+from app.services.offline_service import offline_detector
+from app.services.risk_service import anomaly_detector
 
 router = APIRouter(prefix="/api/agents", tags=["Agents"])
 
@@ -38,6 +44,7 @@ def create_agent(
 
 
 @router.get("/", response_model=List[AgentListResponse])
+@query_budget(2)
 def list_agents(
     skip: int = 0,
     limit: int = 100,
@@ -51,6 +58,57 @@ def list_agents(
     return agents
 
 
+@router.get("/trends")
+def get_agent_trend_ranking(
+    request: Request,
+    sort_by: str = "ewma",
+    limit: int = 20,
+    days: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Rank agents by risk trend (admin only).
+    
+    ``sort_by`` is ewma, zscore, wow_change or events; ``days`` is 1 to
+    ANALYTICS_MAX_DAYS. Results are cached for ANALYTICS_CACHE_TTL_SECONDS
+    rather than invalidated on ingest.
+    """
+    def compute():
+        try:
+            return get_fleet_trend_ranking(db, sort_by, limit, days)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return cached_response(request, [], compute, ttl=settings.ANALYTICS_CACHE_TTL_SECONDS)
+
+
+@router.get("/{agent_id}/trend")
+def get_agent_risk_trend(
+    agent_id: int,
+    request: Request,
+    days: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get an agent's hourly risk EWMA, z-scores and week-over-week change (admin only).
+    """
+    if db.query(Agent.id).filter(Agent.id == agent_id).first() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Agent not found"
+        )
+    
+    def compute():
+        try:
+            return get_agent_trend(db, agent_id, days)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return cached_response(request, [], compute, ttl=settings.ANALYTICS_CACHE_TTL_SECONDS)
+
+
 @router.get("/{agent_id}", response_model=AgentResponse)
 def get_agent(
     agent_id: int,
@@ -113,5 +171,7 @@ def delete_agent(
         )
     
     db.delete(agent)
+    anomaly_detector.forget(db, agent_id)
     db.commit()
+    offline_detector.forget(agent_id)
     return None
@@ -1,21 +1,32 @@
 # routes/alerts.py
 # Alert management routes
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
 from app.core.database import get_db
+from app.core.cache import cached_response, json_response, response_cache
+from app.core.metrics import alerts_created_total
+from app.core.profiler import query_budget
 from app.core.security import get_current_user
 from app.models.user import User
 from app.models.alert import Alert
+from app.models.alert_rule import AlertRule
 from app.schemas.alert import AlertCreate, AlertUpdate, AlertResponse, AlertListResponse
+from app.schemas.alert_rule import AlertRuleCreate, AlertRuleResponse
 from app.services.alert_service import (
-    get_active_alerts,
-    get_all_alerts,
+    list_alert_rows,
     resolve_alert as resolve_alert_service,
+    delete_alert as delete_alert_service,
+    adjust_alert_counter,
+    check_alert_counters,
+    publish_alert_event,
     get_alert_statistics
 )
+from app.services.rule_engine import rule_engine, compile_rule, load_alert_rules, rule_to_dict
 
 router = APIRouter(prefix="/api/alerts", tags=["Alerts"])
 
@@ -29,12 +40,17 @@ def create_alert(
     """Create a new alert (admin only)."""
     new_alert = Alert(**alert.dict())
     db.add(new_alert)
+    adjust_alert_counter(db, new_alert.severity, False, 1)
     db.commit()
     db.refresh(new_alert)
+    alerts_created_total.labels(new_alert.alert_type, new_alert.severity).inc()
+    response_cache.bump("alerts")
+    publish_alert_event("created", new_alert)
     return new_alert
 
 
 @router.get("/", response_model=List[AlertListResponse])
+@query_budget(2)
 def list_alerts(
     skip: int = 0,
     limit: int = 100,
@@ -43,28 +59,124 @@ def list_alerts(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all alerts with optional filters (admin only)."""
-    return get_all_alerts(db, skip, limit, is_resolved, severity)
+    """
+    Get all alerts with optional filters (admin only).
+    
+    Rows are selected column-by-column and encoded without building ORM
+    or Pydantic objects; response_model only documents the shape.
+    """
+    return json_response(list_alert_rows(db, skip, limit, is_resolved, severity))
 
 
 @router.get("/active", response_model=List[AlertListResponse])
+@query_budget(2)
 def list_active_alerts(
+    request: Request,
     severity: Optional[str] = None,
     limit: int = 100,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get active (unresolved) alerts (admin only)."""
-    return get_active_alerts(db, severity, limit)
+    return cached_response(
+        request,
+        ["alerts"],
+        lambda: list_alert_rows(db, limit=limit, is_resolved=False, severity=severity)
+    )
 
 
 @router.get("/stats")
+@query_budget(3)
 def get_alert_stats(
+    request: Request,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get alert statistics (admin only)."""
-    return get_alert_statistics(db)
+    return cached_response(request, ["alerts"], lambda: get_alert_statistics(db))
+
+
+@router.post("/stats/check")
+def check_alert_stats(
+    repair: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Recompute alert counters and optionally repair them (admin only)."""
+    return check_alert_counters(db, repair)
+
+
+@router.get("/rules", response_model=List[AlertRuleResponse])
+def list_alert_rules(current_user: User = Depends(get_current_user)):
+    """List the active alert rules: built-in, file and database (admin only)."""
+    return rule_engine.rules()
+
+
+@router.post("/rules", response_model=AlertRuleResponse, status_code=status.HTTP_201_CREATED)
+def create_alert_rule(
+    rule: AlertRuleCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create an alert rule and recompile the rule engine (admin only).
+    
+    Conditions test event_type, app_name, risk_score, risk_level or
+    user_id with ==, !=, >, >=, <, <=, in, not_in, contains or matches;
+    ``{"field": "count", "op": ">=", "value": N, "window_seconds": S}``
+    requires N matching events from the same agent within S seconds.
+    """
+    if db.query(AlertRule.id).filter(AlertRule.name == rule.name).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Alert rule with this name already exists"
+        )
+    
+    definition = rule.model_dump()
+    try:
+        compile_rule(definition)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    new_rule = AlertRule(
+        name=rule.name,
+        event_type=rule.event_type,
+        conditions=json.dumps(definition["conditions"]),
+        severity=rule.severity,
+        alert_type=rule.alert_type,
+        message=rule.message,
+        enabled=rule.enabled
+    )
+    db.add(new_rule)
+    db.commit()
+    db.refresh(new_rule)
+    load_alert_rules(db)
+    return rule_to_dict(new_rule)
+
+
+@router.delete("/rules/{rule_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_alert_rule(
+    rule_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Delete a database alert rule and recompile the rule engine (admin only)."""
+    rule = db.query(AlertRule).filter(AlertRule.id == rule_id).first()
+    if not rule:
+        raise HTTPException(status_code=404, detail="Alert rule not found")
+    db.delete(rule)
+    db.commit()
+    load_alert_rules(db)
+    return None
+
+
+@router.post("/rules/reload")
+def reload_alert_rules(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Re-read the rules file and database rules (admin only)."""
+    return {"rules": load_alert_rules(db)}
 
 
 @router.get("/{alert_id}", response_model=AlertResponse)
@@ -100,9 +212,6 @@ def delete_alert(
     current_user: User = Depends(get_current_user)
 ):
     """Delete an alert (admin only)."""
-    alert = db.query(Alert).filter(Alert.id == alert_id).first()
-    if not alert:
+    if not delete_alert_service(db, alert_id):
         raise HTTPException(status_code=404, detail="Alert not found")
-    db.delete(alert)
-    db.commit()
     return None
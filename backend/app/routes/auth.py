@@ -2,14 +2,14 @@
 # Authentication routes
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
 
 from app.core.database import get_db
+from app.core.hashing import password_hasher, login_throttle
 from app.core.security import (
-    verify_password,
-    get_password_hash,
     create_access_token,
     get_current_user
 )
@@ -21,50 +21,82 @@ router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: Session = Depends(get_db)):
     """
     Register a new user.
+    
+    Hashing runs on the bounded password executor; the short database
+    steps run in the threadpool so neither blocks the event loop.
     """
     # Check if user already exists
-    db_user = db.query(User).filter(
-        (User.username == user.username) | (User.email == user.email)
-    ).first()
+    db_user = await run_in_threadpool(
+        lambda: db.query(User).filter(
+            (User.username == user.username) | (User.email == user.email)
+        ).first()
+    )
     
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username or email already registered"
         )
-    
+        
     # Hash password and create user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     new_user = User(
         username=user.username,
         email=user.email,
         password=hashed_password
     )
     
-    db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
-    
+    def save():
+        db.add(new_user)
+        db.commit()
+        db.refresh(new_user)
+        
+    await run_in_threadpool(save)
     return new_user
 
 
 @router.post("/token", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """
     Login and get access token.
-    """
-    user = db.query(User).filter(User.username == form_data.username).first()
     
-    if not user or not verify_password(form_data.password, user.password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
+    Attempts are throttled per username before any hashing is queued.
+    Only a wrong password or unknown username counts as a failed
+    attempt; an overloaded hasher or a database error does not. A
+    stored hash with outdated bcrypt parameters is replaced after a
+    successful login.
+    """
+    login_throttle.acquire(form_data.username)
+    success = None
+    try:
+        user = await run_in_threadpool(
+            lambda: db.query(User).filter(User.username == form_data.username).first()
         )
-    
+        
+        new_hash = None
+        if user is None:
+            success = False
+        else:
+            success, new_hash = await password_hasher.verify_and_update(form_data.password, user.password)
+        if not success:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Incorrect username or password",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+            
+        if new_hash:
+            def rehash():
+                user.password = new_hash
+                db.commit()
+                
+            await run_in_threadpool(rehash)
+    finally:
+        login_throttle.release(form_data.username, success)
+        
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": user.username},
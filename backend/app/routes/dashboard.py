@@ -0,0 +1,44 @@
+# routes/dashboard.py
+# Consolidated dashboard routes
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from app.core.cache import cached_response
+from app.core.database import get_db
+from app.core.profiler import query_budget
+from app.core.security import get_current_user
+from app.models.user import User
+from app.services.dashboard_service import parse_summary_fields, get_dashboard_summary
+
+router = APIRouter(prefix="/api/dashboard", tags=["Dashboard"])
+
+
+@router.get("/summary")
+@query_budget(9)
+def get_summary(
+    request: Request,
+    fields: Optional[str] = None,
+    hours: int = 24,
+    activity_limit: int = 10,
+    alert_limit: int = 100,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Get risk stats, recent activity, alert stats and active alerts in one call (admin only).
+    
+    Use ``fields`` (e.g. "risk_stats,alert_stats") to select sections;
+    all sections are returned by default.
+    """
+    try:
+        selected = parse_summary_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return cached_response(
+        request,
+        ["activity", "alerts"],
+        lambda: get_dashboard_summary(db, selected, hours, activity_limit, alert_limit)
+    )
@@ -0,0 +1,52 @@
+# routes/events.py
+# Server-Sent Events stream for the dashboard
+
+import asyncio
+
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.events import event_broker
+from app.core.security import get_stream_user
+from app.models.user import User
+
+router = APIRouter(prefix="/api/events", tags=["Events"])
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    current_user: User = Depends(get_stream_user)
+):
+    """
+    Stream new activity, alert changes and stat deltas (admin only).
+    
+    Authenticate with ``?token=<JWT>``. Events:
+    - activity: a newly logged activity and its stats delta
+    - alert: an alert was created, resolved or deleted
+    - resync: events were dropped for this client; reload full state
+    """
+    subscriber = event_broker.subscribe()
+    
+    async def event_stream():
+        try:
+            yield f"retry: {settings.EVENT_STREAM_RETRY_MS}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(
+                        subscriber.queue.get(),
+                        timeout=settings.EVENT_STREAM_KEEPALIVE_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield message
+        finally:
+            event_broker.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
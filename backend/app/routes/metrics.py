@@ -0,0 +1,26 @@
+# routes/metrics.py
+# Prometheus metrics endpoint
+
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Response, status
+
+from app.core.config import settings
+from app.core.metrics import registry, CONTENT_TYPE
+
+router = APIRouter(tags=["Metrics"])
+
+
+@router.get("/metrics", include_in_schema=False)
+def get_metrics(authorization: Optional[str] = Header(None)):
+    """
+    Expose metrics in the Prometheus text format.
+    
+    Unauthenticated unless METRICS_TOKEN is set, in which case scrapers
+    must send ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    if not settings.METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if settings.METRICS_TOKEN and authorization != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token")
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
@@ -23,6 +23,8 @@ from app.schemas.activity_log import (
     ActivityLogResponse,
     AgentActivityCreate,
     ActivityLogListResponse,
+    ActivitySearchResult,
+    ActivitySearchResponse,
 )
 from app.schemas.alert import (
     AlertBase,
@@ -31,6 +33,12 @@ from app.schemas.alert import (
     AlertResponse,
     AlertListResponse,
 )
+from app.schemas.alert_rule import (
+    RuleCondition,
+    AlertRuleBase,
+    AlertRuleCreate,
+    AlertRuleResponse,
+)
 
 __all__ = [
     # User schemas
@@ -53,10 +61,17 @@ __all__ = [
     "ActivityLogResponse",
     "AgentActivityCreate",
     "ActivityLogListResponse",
+    "ActivitySearchResult",
+    "ActivitySearchResponse",
     # Alert schemas
     "AlertBase",
     "AlertCreate",
     "AlertUpdate",
     "AlertResponse",
     "AlertListResponse",
+    # Alert rule schemas
+    "RuleCondition",
+    "AlertRuleBase",
+    "AlertRuleCreate",
+    "AlertRuleResponse",
 ]
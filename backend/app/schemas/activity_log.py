@@ -1,9 +1,13 @@
 # schemas/activity_log.py
 # Pydantic schemas for ActivityLog
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, confloat
 from datetime import datetime
-from typing import Optional
+from typing import List, Literal, Optional
+
+
+# Names RiskLevel can store (app.models.activity_log.RISK_LEVELS)
+RiskLevelName = Literal["low", "medium", "high", "critical"]
 
 
 class ActivityLogBase(BaseModel):
@@ -15,7 +19,7 @@ class ActivityLogBase(BaseModel):
 class ActivityLogCreate(ActivityLogBase):
     """Schema for creating a new activity log."""
     agent_id: Optional[int] = None
-    risk_level: str = "low"
+    risk_level: RiskLevelName = "low"
 
 
 class ActivityLogResponse(ActivityLogBase):
@@ -24,7 +28,7 @@ class ActivityLogResponse(ActivityLogBase):
     agent_id: Optional[int] = None
     user_id: Optional[str] = None
     app_name: Optional[str] = None
-    risk_level: str
+    risk_level: Optional[str] = None  # None for a stored code with no name
     risk_score: float
     timestamp: datetime
     
@@ -38,7 +42,7 @@ class AgentActivityCreate(BaseModel):
     userId: str
     appName: Optional[str] = None
     eventType: str
-    riskScore: float
+    riskScore: confloat(allow_inf_nan=False)  # "Infinity"/"NaN" would poison the risk baselines
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -49,8 +53,20 @@ class ActivityLogListResponse(BaseModel):
     agent_id: Optional[int] = None
     activity_type: str
     app_name: Optional[str] = None
-    risk_level: str
+    risk_level: Optional[str] = None  # None for a stored code with no name
     risk_score: float
     timestamp: datetime
     
     model_config = ConfigDict(from_attributes=True)
+
+
+class ActivitySearchResult(ActivityLogListResponse):
+    """Schema for an activity log matched by full-text search."""
+    description: Optional[str] = None
+    score: float
+
+
+class ActivitySearchResponse(BaseModel):
+    """Schema for a page of search results."""
+    items: List[ActivitySearchResult]
+    next_cursor: Optional[str] = None
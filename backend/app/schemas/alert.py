@@ -34,6 +34,8 @@ class AlertResponse(AlertBase):
     is_resolved: bool
     resolved_at: Optional[datetime] = None
     created_at: datetime
+    occurrence_count: int = 1
+    last_seen_at: Optional[datetime] = None
     
     model_config = ConfigDict(from_attributes=True)
 
@@ -46,5 +48,7 @@ class AlertListResponse(BaseModel):
     severity: str
     is_resolved: bool
     created_at: datetime
+    occurrence_count: int = 1
+    last_seen_at: Optional[datetime] = None
     
     model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,37 @@
+# schemas/alert_rule.py
+# Pydantic schemas for AlertRule
+
+from pydantic import BaseModel
+from datetime import datetime
+from typing import Any, List, Optional
+
+
+class RuleCondition(BaseModel):
+    """A single rule condition, e.g. {"field": "risk_score", "op": ">=", "value": 5}."""
+    field: str
+    op: str = "=="
+    value: Any = None
+    window_seconds: Optional[float] = None  # only for field "count"
+
+
+class AlertRuleBase(BaseModel):
+    """Base alert rule schema with common fields."""
+    name: str
+    event_type: Optional[str] = None
+    conditions: List[RuleCondition] = []
+    severity: str = "medium"
+    alert_type: Optional[str] = None
+    message: Optional[str] = None
+    enabled: bool = True
+
+
+class AlertRuleCreate(AlertRuleBase):
+    """Schema for creating a new alert rule."""
+    pass
+
+
+class AlertRuleResponse(AlertRuleBase):
+    """Schema for alert rule response."""
+    id: Optional[int] = None
+    source: str = "database"  # builtin, file or database
+    created_at: Optional[datetime] = None
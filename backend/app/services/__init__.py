@@ -6,16 +6,59 @@ from app.services.risk_service import (
     evaluate_activity_risk,
     get_recent_high_risk_activities,
     get_risk_statistics,
+    get_risk_score_percentiles,
+    anomaly_detector,
 )
 from app.services.alert_service import (
     create_alert,
-    create_high_risk_alert,
-    get_active_alerts,
-    get_all_alerts,
+    create_anomaly_alert,
+    create_rule_alert,
+    list_alert_rows,
     resolve_alert,
+    delete_alert,
     get_alert_statistics,
+    adjust_alert_counter,
+    check_alert_counters,
+    ensure_alert_counters,
+    open_alert_index,
     ALERT_TYPES,
 )
+from app.services.rule_engine import (
+    rule_engine,
+    build_event,
+    compile_rule,
+    load_alert_rules,
+)
+from app.services.offline_service import offline_detector
+from app.services.rollup_service import (
+    record_activity,
+    backfill_rollups,
+    ensure_rollups,
+    get_rollup_statistics,
+)
+from app.services.activity_service import (
+    list_activity_rows,
+    get_activity_statistics,
+)
+from app.services.search_service import (
+    ensure_search_index,
+    rebuild_search_index,
+    search_activity,
+)
+from app.services.storage_service import (
+    migrate_activity_logs,
+    storage_report,
+)
+from app.services.timeseries_service import get_activity_timeseries
+from app.services.analytics_service import (
+    compute_agent_trends,
+    get_agent_trend,
+    get_fleet_trend_ranking,
+)
+from app.services.dashboard_service import (
+    get_dashboard_summary,
+    parse_summary_fields,
+)
 
 __all__ = [
     # Risk service
@@ -23,12 +66,50 @@ __all__ = [
     "evaluate_activity_risk",
     "get_recent_high_risk_activities",
     "get_risk_statistics",
+    "get_risk_score_percentiles",
+    "anomaly_detector",
     # Alert service
     "create_alert",
-    "create_high_risk_alert",
-    "get_active_alerts",
-    "get_all_alerts",
+    "create_anomaly_alert",
+    "create_rule_alert",
+    "list_alert_rows",
     "resolve_alert",
+    "delete_alert",
     "get_alert_statistics",
+    "adjust_alert_counter",
+    "check_alert_counters",
+    "ensure_alert_counters",
+    "open_alert_index",
     "ALERT_TYPES",
+    # Rule engine
+    "rule_engine",
+    "build_event",
+    "compile_rule",
+    "load_alert_rules",
+    # Offline detection
+    "offline_detector",
+    # Rollup service
+    "record_activity",
+    "backfill_rollups",
+    "ensure_rollups",
+    "get_rollup_statistics",
+    # Activity service
+    "list_activity_rows",
+    "get_activity_statistics",
+    # Search service
+    "ensure_search_index",
+    "rebuild_search_index",
+    "search_activity",
+    # Storage service
+    "migrate_activity_logs",
+    "storage_report",
+    # Timeseries service
+    "get_activity_timeseries",
+    # Analytics service
+    "compute_agent_trends",
+    "get_agent_trend",
+    "get_fleet_trend_ranking",
+    # Dashboard service
+    "get_dashboard_summary",
+    "parse_summary_fields",
 ]
@@ -0,0 +1,205 @@
+# services/activity_service.py
+# Activity log queries shared by the activity and dashboard routes
+
+import csv
+import io
+import json
+import zlib
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.activity_log import ActivityLog, activity_log_view
+from app.schemas.activity_log import ActivityLogListResponse
+from app.services.risk_service import get_risk_statistics, get_risk_score_percentiles
+from app.services.rollup_service import get_rollup_statistics
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+
+# Export formats and their media types
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+EXPORT_COLUMNS = [column.name for column in activity_log_view.columns]
+
+# Columns returned by the activity list endpoints
+LIST_COLUMNS = list(ActivityLogListResponse.model_fields)
+
+
+def list_activity_rows(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    risk_level: Optional[str] = None
+) -> List[dict]:
+    """
+    Get activity logs, newest first, as plain dicts of the list columns.
+    
+    Selects only the ActivityLogListResponse columns from
+    activity_log_view through Core, so no ORM entities or Pydantic models
+    are built; the rows come straight from the database, strings already
+    joined in, and can be JSON-encoded as they are.
+    
+    Args:
+        db: Database session
+        skip: Number of activities to skip
+        limit: Maximum number of activities to return
+        risk_level: Optional filter by risk level
+        
+    Returns:
+        List of dicts keyed by LIST_COLUMNS
+    """
+    # Page through activity_logs alone, then join the strings for that page
+    # only, so deep offsets do not pay for the lookups of the skipped rows
+    table = ActivityLog.__table__
+    page = select(table.c.id)
+    if risk_level:
+        page = page.where(table.c.risk_level == risk_level)
+    page = page.order_by(table.c.timestamp.desc()).offset(skip).limit(limit).subquery()
+    view = activity_log_view
+    stmt = (
+        select(*(view.c[name] for name in LIST_COLUMNS))
+        .join(page, page.c.id == view.c.id)
+        .order_by(view.c.timestamp.desc())
+    )
+    return [dict(zip(LIST_COLUMNS, row)) for row in db.execute(stmt)]
+
+
+def get_activity_statistics(
+    db: Session,
+    hours: int = 24,
+    percentiles: Optional[List[float]] = None
+) -> dict:
+    """
+    Get activity statistics for the specified time period.
+    
+    Served from the activity rollup buckets when ACTIVITY_ROLLUPS_ENABLED
+    is set; percentiles are always computed from raw rows.
+    
+    Args:
+        db: Database session
+        hours: Number of hours to look back
+        percentiles: Optional risk score percentiles to compute (0-100)
+        
+    Returns:
+        Dictionary with risk statistics
+    """
+    if not settings.ACTIVITY_ROLLUPS_ENABLED:
+        return get_risk_statistics(db, hours, percentiles)
+    
+    stats = get_rollup_statistics(db, hours)
+    if percentiles:
+        cutoff_time = datetime.utcnow() - timedelta(hours=hours)
+        stats["percentiles"] = get_risk_score_percentiles(
+            db, cutoff_time, percentiles, stats["total_activities"]
+        )
+    return stats
+
+
+def _json_default(value):
+    """JSON encoder fallback for datetimes in exported rows."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def iter_activity_export(
+    export_format: str = "ndjson",
+    compress: bool = False,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    agent_id: Optional[int] = None,
+    risk_level: Optional[str] = None,
+    batch_size: int = 1000
+) -> Iterator[bytes]:
+    """
+    Stream activity logs encoded as NDJSON or CSV, oldest first.
+    
+    Rows are read in keyset pages of ``batch_size`` (``(timestamp, id)``
+    after the last row sent), each in its own short transaction that
+    ends before the page is sent. A slow client therefore never holds a
+    read transaction open, which on SQLite would block ingest commits.
+    Pages are encoded straight from Core rows, without ORM entities or
+    Pydantic models, so memory stays flat regardless of how many rows
+    are exported. Rows committed during the export are included if they
+    sort after the rows already sent. The generator owns its session,
+    since it outlives the request's dependencies.
+    
+    Args:
+        export_format: ndjson or csv
+        compress: Gzip the output stream
+        start: Optional lower bound on timestamp (inclusive)
+        end: Optional upper bound on timestamp (exclusive)
+        agent_id: Optional filter by agent
+        risk_level: Optional filter by risk level
+        batch_size: Rows fetched and encoded per page
+        
+    Yields:
+        Encoded (and optionally gzip-compressed) chunks
+    """
+    table = activity_log_view
+    # Every writer sets a timestamp; a row without one could not be paged by it
+    stmt = select(*table.columns).where(table.c.timestamp.isnot(None))
+    if start is not None:
+        stmt = stmt.where(table.c.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(table.c.timestamp < end)
+    if agent_id is not None:
+        stmt = stmt.where(table.c.agent_id == agent_id)
+    if risk_level:
+        stmt = stmt.where(table.c.risk_level == risk_level)
+    stmt = stmt.order_by(table.c.timestamp, table.c.id).limit(batch_size)
+    
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    
+    def emit(chunk: str) -> bytes:
+        data = chunk.encode("utf-8")
+        return compressor.compress(data) if compressor else data
+    
+    db = SessionLocal()
+    
+    def pages() -> Iterator[list]:
+        page = stmt
+        while True:
+            rows = db.execute(page).all()
+            db.commit()
+            if rows:
+                yield rows
+            if len(rows) < batch_size:
+                return
+            last = rows[-1]
+            page = stmt.where(or_(
+                table.c.timestamp > last.timestamp,
+                and_(table.c.timestamp == last.timestamp, table.c.id > last.id)
+            ))
+            
+    try:
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            for rows in pages():
+                for row in rows:
+                    writer.writerow([
+                        value.isoformat() if isinstance(value, datetime) else value
+                        for value in row
+                    ])
+                yield emit(buffer.getvalue())
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield emit(buffer.getvalue())
+        else:
+            for rows in pages():
+                yield emit("".join(
+                    json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=_json_default) + "\n"
+                    for row in rows
+                ))
+        
+        if compressor:
+            yield compressor.flush()
+    finally:
+        db.close()
@@ -1,13 +1,26 @@
 # services/alert_service.py
 # Alert generation service
 
+import threading
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
+from app.core.database import insert_on_conflict
+from app.core.cache import response_cache
+from app.core.config import settings
+from app.core.events import event_broker
+from app.core.metrics import alerts_created_total
 from app.models.alert import Alert
+from app.models.alert_counter import AlertCounter
 from app.models.activity_log import ActivityLog
+from app.schemas.alert import AlertListResponse
 from datetime import datetime, timedelta
 from typing import List, Optional
 
 
+# Columns returned by the alert list endpoints
+LIST_COLUMNS = list(AlertListResponse.model_fields)
+
+
 # Alert types
 ALERT_TYPES = {
     "HIGH_RISK": "high_risk",
@@ -15,9 +28,117 @@ ALERT_TYPES = {
     "AGENT_OFFLINE": "agent_offline",
     "MULTIPLE_FAILED_LOGINS": "multiple_failed_logins",
     "CRITICAL_KEYWORD": "critical_keyword",
+    "RISK_ANOMALY": "risk_anomaly",
 }
 
 
+# Severity order, used when a repeat escalates an open alert
+SEVERITY_RANK = {
+    "low": 0,
+    "medium": 1,
+    "high": 2,
+    "critical": 3,
+}
+
+
+class OpenAlertIndex:
+    """
+    In-memory index of open alerts per (agent_id, alert_type).
+    
+    Lets create_alert find the open alert a repeat should be folded
+    into without querying the alerts table. Entries are added when an
+    alert is created, refreshed on every repeat and dropped when the
+    alert is resolved or deleted; stale entries simply age out of the
+    dedup window. Two workers racing on the first alert for a key may
+    both insert one, after which repeats fold into the newer alert.
+    """
+    
+    def __init__(self):
+        self._entries = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+        self.suppressed = 0
+        
+    def find(self, key: tuple, now: datetime) -> Optional[dict]:
+        """Return the open alert for ``key`` if it was seen within the window."""
+        window = timedelta(seconds=settings.ALERT_DEDUP_WINDOW_SECONDS)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or now - entry["last_seen"] > window:
+                return None
+            return dict(entry)
+            
+    def put(self, key: tuple, alert_id: int, severity: str, last_seen: datetime) -> None:
+        """Record the open alert for ``key``."""
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None:
+                self._keys.pop(previous["id"], None)
+            self._entries[key] = {"id": alert_id, "severity": severity, "last_seen": last_seen}
+            self._keys[alert_id] = key
+            
+    def touch(self, key: tuple, severity: str, last_seen: datetime) -> None:
+        """Refresh an entry after a repeat was folded into its alert."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["severity"] = severity
+                entry["last_seen"] = last_seen
+            self.suppressed += 1
+            
+    def discard(self, alert_id: int) -> None:
+        """Forget an alert (resolved, deleted or no longer open)."""
+        with self._lock:
+            key = self._keys.pop(alert_id, None)
+            if key is not None and self._entries.get(key, {}).get("id") == alert_id:
+                del self._entries[key]
+                
+    def load(self, db: Session) -> int:
+        """
+        Index the open alerts last seen within the dedup window.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Number of alerts indexed
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.ALERT_DEDUP_WINDOW_SECONDS)
+        last_seen = func.coalesce(Alert.last_seen_at, Alert.created_at)
+        rows = db.query(
+            Alert.id,
+            Alert.agent_id,
+            Alert.alert_type,
+            Alert.severity,
+            last_seen,
+        ).filter(
+            Alert.is_resolved == False,
+            Alert.agent_id.isnot(None),
+            last_seen >= cutoff
+        ).order_by(last_seen).all()
+        for alert_id, agent_id, alert_type, severity, seen in rows:
+            self.put((agent_id, alert_type), alert_id, severity or "medium", seen)
+        return len(rows)
+        
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._keys.clear()
+            
+    def stats(self) -> dict:
+        """Return index metrics."""
+        with self._lock:
+            return {
+                "window_seconds": settings.ALERT_DEDUP_WINDOW_SECONDS,
+                "open_alerts": len(self._entries),
+                "suppressed": self.suppressed,
+            }
+
+
+open_alert_index = OpenAlertIndex()
+
+
 def create_alert(
     db: Session,
     alert_type: str,
@@ -27,7 +148,13 @@ def create_alert(
     user_id: Optional[int] = None
 ) -> Alert:
     """
-    Create a new alert.
+    Create a new alert, or fold a repeat into the matching open alert.
+    
+    Agent alerts are deduplicated per (agent_id, alert_type): if an open
+    alert for the same key was seen within ALERT_DEDUP_WINDOW_SECONDS,
+    its ``occurrence_count`` and ``last_seen_at`` are updated instead of
+    inserting a row, and its severity is raised if the repeat is more
+    severe. The lookup uses the in-memory open alert index.
     
     Args:
         db: Database session
@@ -38,86 +165,200 @@ def create_alert(
         user_id: Optional user ID
         
     Returns:
-        Created Alert object
+        Created or updated Alert object
     """
+    now = datetime.utcnow()
+    dedupe = agent_id is not None and settings.ALERT_DEDUP_WINDOW_SECONDS > 0
+    
+    if dedupe:
+        entry = open_alert_index.find((agent_id, alert_type), now)
+        if entry is not None:
+            alert = record_alert_occurrence(db, (agent_id, alert_type), entry, severity, now)
+            if alert is not None:
+                return alert
+            
     alert = Alert(
         alert_type=alert_type,
         message=message,
         severity=severity,
         agent_id=agent_id,
-        user_id=user_id
+        user_id=user_id,
+        created_at=now
     )
     db.add(alert)
+    adjust_alert_counter(db, severity, False, 1)
     db.commit()
     db.refresh(alert)
+    if dedupe:
+        open_alert_index.put((agent_id, alert_type), alert.id, severity or "medium", now)
+    alerts_created_total.labels(alert_type, severity).inc()
+    response_cache.bump("alerts")
+    publish_alert_event("created", alert)
     return alert
 
 
-def create_high_risk_alert(
+def record_alert_occurrence(
     db: Session,
-    activity: ActivityLog,
-    risk_score: float
+    key: tuple,
+    entry: dict,
+    severity: str,
+    now: datetime
 ) -> Optional[Alert]:
     """
-    Create an alert for high-risk activity.
+    Count a repeat against an open alert with one ``UPDATE ... RETURNING``.
+    
+    Args:
+        db: Database session
+        key: (agent_id, alert_type) index key
+        entry: Open alert index entry
+        severity: Severity of the repeat
+        now: Time of the repeat
+        
+    Returns:
+        Updated Alert object, or None if the alert is no longer open
+    """
+    previous = entry["severity"]
+    if SEVERITY_RANK.get(severity, 1) <= SEVERITY_RANK.get(previous, 1):
+        severity = previous
+        
+    alert = db.scalars(
+        update(Alert)
+        .where(Alert.id == entry["id"], Alert.is_resolved == False)
+        .values(
+            occurrence_count=Alert.occurrence_count + 1,
+            last_seen_at=now,
+            severity=severity
+        )
+        .returning(Alert)
+        .execution_options(synchronize_session=False)
+    ).first()
+    
+    if alert is None:
+        db.rollback()
+        open_alert_index.discard(entry["id"])
+        return None
+        
+    if severity != previous:
+        adjust_alert_counter(db, previous, False, -1)
+        adjust_alert_counter(db, severity, False, 1)
+    payload = AlertListResponse.model_validate(alert)
+    db.commit()
+    
+    open_alert_index.touch(key, severity, now)
+    response_cache.bump("alerts")
+    publish_alert_event("updated", payload, previous_severity=previous)
+    return alert
+
+
+def publish_alert_event(action: str, alert: Alert, previous_severity: Optional[str] = None) -> None:
+    """
+    Push a committed alert change and its stats delta to stream subscribers.
+    
+    Args:
+        action: created, updated, resolved or deleted
+        alert: The alert that changed
+        previous_severity: Severity before an update escalated it
+    """
+    if not event_broker.has_subscribers:
+        return
+    if action == "created":
+        delta = {"total": 1, "active": 1, "resolved": 0}
+    elif action == "updated":
+        delta = {"total": 0, "active": 0, "resolved": 0}
+        if previous_severity and previous_severity != alert.severity:
+            delta["previous_severity"] = previous_severity
+    elif action == "resolved":
+        delta = {"total": 0, "active": -1, "resolved": 1}
+    elif alert.is_resolved:
+        delta = {"total": -1, "active": 0, "resolved": -1}
+    else:
+        delta = {"total": -1, "active": -1, "resolved": 0}
+    delta["severity"] = alert.severity
+    
+    event_broker.publish("alert", {
+        "action": action,
+        "alert": AlertListResponse.model_validate(alert),
+        "delta": delta,
+    })
+
+
+def create_anomaly_alert(
+    db: Session,
+    activity: ActivityLog,
+    anomaly: dict
+) -> Alert:
+    """
+    Create an alert for a risk score far above the agent's baseline.
     
     Args:
         db: Database session
         activity: The activity log that triggered the alert
-        risk_score: The risk score that triggered the alert
+        anomaly: Anomaly details from the anomaly detector
         
     Returns:
-        Created Alert object or None
+        Created Alert object
     """
-    severity = "critical" if risk_score >= 8.0 else "high"
+    severity = "high" if anomaly["zscore"] >= 2 * settings.ANOMALY_ZSCORE_THRESHOLD else "medium"
     
     message = (
-        f"High-risk activity detected: {activity.activity_type} "
-        f"(Risk Score: {risk_score}, Level: {activity.risk_level})"
+        f"Anomalous risk for agent: {activity.activity_type} scored {anomaly['risk_score']} "
+        f"against a baseline of {anomaly['baseline']} (z={anomaly['zscore']})"
     )
     
     return create_alert(
         db=db,
-        alert_type=ALERT_TYPES["HIGH_RISK"],
+        alert_type=ALERT_TYPES["RISK_ANOMALY"],
         message=message,
         severity=severity,
         agent_id=activity.agent_id
     )
 
 
-def get_active_alerts(
+def create_rule_alert(
     db: Session,
-    severity: Optional[str] = None,
-    limit: int = 100
-) -> List[Alert]:
+    activity: ActivityLog,
+    rule
+) -> Alert:
     """
-    Get active (unresolved) alerts.
+    Create an alert for an activity that matched an alert rule.
     
     Args:
         db: Database session
-        severity: Optional filter by severity
-        limit: Maximum number of alerts to return
+        activity: The activity log that matched
+        rule: The matching compiled rule (see rule_engine)
         
     Returns:
-        List of active alerts
+        Created or updated Alert object
     """
-    query = db.query(Alert).filter(Alert.is_resolved == False)
+    message = rule.format_message({
+        "agent": activity.user_id,
+        "event_type": activity.activity_type,
+        "app_name": activity.app_name,
+        "risk_score": activity.risk_score,
+        "risk_level": activity.risk_level,
+    })
     
-    if severity:
-        query = query.filter(Alert.severity == severity)
-    
-    return query.order_by(Alert.created_at.desc()).limit(limit).all()
+    return create_alert(
+        db=db,
+        alert_type=rule.alert_type,
+        message=message,
+        severity=rule.severity,
+        agent_id=activity.agent_id
+    )
 
 
-def get_all_alerts(
+def list_alert_rows(
     db: Session,
     skip: int = 0,
     limit: int = 100,
     is_resolved: Optional[bool] = None,
     severity: Optional[str] = None
-) -> List[Alert]:
+) -> List[dict]:
     """
-    Get all alerts with optional filters.
+    Get alerts, newest first, as plain dicts of the list columns.
+    
+    For read-only list endpoints: only the AlertListResponse columns are
+    selected and no ORM entities or Pydantic models are built.
     
     Args:
         db: Database session
@@ -127,17 +368,16 @@ def get_all_alerts(
         severity: Filter by severity
         
     Returns:
-        List of alerts
+        List of dicts keyed by LIST_COLUMNS
     """
-    query = db.query(Alert)
-    
+    table = Alert.__table__
+    stmt = select(*(table.c[name] for name in LIST_COLUMNS))
     if is_resolved is not None:
-        query = query.filter(Alert.is_resolved == is_resolved)
-    
+        stmt = stmt.where(table.c.is_resolved == is_resolved)
     if severity:
-        query = query.filter(Alert.severity == severity)
-    
-    return query.order_by(Alert.created_at.desc()).offset(skip).limit(limit).all()
+        stmt = stmt.where(table.c.severity == severity)
+    stmt = stmt.order_by(table.c.created_at.desc()).offset(skip).limit(limit)
+    return [dict(zip(LIST_COLUMNS, row)) for row in db.execute(stmt)]
 
 
 def resolve_alert(db: Session, alert_id: int) -> Optional[Alert]:
@@ -153,42 +393,172 @@ def resolve_alert(db: Session, alert_id: int) -> Optional[Alert]:
     """
     alert = db.query(Alert).filter(Alert.id == alert_id).first()
     if alert:
+        open_alert_index.discard(alert.id)
+        was_resolved = alert.is_resolved
+        if not was_resolved:
+            adjust_alert_counter(db, alert.severity, False, -1)
+            adjust_alert_counter(db, alert.severity, True, 1)
         alert.resolve()
         db.commit()
         db.refresh(alert)
+        response_cache.bump("alerts")
+        if not was_resolved:
+            publish_alert_event("resolved", alert)
     return alert
 
 
+def delete_alert(db: Session, alert_id: int) -> bool:
+    """
+    Delete an alert.
+    
+    Args:
+        db: Database session
+        alert_id: ID of the alert to delete
+        
+    Returns:
+        True if the alert was deleted, False if not found
+    """
+    alert = db.query(Alert).filter(Alert.id == alert_id).first()
+    if not alert:
+        return False
+    open_alert_index.discard(alert.id)
+    adjust_alert_counter(db, alert.severity, bool(alert.is_resolved), -1)
+    payload = AlertListResponse.model_validate(alert)
+    db.delete(alert)
+    db.commit()
+    response_cache.bump("alerts")
+    publish_alert_event("deleted", payload)
+    return True
+
+
+def adjust_alert_counter(
+    db: Session,
+    severity: Optional[str],
+    is_resolved: bool,
+    delta: int
+) -> None:
+    """
+    Add ``delta`` to the materialized alert counter for a severity/state.
+    
+    Runs an atomic UPSERT in the caller's transaction, so the counter
+    changes commit or roll back together with the alert itself.
+    
+    Args:
+        db: Database session
+        severity: Alert severity
+        is_resolved: Whether the counted alerts are resolved
+        delta: Amount to add (negative to subtract)
+    """
+    table = AlertCounter.__table__
+    stmt = insert_on_conflict(table).values(
+        severity=severity or "medium",
+        is_resolved=is_resolved,
+        count=delta
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["severity", "is_resolved"],
+        set_={"count": table.c.count + stmt.excluded.count}
+    )
+    db.execute(stmt)
+
+
+def check_alert_counters(db: Session, repair: bool = False) -> dict:
+    """
+    Recompute alert counters from the alerts table and compare.
+    
+    Args:
+        db: Database session
+        repair: Overwrite the stored counters with the recomputed values
+        
+    Returns:
+        Dictionary with a consistency flag and any mismatched counters
+    """
+    # Alerts without a severity are counted as "medium", like create_alert
+    expected = {}
+    for severity, is_resolved, count in db.query(
+        Alert.severity,
+        Alert.is_resolved,
+        func.count(Alert.id)
+    ).group_by(Alert.severity, Alert.is_resolved).all():
+        key = (severity or "medium", bool(is_resolved))
+        expected[key] = expected.get(key, 0) + count
+    
+    stored = {
+        (counter.severity, counter.is_resolved): counter.count
+        for counter in db.query(AlertCounter).all()
+    }
+    
+    mismatches = [
+        {
+            "severity": severity,
+            "is_resolved": is_resolved,
+            "stored": stored.get((severity, is_resolved), 0),
+            "actual": expected.get((severity, is_resolved), 0),
+        }
+        for severity, is_resolved in sorted(set(expected) | set(stored))
+        if stored.get((severity, is_resolved), 0) != expected.get((severity, is_resolved), 0)
+    ]
+    
+    if repair and mismatches:
+        db.query(AlertCounter).delete()
+        for (severity, is_resolved), count in expected.items():
+            db.add(AlertCounter(severity=severity, is_resolved=is_resolved, count=count))
+        db.commit()
+    
+    return {
+        "consistent": not mismatches,
+        "repaired": bool(repair and mismatches),
+        "mismatches": mismatches,
+    }
+
+
+def ensure_alert_counters(db: Session) -> bool:
+    """
+    Rebuild alert counters if none are stored but alerts exist.
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        True if the counters were rebuilt
+    """
+    if db.query(AlertCounter.severity).first() is not None:
+        return False
+    if db.query(Alert.id).first() is None:
+        return False
+    check_alert_counters(db, repair=True)
+    print("Rebuilt alert counters")
+    return True
+
+
 def get_alert_statistics(db: Session) -> dict:
     """
     Get alert statistics.
     
+    Reads the materialized counters maintained by create_alert,
+    resolve_alert and delete_alert (one row per severity and state)
+    instead of counting the alerts table.
+    
     Args:
         db: Database session
         
     Returns:
         Dictionary with alert statistics
     """
-    total = db.query(Alert).count()
-    active = db.query(Alert).filter(Alert.is_resolved == False).count()
-    resolved = db.query(Alert).filter(Alert.is_resolved == True).count()
-    
-    critical = db.query(Alert).filter(
-        Alert.severity == "critical",
-        Alert.is_resolved == False
-    ).count()
+    active = 0
+    resolved = 0
+    by_severity = {"critical": 0, "high": 0}
     
-    high = db.query(Alert).filter(
-        Alert.severity == "high",
-        Alert.is_resolved == False
-    ).count()
+    for counter in db.query(AlertCounter).all():
+        if counter.is_resolved:
+            resolved += counter.count
+        else:
+            active += counter.count
+            by_severity[counter.severity] = by_severity.get(counter.severity, 0) + counter.count
     
     return {
-        "total": total,
+        "total": active + resolved,
         "active": active,
         "resolved": resolved,
-        "by_severity": {
-            "critical": critical,
-            "high": high
-        }
+        "by_severity": by_severity
     }
@@ -0,0 +1,396 @@
+# services/analytics_service.py
+# Vectorized per-agent risk trend analytics (EWMA, rolling z-scores, week-over-week)
+
+import calendar
+import itertools
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import Float, Integer, cast, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings, is_postgresql
+from app.core.lazy import lazy_import
+from app.models.activity_log import ActivityLog
+from app.models.agent import Agent
+
+# numpy is only needed once a trend endpoint is called
+np = lazy_import("numpy")
+
+
+HOUR = 3600
+WEEK_HOURS = 7 * 24
+
+# Fields agents can be ranked by in the fleet view
+RANK_FIELDS = ("ewma", "zscore", "wow_change", "events")
+
+# Rows fetched per round trip when loading arrays
+FETCH_BATCH_SIZE = 100_000
+
+
+def _epoch_seconds(column):
+    """SQL expression for a timestamp column as seconds since the epoch."""
+    if is_postgresql():
+        return cast(func.extract("epoch", column), Float)
+    return cast(func.strftime("%s", column), Integer)
+
+
+def load_activity_arrays(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    agent_id: Optional[int] = None
+) -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """
+    Load (agent_id, epoch seconds, risk_score) for [start, end) as arrays.
+    
+    Runs a single query on the session's connection (bypassing the ORM
+    result layer) and copies each fetched batch straight into a flat
+    float buffer, so no ORM objects or per-row dicts are built.
+    Rows without an agent or timestamp are skipped; a NULL risk score
+    counts as 0.
+    
+    Args:
+        db: Database session
+        start: Window start (inclusive)
+        end: Window end (exclusive)
+        agent_id: Optional filter to a single agent
+        
+    Returns:
+        Tuple of contiguous (agent_ids int64, epochs float64, scores float64)
+    """
+    stmt = select(
+        ActivityLog.agent_id,
+        _epoch_seconds(ActivityLog.timestamp),
+        func.coalesce(ActivityLog.risk_score, 0.0),
+    ).where(
+        ActivityLog.agent_id.isnot(None),
+        ActivityLog.timestamp >= start,
+        ActivityLog.timestamp < end
+    )
+    if agent_id is not None:
+        stmt = stmt.where(ActivityLog.agent_id == agent_id)
+        
+    chunks = []
+    result = db.connection().execute(stmt.execution_options(yield_per=FETCH_BATCH_SIZE))
+    for partition in result.partitions():
+        flat = np.fromiter(
+            itertools.chain.from_iterable(partition),
+            dtype=np.float64,
+            count=3 * len(partition)
+        )
+        chunks.append(flat.reshape(-1, 3))
+        
+    if not chunks:
+        empty = np.empty(0, dtype=np.float64)
+        return np.empty(0, dtype=np.int64), empty, empty.copy()
+        
+    data = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+    return (
+        data[:, 0].astype(np.int64),
+        np.ascontiguousarray(data[:, 1]),
+        np.ascontiguousarray(data[:, 2]),
+    )
+
+
+def compute_agent_trends(
+    agent_ids: "np.ndarray",
+    epochs: "np.ndarray",
+    scores: "np.ndarray",
+    start_epoch: int,
+    hours: int,
+    alpha: float = 0.1,
+    zscore_window: int = 24
+) -> dict:
+    """
+    Compute hourly risk trends for every agent at once.
+    
+    Events are scattered into (agent x hour) count, sum and sum-of-squares
+    matrices with ``np.bincount``; everything else is column or window
+    arithmetic on those matrices, so the cost is one O(rows) pass plus
+    O(agents x hours).
+    
+    - ``ewma``: exponentially weighted mean of the hourly mean risk score,
+      carried forward through hours without activity.
+    - ``zscores``: how far each hour's mean is from the previous
+      ``zscore_window`` hours, in standard deviations of the individual
+      scores in that window.
+    - ``wow_change``: relative change of the mean risk score over the
+      last 7 days against the 7 days before.
+      
+    Args:
+        agent_ids: Agent id per event
+        epochs: Event time in seconds since the epoch
+        scores: Risk score per event
+        start_epoch: Start of the first hour (aligned to the hour)
+        hours: Number of hourly buckets
+        alpha: EWMA smoothing factor (0 < alpha <= 1)
+        zscore_window: Baseline window for z-scores in hours
+        
+    Returns:
+        Dictionary with the agent ids and (agents x hours) matrices plus
+        per-agent summary arrays
+    """
+    hour_index = ((epochs - start_epoch) // HOUR).astype(np.int64)
+    in_window = (hour_index >= 0) & (hour_index < hours)
+    if not in_window.all():
+        agent_ids, hour_index, scores = agent_ids[in_window], hour_index[in_window], scores[in_window]
+        
+    # Map sparse agent ids to dense row numbers without sorting
+    if len(agent_ids):
+        present = np.bincount(agent_ids) > 0
+        agents = np.flatnonzero(present)
+        row_of = np.cumsum(present) - 1
+        rows = row_of[agent_ids]
+    else:
+        agents = np.empty(0, dtype=np.int64)
+        rows = agent_ids
+        
+    n_agents = len(agents)
+    shape = (n_agents, hours)
+    cell = rows * hours + hour_index
+    size = n_agents * hours
+    counts = np.bincount(cell, minlength=size).reshape(shape).astype(np.float64)
+    sums = np.bincount(cell, weights=scores, minlength=size).reshape(shape)
+    squares = np.bincount(cell, weights=scores * scores, minlength=size).reshape(shape)
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        means = np.where(counts > 0, sums / counts, np.nan)
+        
+        # EWMA across hours, vectorized over agents
+        ewma = np.empty(shape)
+        previous = np.full(n_agents, np.nan)
+        for hour in range(hours):
+            value = means[:, hour]
+            active = counts[:, hour] > 0
+            updated = np.where(np.isnan(previous), value, alpha * value + (1 - alpha) * previous)
+            previous = np.where(active, updated, previous)
+            ewma[:, hour] = previous
+            
+        # Trailing window totals from prefix sums (window excludes the current hour)
+        def trailing(matrix):
+            prefix = np.zeros((n_agents, hours + 1))
+            np.cumsum(matrix, axis=1, out=prefix[:, 1:])
+            stop = np.arange(hours)
+            begin = np.maximum(stop - zscore_window, 0)
+            return prefix[:, stop] - prefix[:, begin]
+            
+        window_counts = trailing(counts)
+        window_means = trailing(sums) / window_counts
+        window_var = trailing(squares) / window_counts - window_means ** 2
+        window_std = np.sqrt(np.maximum(window_var, 0.0))
+        valid = (counts > 0) & (window_counts > 1) & (window_std > 1e-9)
+        zscores = np.where(valid, (means - window_means) / window_std, np.nan)
+        
+        # Week over week
+        if hours >= 2 * WEEK_HOURS:
+            last = slice(hours - WEEK_HOURS, hours)
+            before = slice(hours - 2 * WEEK_HOURS, hours - WEEK_HOURS)
+            last_week = sums[:, last].sum(axis=1) / counts[:, last].sum(axis=1)
+            prev_week = sums[:, before].sum(axis=1) / counts[:, before].sum(axis=1)
+            wow_change = (last_week - prev_week) / prev_week
+            wow_change[~np.isfinite(wow_change)] = np.nan
+        else:
+            last_week = prev_week = wow_change = np.full(n_agents, np.nan)
+            
+    # Most recent z-score per agent
+    has_z = ~np.isnan(zscores)
+    last_z_hour = hours - 1 - np.argmax(has_z[:, ::-1], axis=1)
+    latest_zscore = np.where(
+        has_z.any(axis=1),
+        zscores[np.arange(n_agents), last_z_hour] if n_agents else np.empty(0),
+        np.nan
+    )
+    
+    return {
+        "agents": agents,
+        "counts": counts,
+        "means": means,
+        "ewma": ewma,
+        "zscores": zscores,
+        "events": counts.sum(axis=1),
+        "latest_ewma": ewma[:, -1] if hours else np.full(n_agents, np.nan),
+        "latest_zscore": latest_zscore,
+        "last_week_mean": last_week,
+        "prev_week_mean": prev_week,
+        "wow_change": wow_change,
+    }
+
+
+def _window(days: Optional[int], now: Optional[datetime] = None) -> Tuple[datetime, datetime, int]:
+    """
+    Hour-aligned [start, end) covering ``days`` and the current hour.
+    
+    Raises:
+        ValueError: If days is not between 1 and ANALYTICS_MAX_DAYS
+    """
+    if days is None:
+        days = settings.ANALYTICS_WINDOW_DAYS
+    if not 1 <= days <= settings.ANALYTICS_MAX_DAYS:
+        raise ValueError(f"days must be between 1 and {settings.ANALYTICS_MAX_DAYS}")
+    now = now or datetime.utcnow()
+    end = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    start = end - timedelta(days=days)
+    return start, end, days * 24
+
+
+def _to_list(values: "np.ndarray", digits: int = 3) -> list:
+    """Convert an array to a JSON-safe list (NaN becomes None)."""
+    rounded = np.round(values, digits)
+    return [None if np.isnan(v) else float(v) for v in rounded]
+
+
+def _to_value(value: float, digits: int = 3) -> Optional[float]:
+    """Convert a scalar to a JSON-safe float (NaN becomes None)."""
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+def get_agent_trend(
+    db: Session,
+    agent_id: int,
+    days: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> dict:
+    """
+    Get the hourly risk trend of one agent.
+    
+    Args:
+        db: Database session
+        agent_id: Agent to analyze
+        days: Lookback in days (defaults to ANALYTICS_WINDOW_DAYS)
+        now: Optional reference time (defaults to the current UTC time)
+        
+    Returns:
+        Dictionary with hourly timestamps, counts, mean risk, EWMA and
+        z-score series, plus summary values
+        
+    Raises:
+        ValueError: If days is not between 1 and ANALYTICS_MAX_DAYS
+    """
+    start, end, hours = _window(days, now)
+    start_epoch = calendar.timegm(start.utctimetuple())
+    
+    agent_ids, epochs, scores = load_activity_arrays(db, start, end, agent_id)
+    trends = compute_agent_trends(
+        agent_ids,
+        epochs,
+        scores,
+        start_epoch,
+        hours,
+        settings.ANALYTICS_EWMA_ALPHA,
+        settings.ANALYTICS_ZSCORE_WINDOW_HOURS
+    )
+    
+    if len(trends["agents"]):
+        row = {key: value[0] for key, value in trends.items() if key != "agents"}
+    else:
+        nan_series = np.full(hours, np.nan)
+        row = {
+            "counts": np.zeros(hours),
+            "means": nan_series,
+            "ewma": nan_series,
+            "zscores": nan_series,
+            "events": 0.0,
+            "latest_ewma": np.nan,
+            "latest_zscore": np.nan,
+            "last_week_mean": np.nan,
+            "prev_week_mean": np.nan,
+            "wow_change": np.nan,
+        }
+        
+    return {
+        "agent_id": agent_id,
+        "start": start,
+        "end": end,
+        "timestamps": [start + timedelta(hours=h) for h in range(hours)],
+        "counts": [int(c) for c in row["counts"]],
+        "mean_risk": _to_list(row["means"]),
+        "ewma": _to_list(row["ewma"]),
+        "zscore": _to_list(row["zscores"]),
+        "summary": {
+            "events": int(row["events"]),
+            "ewma": _to_value(row["latest_ewma"]),
+            "zscore": _to_value(row["latest_zscore"]),
+            "last_week_mean": _to_value(row["last_week_mean"]),
+            "prev_week_mean": _to_value(row["prev_week_mean"]),
+            "wow_change": _to_value(row["wow_change"]),
+        },
+    }
+
+
+def get_fleet_trend_ranking(
+    db: Session,
+    sort_by: str = "ewma",
+    limit: int = 20,
+    days: Optional[int] = None,
+    now: Optional[datetime] = None
+) -> dict:
+    """
+    Rank all agents by a risk trend metric.
+    
+    Args:
+        db: Database session
+        sort_by: ewma, zscore, wow_change or events (descending)
+        limit: Maximum number of agents to return
+        days: Lookback in days (defaults to ANALYTICS_WINDOW_DAYS)
+        now: Optional reference time (defaults to the current UTC time)
+        
+    Returns:
+        Dictionary with the window and the ranked agents
+        
+    Raises:
+        ValueError: If sort_by is not a rankable field or days is out of range
+    """
+    if sort_by not in RANK_FIELDS:
+        raise ValueError(f"sort_by must be one of: {', '.join(RANK_FIELDS)}")
+        
+    start, end, hours = _window(days, now)
+    start_epoch = calendar.timegm(start.utctimetuple())
+    
+    agent_ids, epochs, scores = load_activity_arrays(db, start, end)
+    trends = compute_agent_trends(
+        agent_ids,
+        epochs,
+        scores,
+        start_epoch,
+        hours,
+        settings.ANALYTICS_EWMA_ALPHA,
+        settings.ANALYTICS_ZSCORE_WINDOW_HOURS
+    )
+    
+    key = {
+        "ewma": trends["latest_ewma"],
+        "zscore": trends["latest_zscore"],
+        "wow_change": trends["wow_change"],
+        "events": trends["events"],
+    }[sort_by]
+    # Descending, agents without a value last
+    order = np.lexsort((-np.nan_to_num(key, nan=0.0), np.isnan(key)))[:limit]
+    
+    agents = trends["agents"][order]
+    names = dict(
+        db.query(Agent.id, Agent.name).filter(Agent.id.in_([int(a) for a in agents])).all()
+    ) if len(agents) else {}
+    
+    ranking = []
+    for rank, index in enumerate(order, start=1):
+        agent_id = int(trends["agents"][index])
+        ranking.append({
+            "rank": rank,
+            "agent_id": agent_id,
+            "agent_name": names.get(agent_id),
+            "events": int(trends["events"][index]),
+            "ewma": _to_value(trends["latest_ewma"][index]),
+            "zscore": _to_value(trends["latest_zscore"][index]),
+            "last_week_mean": _to_value(trends["last_week_mean"][index]),
+            "prev_week_mean": _to_value(trends["prev_week_mean"][index]),
+            "wow_change": _to_value(trends["wow_change"][index]),
+        })
+        
+    return {
+        "start": start,
+        "end": end,
+        "sort_by": sort_by,
+        "agents_analyzed": len(trends["agents"]),
+        "ranking": ranking,
+    }
@@ -0,0 +1,113 @@
+# services/dashboard_service.py
+# Consolidated dashboard summary
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.orm import Session
+from app.core.config import settings, is_postgresql
+from app.core.database import SessionLocal
+from app.services.activity_service import list_activity_rows, get_activity_statistics
+from app.services.alert_service import list_alert_rows, get_alert_statistics
+from datetime import datetime
+from typing import Iterable, Optional
+
+
+# Summary sections: name -> function(db, options) returning a JSON-ready value
+SUMMARY_FIELDS = {
+    "risk_stats": lambda db, options: get_activity_statistics(db, options["hours"]),
+    "recent_activity": lambda db, options: list_activity_rows(db, limit=options["activity_limit"]),
+    "alert_stats": lambda db, options: get_alert_statistics(db),
+    "active_alerts": lambda db, options: list_alert_rows(
+        db, limit=options["alert_limit"], is_resolved=False
+    ),
+}
+
+# Worker pool for running sections concurrently on PostgreSQL
+_executor = ThreadPoolExecutor(
+    max_workers=len(SUMMARY_FIELDS),
+    thread_name_prefix="dashboard-summary"
+)
+
+
+def parse_summary_fields(fields: Optional[str]) -> list:
+    """
+    Parse a comma-separated ``fields=`` selector.
+    
+    Args:
+        fields: Comma-separated section names, or None for all sections
+        
+    Returns:
+        List of section names
+        
+    Raises:
+        ValueError: If an unknown section is requested
+    """
+    if not fields:
+        return list(SUMMARY_FIELDS)
+    
+    selected = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in selected if f not in SUMMARY_FIELDS]
+    if unknown:
+        raise ValueError(
+            f"Unknown fields: {', '.join(unknown)}. "
+            f"Valid fields: {', '.join(SUMMARY_FIELDS)}"
+        )
+    return list(dict.fromkeys(selected))
+
+
+def _compute_in_own_session(name: str, options: dict):
+    """Compute one section with a dedicated session (worker thread)."""
+    db = SessionLocal()
+    try:
+        return SUMMARY_FIELDS[name](db, options)
+    finally:
+        db.close()
+
+
+def get_dashboard_summary(
+    db: Session,
+    fields: Iterable[str],
+    hours: int = 24,
+    activity_limit: int = 10,
+    alert_limit: int = 100
+) -> dict:
+    """
+    Get everything the dashboard shows in one call.
+    
+    Sections run sequentially in the request's session. On PostgreSQL,
+    when DASHBOARD_CONCURRENT_QUERIES is set, independent sections run in
+    parallel, each on its own pooled connection; SQLite serializes
+    access to the file anyway, so there they stay in one session.
+    
+    Args:
+        db: Database session
+        fields: Section names to include (see SUMMARY_FIELDS)
+        hours: Number of hours covered by risk_stats
+        activity_limit: Number of rows in recent_activity
+        alert_limit: Maximum number of rows in active_alerts
+        
+    Returns:
+        Dictionary with one key per requested section
+    """
+    fields = list(fields)
+    options = {
+        "hours": hours,
+        "activity_limit": activity_limit,
+        "alert_limit": alert_limit,
+    }
+    
+    summary = {"generated_at": datetime.utcnow()}
+    
+    if len(fields) > 1 and is_postgresql() and settings.DASHBOARD_CONCURRENT_QUERIES:
+        # Run in a copy of the request context so the query profiler sees these
+        futures = {
+            name: _executor.submit(contextvars.copy_context().run, _compute_in_own_session, name, options)
+            for name in fields
+        }
+        for name, future in futures.items():
+            summary[name] = future.result()
+    else:
+        for name in fields:
+            summary[name] = SUMMARY_FIELDS[name](db, options)
+    
+    return summary
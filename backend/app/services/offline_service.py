@@ -0,0 +1,248 @@
+# services/offline_service.py
+# Agent offline detection with an in-memory deadline heap
+
+import calendar
+import heapq
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.agent import Agent
+from app.models.alert import Alert
+from app.services.alert_service import create_alert, resolve_alert, ALERT_TYPES
+
+
+class OfflineDetector:
+    """
+    Raises and auto-resolves ``agent_offline`` alerts.
+    
+    Every online agent has exactly one entry in a min-heap of
+    (deadline, agent_id). Ingest only records the agent's last-seen time
+    (O(1)); the heap entry is corrected lazily when it reaches the top:
+    if the agent was seen since, it is pushed back with its real
+    deadline, otherwise the agent has gone offline. Each event therefore
+    costs at most one O(log n) heap operation, and the scheduler thread
+    sleeps until the earliest deadline instead of scanning all agents.
+    
+    An agent reporting again after going offline is handed back to the
+    scheduler, which resolves its alert and re-arms its deadline.
+    """
+    
+    def __init__(self, timeout_seconds: float):
+        self.timeout_seconds = timeout_seconds
+        self._heap = []
+        self._last_seen = {}
+        self._scheduled = set()
+        self._offline = {}  # agent_id -> open alert id (or None)
+        self._recovered = []
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread: Optional[threading.Thread] = None
+        self.alerts_raised = 0
+        self.alerts_resolved = 0
+        
+    def touch(self, agent_id: int, now: Optional[float] = None) -> None:
+        """
+        Record that an agent reported in.
+        
+        Args:
+            agent_id: Agent that sent activity
+            now: Optional epoch time of the report (defaults to now)
+        """
+        now = time.time() if now is None else now
+        with self._cond:
+            self._last_seen[agent_id] = now
+            if agent_id in self._offline:
+                self._recovered.append((agent_id, self._offline.pop(agent_id)))
+                self._schedule(agent_id, now + self.timeout_seconds)
+                self._cond.notify()
+            elif agent_id not in self._scheduled:
+                self._schedule(agent_id, now + self.timeout_seconds)
+                
+    def forget(self, agent_id: int) -> None:
+        """Stop tracking a deleted agent (its heap entry is dropped lazily)."""
+        with self._cond:
+            self._last_seen.pop(agent_id, None)
+            self._scheduled.discard(agent_id)
+            self._offline.pop(agent_id, None)
+            
+    def _schedule(self, agent_id: int, deadline: float) -> None:
+        wake = not self._heap or deadline < self._heap[0][0]
+        heapq.heappush(self._heap, (deadline, agent_id))
+        self._scheduled.add(agent_id)
+        if wake:
+            self._cond.notify()
+            
+    def load(self, db: Session) -> int:
+        """
+        Restore tracking state from the database.
+        
+        Active agents are scheduled from their ``last_seen``; agents
+        with an open agent_offline alert (or status ``offline``) start
+        out offline.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Number of agents tracked
+        """
+        open_alerts = dict(
+            db.query(Alert.agent_id, Alert.id).filter(
+                Alert.alert_type == ALERT_TYPES["AGENT_OFFLINE"],
+                Alert.is_resolved == False,
+                Alert.agent_id.isnot(None)
+            ).order_by(Alert.id).all()
+        )
+        rows = db.query(Agent.id, Agent.status, Agent.last_seen).filter(
+            Agent.status.in_(["active", "offline"])
+        ).all()
+        
+        with self._cond:
+            for agent_id, status, last_seen in rows:
+                if agent_id in self._last_seen:
+                    continue
+                seen = calendar.timegm(last_seen.utctimetuple()) if last_seen else time.time()
+                self._last_seen[agent_id] = seen
+                if status == "offline" or agent_id in open_alerts:
+                    self._offline[agent_id] = open_alerts.get(agent_id)
+                else:
+                    self._schedule(agent_id, seen + self.timeout_seconds)
+        return len(rows)
+        
+    def _collect(self, now: float) -> List[int]:
+        """Pop agents whose deadline passed (caller holds the lock)."""
+        expired = []
+        while self._heap and self._heap[0][0] <= now:
+            _, agent_id = heapq.heappop(self._heap)
+            if agent_id not in self._scheduled:
+                continue  # forgotten agent
+            deadline = self._last_seen[agent_id] + self.timeout_seconds
+            if deadline > now:
+                heapq.heappush(self._heap, (deadline, agent_id))
+                continue
+            self._scheduled.discard(agent_id)
+            self._offline[agent_id] = None
+            expired.append(agent_id)
+        return expired
+        
+    def run_once(self, now: Optional[float] = None) -> dict:
+        """
+        Raise alerts for expired agents and resolve recovered ones.
+        
+        Args:
+            now: Optional epoch time (defaults to now)
+            
+        Returns:
+            Dictionary with the agents marked offline and recovered
+        """
+        now = time.time() if now is None else now
+        with self._cond:
+            expired = self._collect(now)
+            recovered, self._recovered = self._recovered, []
+        if not expired and not recovered:
+            return {"offline": [], "recovered": []}
+            
+        db = SessionLocal()
+        try:
+            for agent_id in expired:
+                self._mark_offline(db, agent_id, now)
+            for agent_id, alert_id in recovered:
+                self._mark_online(db, agent_id, alert_id)
+        finally:
+            db.close()
+        return {"offline": expired, "recovered": [agent_id for agent_id, _ in recovered]}
+        
+    def _mark_offline(self, db: Session, agent_id: int, now: float) -> None:
+        result = db.execute(
+            update(Agent).where(Agent.id == agent_id, Agent.status == "active").values(status="offline")
+        )
+        if result.rowcount == 0:
+            db.rollback()
+            self.forget(agent_id)
+            return
+        db.commit()
+        
+        minutes = round((now - self._last_seen.get(agent_id, now)) / 60)
+        alert = create_alert(
+            db=db,
+            alert_type=ALERT_TYPES["AGENT_OFFLINE"],
+            message=f"Agent {agent_id} has not reported for {minutes} minutes",
+            severity="medium",
+            agent_id=agent_id
+        )
+        self.alerts_raised += 1
+        with self._cond:
+            if agent_id in self._offline:
+                self._offline[agent_id] = alert.id
+            else:
+                # Came back while the alert was being written
+                self._recovered.append((agent_id, alert.id))
+                self._cond.notify()
+                
+    def _mark_online(self, db: Session, agent_id: int, alert_id: Optional[int]) -> None:
+        db.execute(
+            update(Agent).where(Agent.id == agent_id, Agent.status == "offline").values(status="active")
+        )
+        db.commit()
+        if alert_id is not None and resolve_alert(db, alert_id) is not None:
+            self.alerts_resolved += 1
+            
+    def start(self) -> None:
+        """Start the scheduler thread (no-op if already running)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop = False
+        self._thread = threading.Thread(target=self._loop, name="offline-detector", daemon=True)
+        self._thread.start()
+        
+    def stop(self) -> None:
+        """Signal the scheduler to stop and wait briefly for it."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(timeout=5)
+            
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                if self._stop:
+                    return
+                if not self._recovered:
+                    now = time.time()
+                    wait = self._heap[0][0] - now if self._heap else None
+                    if wait is None or wait > 0:
+                        self._cond.wait(timeout=min(wait, 60.0) if wait is not None else 60.0)
+                if self._stop:
+                    return
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"offline-detector run failed: {e}")
+                time.sleep(1.0)
+                
+    def stats(self) -> dict:
+        """Return detector metrics."""
+        with self._cond:
+            next_deadline = self._heap[0][0] if self._heap else None
+            return {
+                "enabled": settings.AGENT_OFFLINE_ENABLED,
+                "timeout_seconds": self.timeout_seconds,
+                "tracked": len(self._last_seen),
+                "online": len(self._scheduled),
+                "offline": len(self._offline),
+                "heap_size": len(self._heap),
+                "next_deadline": datetime.utcfromtimestamp(next_deadline) if next_deadline else None,
+                "alerts_raised": self.alerts_raised,
+                "alerts_resolved": self.alerts_resolved,
+            }
+
+
+offline_detector = OfflineDetector(settings.AGENT_OFFLINE_TIMEOUT_SECONDS)
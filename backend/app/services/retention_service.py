@@ -0,0 +1,335 @@
+# services/retention_service.py
+# Activity log retention: archive old rows to date-partitioned files, then purge
+
+import gzip
+import importlib.util
+import json
+import os
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional
+
+from sqlalchemy import delete, select, text
+from sqlalchemy.orm import Session
+
+from app.core.cache import response_cache
+from app.core.config import settings, is_postgresql
+from app.core.database import SessionLocal
+from app.core.lazy import lazy_import
+from app.core.worker import PeriodicWorker
+from app.models.activity_log import ActivityLog, activity_log_view
+from app.services.rollup_service import discard_rollups_before
+from app.services.timeseries_service import closed_bucket_cache
+
+# Loaded on the first archive write or read, so importing the app does not pay for pyarrow
+pa = lazy_import("pyarrow")
+pq = lazy_import("pyarrow.parquet")
+# Parquet archives are optional; without pyarrow they fall back to gzip'd columnar JSON
+PARQUET_AVAILABLE = importlib.util.find_spec("pyarrow") is not None
+
+
+ARCHIVE_TABLE = "activity_logs"
+# Archives keep the strings, as activity_log_view reads them
+ARCHIVE_COLUMNS = [column.name for column in activity_log_view.columns]
+
+
+def _partition_dir(archive_dir: str, day: date) -> str:
+    """Directory holding the archive files for one day."""
+    return os.path.join(archive_dir, ARCHIVE_TABLE, f"date={day.isoformat()}")
+
+
+def write_partition(archive_dir: str, day: date, rows: list) -> str:
+    """
+    Write one chunk of activity rows for a single day as a columnar file.
+    
+    Uses Parquet (zstd) when pyarrow is installed, otherwise gzip'd JSON
+    with one array per column. The file is written under a temporary
+    name and renamed, so readers never see a partial file.
+    
+    Args:
+        archive_dir: Root archive directory
+        day: Day the rows belong to
+        rows: Rows with the ActivityLog columns as attributes
+        
+    Returns:
+        Path of the written file
+    """
+    directory = _partition_dir(archive_dir, day)
+    os.makedirs(directory, exist_ok=True)
+    
+    ids = [row.id for row in rows]
+    name = f"part-{min(ids)}-{max(ids)}"
+    columns = {column: [getattr(row, column) for row in rows] for column in ARCHIVE_COLUMNS}
+    
+    if PARQUET_AVAILABLE:
+        path = os.path.join(directory, name + ".parquet")
+        tmp_path = path + ".tmp"
+        pq.write_table(pa.table(columns), tmp_path, compression="zstd")
+    else:
+        path = os.path.join(directory, name + ".json.gz")
+        tmp_path = path + ".tmp"
+        columns["timestamp"] = [
+            value.isoformat() if value is not None else None
+            for value in columns["timestamp"]
+        ]
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump({"columns": columns}, f, separators=(",", ":"))
+            
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_partition_file(path: str) -> Iterator[dict]:
+    """Yield the rows stored in one archive file as dictionaries."""
+    if path.endswith(".parquet"):
+        if not PARQUET_AVAILABLE:
+            raise RuntimeError(f"pyarrow is required to read {path}")
+        yield from pq.read_table(path).to_pylist()
+        return
+        
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        columns = json.load(f)["columns"]
+    names = list(columns)
+    for values in zip(*(columns[name] for name in names)):
+        row = dict(zip(names, values))
+        if row["timestamp"] is not None:
+            row["timestamp"] = datetime.fromisoformat(row["timestamp"])
+        yield row
+
+
+def archive_and_purge(
+    db: Session,
+    cutoff: datetime,
+    archive_dir: str,
+    chunk_size: int = 5000,
+    pause_seconds: float = 0.0
+) -> int:
+    """
+    Move activity logs older than ``cutoff`` to archive files.
+    
+    Rows are processed oldest first in chunks of ``chunk_size``; each
+    chunk is written to its day partitions and then deleted in its own
+    short transaction, so ingest is never blocked for long. A crash
+    between writing and deleting re-archives that chunk on the next run
+    (at-least-once). Rollup buckets before the cutoff are then dropped,
+    on every run, so one interrupted before that step is caught up.
+    
+    Args:
+        db: Database session
+        cutoff: Rows with a timestamp before this are archived
+        archive_dir: Root archive directory
+        chunk_size: Rows per chunk/transaction
+        pause_seconds: Sleep between chunks to yield to other writers
+        
+    Returns:
+        Number of rows archived and deleted
+    """
+    table = ActivityLog.__table__
+    view = activity_log_view
+    archived = 0
+    
+    while True:
+        rows = db.execute(
+            select(*view.columns)
+            .where(view.c.timestamp < cutoff)
+            .order_by(view.c.timestamp, view.c.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            break
+            
+        by_day = defaultdict(list)
+        for row in rows:
+            by_day[row.timestamp.date()].append(row)
+        for day, day_rows in by_day.items():
+            write_partition(archive_dir, day, day_rows)
+            
+        db.execute(delete(table).where(table.c.id.in_([row.id for row in rows])))
+        db.commit()
+        archived += len(rows)
+        
+        if len(rows) < chunk_size:
+            break
+        if pause_seconds:
+            time.sleep(pause_seconds)
+            
+    discard_rollups_before(db, cutoff)
+    db.commit()
+    closed_bucket_cache.clear()
+    if archived:
+        response_cache.bump("activity")
+    return archived
+
+
+def incremental_vacuum(db: Session, pages: int = 1000) -> bool:
+    """
+    Return freed SQLite pages to the filesystem, a bounded amount at a time.
+    
+    Only works when the database uses ``auto_vacuum=INCREMENTAL`` (see
+    enable_incremental_vacuum). PostgreSQL relies on autovacuum instead.
+    
+    Args:
+        db: Database session
+        pages: Maximum number of free pages to release
+        
+    Returns:
+        True if an incremental vacuum was run
+    """
+    if is_postgresql():
+        return False
+    mode = db.execute(text("PRAGMA auto_vacuum")).scalar()
+    if mode != 2:
+        return False
+    db.execute(text(f"PRAGMA incremental_vacuum({int(pages)})"))
+    db.commit()
+    return True
+
+
+def enable_incremental_vacuum() -> None:
+    """
+    Switch an existing SQLite database to ``auto_vacuum=INCREMENTAL``.
+    
+    Requires a full VACUUM, which rewrites the file and locks it for the
+    duration; run it once during maintenance.
+    """
+    from app.core.database import engine
+    
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("PRAGMA auto_vacuum = INCREMENTAL"))
+        conn.execute(text("VACUUM"))
+
+
+def run_retention(now: Optional[datetime] = None) -> dict:
+    """
+    Run one retention pass with the configured settings.
+    
+    Args:
+        now: Optional reference time (defaults to the current UTC time)
+        
+    Returns:
+        Dictionary with the cutoff, rows archived and whether a vacuum ran
+    """
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(days=settings.RETENTION_DAYS)
+    
+    db = SessionLocal()
+    try:
+        archived = archive_and_purge(
+            db,
+            cutoff,
+            settings.RETENTION_ARCHIVE_DIR,
+            settings.RETENTION_CHUNK_SIZE,
+            settings.RETENTION_CHUNK_PAUSE_SECONDS
+        )
+        vacuumed = incremental_vacuum(db) if archived else False
+    finally:
+        db.close()
+        
+    if archived:
+        print(f"Retention: archived {archived} activity logs older than {cutoff.isoformat()}")
+    return {"cutoff": cutoff, "archived": archived, "vacuumed": vacuumed}
+
+
+def list_archive_partitions(archive_dir: Optional[str] = None) -> List[dict]:
+    """
+    List archived days with their file count and size.
+    
+    Args:
+        archive_dir: Root archive directory (defaults to RETENTION_ARCHIVE_DIR)
+        
+    Returns:
+        List of partitions sorted by date
+    """
+    root = os.path.join(archive_dir or settings.RETENTION_ARCHIVE_DIR, ARCHIVE_TABLE)
+    if not os.path.isdir(root):
+        return []
+        
+    partitions = []
+    for entry in sorted(os.listdir(root)):
+        if not entry.startswith("date="):
+            continue
+        directory = os.path.join(root, entry)
+        files = [f for f in os.listdir(directory) if not f.endswith(".tmp")]
+        partitions.append({
+            "date": entry[len("date="):],
+            "files": len(files),
+            "bytes": sum(os.path.getsize(os.path.join(directory, f)) for f in files),
+        })
+    return partitions
+
+
+def query_archive(
+    start: datetime,
+    end: datetime,
+    agent_id: Optional[int] = None,
+    risk_level: Optional[str] = None,
+    limit: int = 1000,
+    archive_dir: Optional[str] = None
+) -> List[dict]:
+    """
+    Read archived activity logs in [start, end).
+    
+    Only the day partitions overlapping the range are opened, one file
+    at a time, so memory is bounded by the chunk size plus ``limit``.
+    
+    Args:
+        start: Range start (inclusive)
+        end: Range end (exclusive)
+        agent_id: Optional filter by agent
+        risk_level: Optional filter by risk level
+        limit: Maximum number of rows to return
+        archive_dir: Root archive directory (defaults to RETENTION_ARCHIVE_DIR)
+        
+    Returns:
+        List of archived activity rows, oldest partition first
+    """
+    archive_dir = archive_dir or settings.RETENTION_ARCHIVE_DIR
+    results = []
+    seen_ids = set()
+    day = start.date()
+    
+    while day <= end.date() and len(results) < limit:
+        directory = _partition_dir(archive_dir, day)
+        if os.path.isdir(directory):
+            for name in sorted(os.listdir(directory)):
+                if name.endswith(".tmp"):
+                    continue
+                for row in _read_partition_file(os.path.join(directory, name)):
+                    timestamp = row["timestamp"]
+                    if timestamp is None or timestamp < start or timestamp >= end:
+                        continue
+                    if agent_id is not None and row["agent_id"] != agent_id:
+                        continue
+                    if risk_level and row["risk_level"] != risk_level:
+                        continue
+                    if row["id"] in seen_ids:
+                        continue  # re-archived chunk after an interrupted run
+                    seen_ids.add(row["id"])
+                    results.append(row)
+                    if len(results) >= limit:
+                        return results
+        day += timedelta(days=1)
+        
+    return results
+
+
+retention_worker = PeriodicWorker("retention-worker", settings.RETENTION_INTERVAL_SECONDS, run_retention)
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Activity log retention")
+    parser.add_argument(
+        "command",
+        choices=["run", "enable-incremental-vacuum"],
+        help="run: archive and purge once; enable-incremental-vacuum: one-off SQLite VACUUM"
+    )
+    args = parser.parse_args()
+    
+    if args.command == "run":
+        print(run_retention())
+    else:
+        enable_incremental_vacuum()
+        print("SQLite auto_vacuum set to INCREMENTAL")
@@ -1,12 +1,20 @@
 # services/risk_service.py
 # Risk evaluation service
 
+import math
+import threading
+import time
+from sqlalchemy import func
 from sqlalchemy.orm import Session
+from app.core.config import settings, is_postgresql
+from app.core.database import SessionLocal, insert_on_conflict
+from app.core.worker import PeriodicWorker
 from app.models.activity_log import ActivityLog
+from app.models.agent_risk_baseline import AgentRiskBaseline
 from app.models.alert import Alert
 from app.schemas.activity_log import AgentActivityCreate
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 # Risk thresholds
@@ -54,14 +62,20 @@ def calculate_risk_level(risk_score: float) -> str:
 
 def evaluate_activity_risk(
     activity_data: AgentActivityCreate,
-    db: Session
+    db: Session,
+    agent_id: Optional[int] = None
 ) -> dict:
     """
     Evaluate risk for an activity and create alert if needed.
     
+    When ``agent_id`` is given the score is also fed to the streaming
+    anomaly detector, which flags scores far above the agent's own
+    baseline even if they are below the fixed thresholds.
+    
     Args:
         activity_data: Activity data from agent
         db: Database session
+        agent_id: Optional agent the activity belongs to
         
     Returns:
         Dictionary with risk evaluation results
@@ -76,7 +90,8 @@ def evaluate_activity_risk(
         "risk_score": risk_score,
         "risk_level": risk_level,
         "should_alert": should_alert,
-        "alert_message": None
+        "alert_message": None,
+        "anomaly": None
     }
     
     if should_alert:
@@ -85,9 +100,246 @@ def evaluate_activity_risk(
         else:
             result["alert_message"] = f"HIGH: Elevated risk activity detected - Score: {risk_score}"
     
+    if agent_id is not None and settings.ANOMALY_DETECTION_ENABLED:
+        result["anomaly"] = anomaly_detector.observe(agent_id, risk_score)
+    
     return result
 
 
+class AgentRiskState:
+    """Running risk score statistics for one agent."""
+    
+    __slots__ = ("count", "mean", "m2", "ewma", "last_alert_at", "dirty")
+    
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0, ewma: Optional[float] = None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.ewma = ewma
+        self.last_alert_at: Optional[float] = None
+        self.dirty = False
+        
+    @property
+    def stddev(self) -> float:
+        """Sample standard deviation of the scores seen so far."""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else 0.0
+
+
+class AnomalyDetector:
+    """
+    Online per-agent risk anomaly detector.
+    
+    Each agent keeps a Welford running mean/variance and an EWMA of its
+    risk scores. A new score is compared against the state *before* it
+    is folded in: it is anomalous when it exceeds the EWMA by at least
+    ANOMALY_ZSCORE_THRESHOLD standard deviations (floored at
+    ANOMALY_MIN_STDDEV) and by at least ANOMALY_MIN_DELTA points. Only
+    upward deviations are flagged, and at most one per agent per
+    ANOMALY_ALERT_COOLDOWN_SECONDS.
+    
+    Everything is O(1) per event and in memory; ``persist`` writes the
+    changed states to ``agent_risk_baselines`` and ``load`` restores
+    them on startup.
+    """
+    
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+        self.observed = 0
+        self.anomalies = 0
+        self.last_persisted_at: Optional[datetime] = None
+        
+    def observe(self, agent_id: int, risk_score: float, now: Optional[float] = None) -> Optional[dict]:
+        """
+        Fold a score into the agent's state and check it for an anomaly.
+        
+        Args:
+            agent_id: Agent the score belongs to
+            risk_score: Observed risk score
+            now: Optional monotonic time (for the alert cooldown)
+            
+        Returns:
+            Anomaly details if the score is anomalous, otherwise None
+        """
+        if not math.isfinite(risk_score):
+            # One inf or NaN would turn the mean and m2 into NaN for good
+            return None
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            state = self._states.get(agent_id)
+            if state is None:
+                state = self._states[agent_id] = AgentRiskState()
+            self.observed += 1
+            
+            anomaly = None
+            if state.count >= settings.ANOMALY_MIN_SAMPLES and state.ewma is not None:
+                stddev = max(state.stddev, settings.ANOMALY_MIN_STDDEV)
+                deviation = risk_score - state.ewma
+                zscore = deviation / stddev
+                cooled_down = (
+                    state.last_alert_at is None
+                    or now - state.last_alert_at >= settings.ANOMALY_ALERT_COOLDOWN_SECONDS
+                )
+                if (
+                    zscore >= settings.ANOMALY_ZSCORE_THRESHOLD
+                    and deviation >= settings.ANOMALY_MIN_DELTA
+                    and cooled_down
+                ):
+                    state.last_alert_at = now
+                    self.anomalies += 1
+                    anomaly = {
+                        "agent_id": agent_id,
+                        "risk_score": risk_score,
+                        "baseline": round(state.ewma, 3),
+                        "mean": round(state.mean, 3),
+                        "stddev": round(stddev, 3),
+                        "zscore": round(zscore, 2),
+                        "samples": state.count,
+                    }
+                    
+            # Welford update
+            state.count += 1
+            delta = risk_score - state.mean
+            state.mean += delta / state.count
+            state.m2 += delta * (risk_score - state.mean)
+            
+            alpha = settings.ANOMALY_EWMA_ALPHA
+            state.ewma = risk_score if state.ewma is None else alpha * risk_score + (1 - alpha) * state.ewma
+            state.dirty = True
+            return anomaly
+            
+    def load(self, db: Session) -> int:
+        """
+        Restore persisted agent states.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Number of agent states loaded
+        """
+        rows = db.query(
+            AgentRiskBaseline.agent_id,
+            AgentRiskBaseline.sample_count,
+            AgentRiskBaseline.mean,
+            AgentRiskBaseline.m2,
+            AgentRiskBaseline.ewma,
+        ).all()
+        with self._lock:
+            for agent_id, count, mean, m2, ewma in rows:
+                if agent_id not in self._states:
+                    self._states[agent_id] = AgentRiskState(count, mean, m2, ewma)
+        return len(rows)
+        
+    def persist(self, db: Session) -> int:
+        """
+        Write changed agent states with a single multi-row UPSERT.
+        
+        Args:
+            db: Database session
+            
+        Returns:
+            Number of agent states written
+        """
+        now = datetime.utcnow()
+        with self._lock:
+            rows = []
+            for agent_id, state in self._states.items():
+                if state.dirty:
+                    state.dirty = False
+                    rows.append({
+                        "agent_id": agent_id,
+                        "sample_count": state.count,
+                        "mean": state.mean,
+                        "m2": state.m2,
+                        "ewma": state.ewma,
+                        "updated_at": now,
+                    })
+        if not rows:
+            return 0
+            
+        table = AgentRiskBaseline.__table__
+        stmt = insert_on_conflict(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["agent_id"],
+            set_={
+                column: stmt.excluded[column]
+                for column in ("sample_count", "mean", "m2", "ewma", "updated_at")
+            }
+        )
+        try:
+            db.execute(stmt)
+            db.commit()
+        except Exception:
+            db.rollback()
+            with self._lock:
+                for row in rows:
+                    state = self._states.get(row["agent_id"])
+                    if state is not None:
+                        state.dirty = True
+            raise
+        self.last_persisted_at = now
+        return len(rows)
+        
+    def forget(self, db: Session, agent_id: int) -> None:
+        """
+        Drop a deleted agent's state, so an agent that reuses its id starts fresh.
+        
+        The persisted baseline is deleted in the caller's transaction.
+        
+        Args:
+            db: Database session
+            agent_id: Deleted agent
+        """
+        with self._lock:
+            self._states.pop(agent_id, None)
+        db.query(AgentRiskBaseline).filter(AgentRiskBaseline.agent_id == agent_id).delete()
+        
+    def get_state(self, agent_id: int) -> Optional[dict]:
+        """Return an agent's current baseline, or None if it has none."""
+        with self._lock:
+            state = self._states.get(agent_id)
+            if state is None:
+                return None
+            return {
+                "samples": state.count,
+                "mean": state.mean,
+                "stddev": state.stddev,
+                "ewma": state.ewma,
+            }
+            
+    def stats(self) -> dict:
+        """Return detector metrics."""
+        with self._lock:
+            return {
+                "enabled": settings.ANOMALY_DETECTION_ENABLED,
+                "agents": len(self._states),
+                "observed": self.observed,
+                "anomalies": self.anomalies,
+                "unpersisted": sum(1 for state in self._states.values() if state.dirty),
+                "last_persisted_at": self.last_persisted_at,
+            }
+
+
+anomaly_detector = AnomalyDetector()
+
+
+def persist_anomaly_state() -> int:
+    """Persist changed anomaly detector state in a new session."""
+    db = SessionLocal()
+    try:
+        return anomaly_detector.persist(db)
+    finally:
+        db.close()
+
+
+anomaly_persist_worker = PeriodicWorker(
+    "anomaly-persist-worker",
+    settings.ANOMALY_PERSIST_INTERVAL_SECONDS,
+    persist_anomaly_state
+)
+
+
 def get_recent_high_risk_activities(db: Session, hours: int = 24) -> list:
     """
     Get recent high-risk activities within specified hours.
@@ -110,13 +362,68 @@ def get_recent_high_risk_activities(db: Session, hours: int = 24) -> list:
     return activities
 
 
-def get_risk_statistics(db: Session, hours: int = 24) -> dict:
+def build_risk_statistics(rows, hours: int) -> dict:
+    """
+    Build the risk statistics response from per-level aggregate rows.
+    
+    Rows may repeat a risk level (e.g. when partial aggregates from
+    rollup buckets and raw rows are combined); they are merged here.
+    
+    Args:
+        rows: Iterable of (risk_level, count, sum, min, max) tuples
+        hours: Number of hours the statistics cover
+        
+    Returns:
+        Dictionary with risk statistics
+    """
+    distribution = {level: 0 for level in RISK_LEVELS}
+    total = 0
+    score_sum = 0.0
+    min_score = None
+    max_score = None
+    
+    for level, count, level_sum, level_min, level_max in rows:
+        if not count:
+            continue
+        total += count
+        if level in distribution:
+            distribution[level] += count
+        if level_sum is not None:
+            score_sum += level_sum
+        if level_min is not None and (min_score is None or level_min < min_score):
+            min_score = level_min
+        if level_max is not None and (max_score is None or level_max > max_score):
+            max_score = level_max
+    
+    avg_score = score_sum / total if total else 0.0
+    
+    return {
+        "total_activities": total,
+        "risk_distribution": distribution,
+        "average_risk_score": round(avg_score, 2),
+        "total_risk_score": round(score_sum, 2),
+        "min_risk_score": min_score,
+        "max_risk_score": max_score,
+        "period_hours": hours
+    }
+
+
+def get_risk_statistics(
+    db: Session,
+    hours: int = 24,
+    percentiles: Optional[List[float]] = None
+) -> dict:
     """
     Get risk statistics for the specified time period.
     
+    Counts, sum, min, max and average are computed in a single
+    ``GROUP BY risk_level`` aggregate, so memory use does not grow with
+    the number of rows in the window.
+    
     Args:
         db: Database session
         hours: Number of hours to look back
+        percentiles: Optional risk score percentiles to compute (0-100)
         
     Returns:
         Dictionary with risk statistics
@@ -125,47 +432,79 @@ def get_risk_statistics(db: Session, hours: int = 24) -> dict:
     
     cutoff_time = datetime.utcnow() - timedelta(hours=hours)
     
-    total = db.query(ActivityLog).filter(
+    rows = db.query(
+        ActivityLog.risk_level,
+        func.count(ActivityLog.id),
+        func.sum(ActivityLog.risk_score),
+        func.min(ActivityLog.risk_score),
+        func.max(ActivityLog.risk_score),
+    ).filter(
         ActivityLog.timestamp >= cutoff_time
-    ).count()
+    ).group_by(ActivityLog.risk_level).all()
     
-    low = db.query(ActivityLog).filter(
-        ActivityLog.timestamp >= cutoff_time,
-        ActivityLog.risk_level == "low"
-    ).count()
+    stats = build_risk_statistics(rows, hours)
     
-    medium = db.query(ActivityLog).filter(
-        ActivityLog.timestamp >= cutoff_time,
-        ActivityLog.risk_level == "medium"
-    ).count()
+    if percentiles:
+        stats["percentiles"] = get_risk_score_percentiles(
+            db, cutoff_time, percentiles, stats["total_activities"]
+        )
     
-    high = db.query(ActivityLog).filter(
-        ActivityLog.timestamp >= cutoff_time,
-        ActivityLog.risk_level == "high"
-    ).count()
+    return stats
+
+
+def get_risk_score_percentiles(
+    db: Session,
+    cutoff_time: datetime,
+    percentiles: List[float],
+    total: Optional[int] = None
+) -> dict:
+    """
+    Get risk score percentiles for activities since ``cutoff_time``.
     
-    critical = db.query(ActivityLog).filter(
-        ActivityLog.timestamp >= cutoff_time,
-        ActivityLog.risk_level == "critical"
-    ).count()
+    PostgreSQL computes them with ``percentile_cont``. SQLite has no
+    percentile aggregate, so the window is numbered once with
+    ``ROW_NUMBER()`` in risk score order and the nearest-rank rows of
+    all requested percentiles are read from that single pass.
     
-    avg_risk_score = db.query(ActivityLog).filter(
-        ActivityLog.timestamp >= cutoff_time
-    ).with_entities(ActivityLog.risk_score).all()
+    Args:
+        db: Database session
+        cutoff_time: Only activities at or after this time are included
+        percentiles: Percentiles to compute (0-100)
+        total: Optional number of rows in the window, if already known
+        
+    Returns:
+        Dictionary mapping percentile label (e.g. "p95") to risk score
+        
+    Raises:
+        ValueError: If a percentile is not a number between 0 and 100
+    """
+    percentiles = [float(p) for p in percentiles]
+    if not all(0.0 <= p <= 100.0 for p in percentiles):
+        raise ValueError("percentiles must be between 0 and 100")
+    labels = [f"p{p:g}" for p in percentiles]
     
-    avg_score = 0.0
-    if avg_risk_score:
-        scores = [s[0] for s in avg_risk_score]
-        avg_score = sum(scores) / len(scores) if scores else 0.0
+    if is_postgresql():
+        values = db.query(*[
+            func.percentile_cont(p / 100.0).within_group(ActivityLog.risk_score)
+            for p in percentiles
+        ]).filter(ActivityLog.timestamp >= cutoff_time).one()
+        return {
+            label: (round(value, 2) if value is not None else None)
+            for label, value in zip(labels, values)
+        }
     
-    return {
-        "total_activities": total,
-        "risk_distribution": {
-            "low": low,
-            "medium": medium,
-            "high": high,
-            "critical": critical,
-        },
-        "average_risk_score": round(avg_score, 2),
-        "period_hours": hours
-    }
+    if total is None:
+        total = db.query(func.count(ActivityLog.id)).filter(
+            ActivityLog.timestamp >= cutoff_time
+        ).scalar()
+    
+    if not total:
+        return {label: None for label in labels}
+    
+    ranks = [max(math.ceil(p / 100.0 * total), 1) for p in percentiles]
+    numbered = db.query(
+        ActivityLog.risk_score.label("score"),
+        func.row_number().over(order_by=ActivityLog.risk_score.asc()).label("rank")
+    ).filter(ActivityLog.timestamp >= cutoff_time).subquery()
+    scores = dict(db.query(numbered.c.rank, numbered.c.score).filter(numbered.c.rank.in_(set(ranks))).all())
+    return {label: scores.get(rank) for label, rank in zip(labels, ranks)}
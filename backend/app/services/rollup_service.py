@@ -0,0 +1,321 @@
+# services/rollup_service.py
+# Incrementally maintained time-bucket rollups for activity statistics
+
+from sqlalchemy import func, insert, literal, select
+from sqlalchemy.orm import Session
+from app.core.config import is_postgresql
+from app.core.database import insert_on_conflict
+from app.models.activity_log import ActivityLog, risk_level_name
+from app.models.activity_rollup import ActivityRollup
+from app.services.risk_service import build_risk_statistics
+from app.services.timeseries_service import closed_bucket_cache
+from datetime import datetime, timedelta
+from typing import Optional
+
+
+# Bucket granularities kept in the rollup table
+GRANULARITIES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+}
+
+# Columns that identify a bucket (the UPSERT conflict target)
+BUCKET_KEY = ["granularity", "bucket_start", "agent_id", "risk_level"]
+
+
+def floor_bucket(timestamp: datetime, granularity: str) -> datetime:
+    """
+    Truncate a timestamp to the start of its bucket.
+    
+    Args:
+        timestamp: Timestamp to truncate
+        granularity: Bucket granularity (minute, hour)
+        
+    Returns:
+        Start of the bucket containing the timestamp
+    """
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(second=0, microsecond=0)
+
+
+def ceil_bucket(timestamp: datetime, granularity: str) -> datetime:
+    """
+    Round a timestamp up to the next bucket boundary.
+    
+    Args:
+        timestamp: Timestamp to round
+        granularity: Bucket granularity (minute, hour)
+        
+    Returns:
+        The timestamp itself if it is on a boundary, else the next boundary
+    """
+    start = floor_bucket(timestamp, granularity)
+    if start == timestamp:
+        return start
+    return start + GRANULARITIES[granularity]
+
+
+def _least(a, b):
+    """Smaller of two SQL expressions (scalar min on SQLite, LEAST on PostgreSQL)."""
+    return func.least(a, b) if is_postgresql() else func.min(a, b)
+
+
+def _greatest(a, b):
+    """Larger of two SQL expressions (scalar max on SQLite, GREATEST on PostgreSQL)."""
+    return func.greatest(a, b) if is_postgresql() else func.max(a, b)
+
+
+def _bucket_expression(granularity: str, column):
+    """
+    SQL expression truncating ``column`` to its bucket start.
+    
+    On SQLite the result uses the same text format SQLAlchemy stores
+    DateTime values in, so it compares correctly with bound datetimes.
+    """
+    if is_postgresql():
+        return func.date_trunc(granularity, column)
+    if granularity == "hour":
+        return func.strftime("%Y-%m-%d %H:00:00.000000", column)
+    return func.strftime("%Y-%m-%d %H:%M:00.000000", column)
+
+
+def record_activity(db: Session, activity: ActivityLog) -> None:
+    """
+    Add an activity to its minute and hour buckets.
+    
+    Runs a single multi-row UPSERT in the caller's transaction; the
+    caller is responsible for committing.
+    
+    Args:
+        db: Database session
+        activity: The activity log to add (must have a timestamp)
+    """
+    timestamp = activity.timestamp or datetime.utcnow()
+    risk_score = activity.risk_score or 0.0
+    rows = [
+        {
+            "granularity": granularity,
+            "bucket_start": floor_bucket(timestamp, granularity),
+            "agent_id": activity.agent_id or 0,
+            "risk_level": activity.risk_level or "low",
+            "activity_count": 1,
+            "risk_score_sum": risk_score,
+            "risk_score_min": risk_score,
+            "risk_score_max": risk_score,
+        }
+        for granularity in GRANULARITIES
+    ]
+    
+    table = ActivityRollup.__table__
+    stmt = insert_on_conflict(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=BUCKET_KEY,
+        set_={
+            "activity_count": table.c.activity_count + stmt.excluded.activity_count,
+            "risk_score_sum": table.c.risk_score_sum + stmt.excluded.risk_score_sum,
+            "risk_score_min": _least(table.c.risk_score_min, stmt.excluded.risk_score_min),
+            "risk_score_max": _greatest(table.c.risk_score_max, stmt.excluded.risk_score_max),
+        }
+    )
+    db.execute(stmt)
+
+
+def _insert_buckets(db: Session, granularity: str, *conditions) -> None:
+    """Insert the buckets of one granularity computed from the raw rows matching ``conditions``."""
+    bucket = _bucket_expression(granularity, ActivityLog.timestamp)
+    agent = func.coalesce(ActivityLog.agent_id, 0)
+    level = risk_level_name(ActivityLog.risk_level)
+    score = func.coalesce(ActivityLog.risk_score, 0.0)
+    
+    source = select(
+        literal(granularity),
+        bucket,
+        agent,
+        level,
+        func.count(ActivityLog.id),
+        func.sum(score),
+        func.min(score),
+        func.max(score),
+    ).where(
+        ActivityLog.timestamp.isnot(None),
+        # Codes with no risk level name (bulk-loaded) have no bucket
+        level.isnot(None),
+        *conditions
+    ).group_by(bucket, agent, level)
+    
+    db.execute(insert(ActivityRollup.__table__).from_select(
+        BUCKET_KEY + [
+            "activity_count",
+            "risk_score_sum",
+            "risk_score_min",
+            "risk_score_max",
+        ],
+        source
+    ))
+
+
+def backfill_rollups(db: Session) -> int:
+    """
+    Rebuild all rollup buckets from the raw activity logs.
+    
+    Existing buckets are discarded and recomputed with one
+    ``INSERT ... SELECT ... GROUP BY`` per granularity. Run this while
+    ingest is stopped, otherwise activities logged during the rebuild
+    may be counted twice or missed.
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        Number of rollup buckets written
+    """
+    db.execute(ActivityRollup.__table__.delete())
+    for granularity in GRANULARITIES:
+        _insert_buckets(db, granularity)
+        
+    db.commit()
+    closed_bucket_cache.clear()
+    return db.query(func.count(ActivityRollup.id)).scalar()
+
+
+def discard_rollups_before(db: Session, cutoff: datetime) -> None:
+    """
+    Drop the buckets of activity logs purged before ``cutoff``.
+    
+    Buckets that end at or before the cutoff are deleted; the bucket the
+    cutoff falls inside is recomputed from the rows that remain. The
+    caller is responsible for committing.
+    
+    Args:
+        db: Database session
+        cutoff: Activity logs with a timestamp before this have been deleted
+    """
+    table = ActivityRollup.__table__
+    for granularity, width in GRANULARITIES.items():
+        start = floor_bucket(cutoff, granularity)
+        end = start + width if start != cutoff else start
+        db.execute(table.delete().where(
+            table.c.granularity == granularity,
+            table.c.bucket_start < end,
+        ))
+        if end != start:
+            _insert_buckets(db, granularity, ActivityLog.timestamp >= start, ActivityLog.timestamp < end)
+
+
+def ensure_rollups(db: Session) -> bool:
+    """
+    Backfill rollups if the table is empty but activity logs exist.
+    
+    Both checks are ``LIMIT 1`` lookups, so this is cheap on startup.
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        True if a backfill was run
+    """
+    if db.query(ActivityRollup.id).first() is not None:
+        return False
+    if db.query(ActivityLog.id).first() is None:
+        return False
+    count = backfill_rollups(db)
+    print(f"Backfilled {count} activity rollup buckets")
+    return True
+
+
+def _rollup_rows(db: Session, granularity: str, start: datetime, end: datetime) -> list:
+    """Per-level aggregates of full buckets in [start, end)."""
+    if start >= end:
+        return []
+    return db.query(
+        ActivityRollup.risk_level,
+        func.sum(ActivityRollup.activity_count),
+        func.sum(ActivityRollup.risk_score_sum),
+        func.min(ActivityRollup.risk_score_min),
+        func.max(ActivityRollup.risk_score_max),
+    ).filter(
+        ActivityRollup.granularity == granularity,
+        ActivityRollup.bucket_start >= start,
+        ActivityRollup.bucket_start < end
+    ).group_by(ActivityRollup.risk_level).all()
+
+
+def _raw_rows(db: Session, start: datetime, end: Optional[datetime] = None) -> list:
+    """Per-level aggregates of raw activity logs in [start, end)."""
+    if end is not None and start >= end:
+        return []
+    query = db.query(
+        ActivityLog.risk_level,
+        func.count(ActivityLog.id),
+        func.sum(ActivityLog.risk_score),
+        func.min(ActivityLog.risk_score),
+        func.max(ActivityLog.risk_score),
+    ).filter(ActivityLog.timestamp >= start)
+    if end is not None:
+        query = query.filter(ActivityLog.timestamp < end)
+    return query.group_by(ActivityLog.risk_level).all()
+
+
+def get_rollup_statistics(db: Session, hours: int = 24) -> dict:
+    """
+    Get risk statistics for the specified time period from rollups.
+    
+    The window is split into raw-row edges shorter than a minute,
+    minute buckets up to the nearest hour boundaries and hour buckets
+    for everything in between, so a 30-day window reads at most ~720
+    hour buckets, ~120 minute buckets and two minutes of raw rows per
+    risk level and agent.
+    
+    Args:
+        db: Database session
+        hours: Number of hours to look back
+        
+    Returns:
+        Dictionary with risk statistics (same shape as get_risk_statistics)
+    """
+    now = datetime.utcnow()
+    cutoff_time = now - timedelta(hours=hours)
+    
+    minute_start = ceil_bucket(cutoff_time, "minute")
+    minute_end = floor_bucket(now, "minute")
+    
+    if minute_start >= minute_end:
+        # Window is shorter than one full minute bucket
+        return build_risk_statistics(_raw_rows(db, cutoff_time), hours)
+        
+    hour_start = ceil_bucket(cutoff_time, "hour")
+    hour_end = floor_bucket(now, "hour")
+    
+    rows = _raw_rows(db, cutoff_time, minute_start)
+    if hour_start < hour_end:
+        rows += _rollup_rows(db, "minute", minute_start, hour_start)
+        rows += _rollup_rows(db, "hour", hour_start, hour_end)
+        rows += _rollup_rows(db, "minute", hour_end, minute_end)
+    else:
+        rows += _rollup_rows(db, "minute", minute_start, minute_end)
+    rows += _raw_rows(db, minute_end)
+    
+    return build_risk_statistics(rows, hours)
+
+
+if __name__ == "__main__":
+    import argparse
+    from app.core.database import SessionLocal, init_db
+    
+    parser = argparse.ArgumentParser(description="Activity rollup maintenance")
+    parser.add_argument(
+        "command",
+        choices=["backfill"],
+        help="backfill: rebuild all rollup buckets from activity_logs"
+    )
+    args = parser.parse_args()
+    
+    init_db()
+    db = SessionLocal()
+    try:
+        if args.command == "backfill":
+            count = backfill_rollups(db)
+            print(f"Backfilled {count} activity rollup buckets")
+    finally:
+        db.close()
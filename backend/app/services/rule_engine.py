@@ -0,0 +1,428 @@
+# services/rule_engine.py
+# Declarative alert rules compiled into an indexed predicate tree
+
+import bisect
+import json
+import math
+import operator
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.activity_log import ActivityLog
+from app.models.alert_rule import AlertRule
+from app.services.risk_service import RISK_LEVELS
+
+
+# Event fields rules can test; string fields are matched case-insensitively
+STRING_FIELDS = ("event_type", "app_name", "risk_level", "user_id")
+NUMERIC_FIELDS = ("risk_score",)
+
+# Agent payload names accepted as aliases
+FIELD_ALIASES = {
+    "eventType": "event_type",
+    "appName": "app_name",
+    "riskScore": "risk_score",
+    "riskLevel": "risk_level",
+    "userId": "user_id",
+}
+
+COMPARISONS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+OPERATORS = tuple(COMPARISONS) + ("in", "not_in", "contains", "matches")
+
+SEVERITIES = ("low", "medium", "high", "critical")
+
+HIGH_RISK_MESSAGE = (
+    "High-risk activity detected: {event_type} (Risk Score: {risk_score}, Level: {risk_level})"
+)
+
+# Equivalent of the former hard-coded high/critical risk alerting
+BUILTIN_RULES = [
+    {
+        "name": "builtin:critical-risk",
+        "conditions": [{"field": "risk_score", "op": ">=", "value": RISK_LEVELS["critical"]}],
+        "severity": "critical",
+        "alert_type": "high_risk",
+        "message": HIGH_RISK_MESSAGE,
+    },
+    {
+        "name": "builtin:high-risk",
+        "conditions": [
+            {"field": "risk_score", "op": ">=", "value": RISK_LEVELS["high"]},
+            {"field": "risk_score", "op": "<", "value": RISK_LEVELS["critical"]},
+        ],
+        "severity": "high",
+        "alert_type": "high_risk",
+        "message": HIGH_RISK_MESSAGE,
+    },
+]
+
+
+class _TemplateFields(dict):
+    """format_map mapping that leaves unknown placeholders as-is."""
+    
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+
+def build_event(activity: ActivityLog) -> dict:
+    """
+    Build the rule engine event for an activity log.
+    
+    String fields are lowercased once here so compiled rules can compare
+    them directly.
+    """
+    return {
+        "event_type": (activity.activity_type or "").lower() or None,
+        "app_name": (activity.app_name or "").lower() or None,
+        "risk_level": activity.risk_level,
+        "user_id": (activity.user_id or "").lower() or None,
+        "risk_score": activity.risk_score if activity.risk_score is not None else 0.0,
+    }
+
+
+class CompiledRule:
+    """
+    A rule reduced to index keys plus the residual predicates.
+    
+    Equality/membership tests on event type and app name and lower
+    bounds on the risk score are answered by the index; only the other
+    conditions remain as predicates. A ``count`` condition keeps, per
+    agent, a deque of the last N matching event times, so checking
+    "at least N matches within the window" is O(1). Agents whose last
+    match has left the window are dropped, so only agents matching
+    within the window are held.
+    """
+    
+    __slots__ = (
+        "id", "name", "source", "severity", "alert_type", "message", "definition",
+        "event_types", "app_names", "min_score", "predicates",
+        "count", "window", "_windows", "_lock",
+    )
+    
+    def __init__(self, definition: dict, source: str):
+        self.definition = definition
+        self.source = source
+        self.id = definition.get("id")
+        self.name = definition.get("name")
+        if not self.name:
+            raise ValueError("Rule needs a name")
+            
+        self.severity = definition.get("severity") or "medium"
+        if self.severity not in SEVERITIES:
+            raise ValueError(f"Rule '{self.name}': severity must be one of: {', '.join(SEVERITIES)}")
+        self.alert_type = definition.get("alert_type") or f"rule:{self.name}"
+        self.message = definition.get("message") or (
+            "Rule '{rule}' matched: {event_type} in {app_name} (Risk Score: {risk_score})"
+        )
+        try:
+            self.message.format_map(_TemplateFields())
+        except (ValueError, IndexError) as e:
+            raise ValueError(f"Rule '{self.name}': invalid message template ({e})")
+            
+        self.event_types = None
+        self.app_names = None
+        self.min_score = -math.inf
+        self.predicates = []
+        self.count = None
+        self.window = 0.0
+        self._windows = {}
+        self._lock = threading.Lock()
+        
+        if definition.get("event_type"):
+            self.event_types = {definition["event_type"].lower()}
+        for condition in definition.get("conditions") or []:
+            self._add_condition(dict(condition))
+        self.predicates = tuple(self.predicates)
+        if self.event_types == set() or self.app_names == set():
+            raise ValueError(f"Rule '{self.name}': event type or app conditions can never match")
+            
+    def _add_condition(self, condition: dict) -> None:
+        field = FIELD_ALIASES.get(condition.get("field"), condition.get("field"))
+        op = condition.get("op") or "=="
+        value = condition.get("value")
+        if op not in OPERATORS:
+            raise ValueError(f"Rule '{self.name}': unknown operator '{op}'")
+            
+        if field == "count":
+            if op not in (">=", ">") or not condition.get("window_seconds"):
+                raise ValueError(
+                    f"Rule '{self.name}': count conditions need op >= or > and window_seconds"
+                )
+            self.count = int(value) + (1 if op == ">" else 0)
+            if self.count < 1:
+                raise ValueError(f"Rule '{self.name}': count must be at least 1")
+            self.window = float(condition["window_seconds"])
+            return
+            
+        if field in NUMERIC_FIELDS:
+            if op not in COMPARISONS:
+                raise ValueError(f"Rule '{self.name}': {field} supports {', '.join(COMPARISONS)}")
+            value = float(value)
+            if op == ">=":
+                self.min_score = max(self.min_score, value)  # answered by the index
+                return
+            if op == ">":
+                self.min_score = max(self.min_score, value)
+            self.predicates.append(_comparison(field, COMPARISONS[op], value))
+            return
+            
+        if field not in STRING_FIELDS:
+            raise ValueError(f"Rule '{self.name}': unknown field '{field}'")
+            
+        if op in ("==", "in") and field in ("event_type", "app_name"):
+            values = {str(v).lower() for v in (value if op == "in" else [value])}
+            current = getattr(self, field + "s")
+            setattr(self, field + "s", values if current is None else current & values)
+            return
+            
+        self.predicates.append(_string_predicate(field, op, value))
+        
+    def check_window(self, agent_id: Optional[int], now: float) -> bool:
+        """Record a match and report whether the count condition is met."""
+        if self.count is None:
+            return True
+        with self._lock:
+            # Re-inserted on every match, so the dict is ordered by last match
+            times = self._windows.pop(agent_id, None) or deque(maxlen=self.count)
+            times.append(now)
+            met = len(times) == self.count and now - times[0] <= self.window
+            if not met:  # once met, the next alert needs another N matches
+                self._windows[agent_id] = times
+                
+            # An agent whose newest match is outside the window can never complete it
+            while self._windows:
+                oldest = next(iter(self._windows))
+                if now - self._windows[oldest][-1] <= self.window:
+                    break
+                del self._windows[oldest]
+            return met
+            
+    def format_message(self, fields: dict) -> str:
+        """Render the message template with activity fields."""
+        return self.message.format_map(_TemplateFields(fields, rule=self.name))
+        
+    def describe(self) -> dict:
+        """Return the rule definition with its source."""
+        return {**self.definition, "source": self.source}
+
+
+def _comparison(field: str, compare: Callable, value) -> Callable[[dict], bool]:
+    def predicate(event):
+        actual = event[field]
+        return actual is not None and compare(actual, value)
+    return predicate
+
+
+def _string_predicate(field: str, op: str, value) -> Callable[[dict], bool]:
+    if op in ("in", "not_in"):
+        values = frozenset(str(v).lower() for v in (value or []))
+        if op == "in":
+            return lambda event: event[field] in values
+        return lambda event: event[field] not in values
+    if op == "contains":
+        needle = str(value).lower()
+        return lambda event: event[field] is not None and needle in event[field]
+    if op == "matches":
+        try:
+            pattern = re.compile(str(value), re.IGNORECASE)
+        except re.error as e:
+            raise ValueError(f"Invalid pattern for {field}: {e}")
+        return lambda event: event[field] is not None and pattern.search(event[field]) is not None
+    if op not in ("==", "!="):
+        raise ValueError(f"Operator '{op}' is not supported for {field}")
+    expected = str(value).lower() if value is not None else None
+    if op == "==":
+        return lambda event: event[field] == expected
+    return lambda event: event[field] != expected
+
+
+class RuleEngine:
+    """
+    Evaluates events against all rules through a predicate tree.
+    
+    Rules are indexed by event type (or any), then app name (or any);
+    each leaf keeps its rules sorted by minimum risk score so a bisect
+    drops every rule whose score bound the event does not meet. An
+    event therefore touches at most four leaves and only the rules that
+    can still match, whatever the total number of rules. The tree is
+    rebuilt on ``load`` and swapped in atomically.
+    """
+    
+    def __init__(self):
+        self._rules: List[CompiledRule] = []
+        self._index = {}
+        self.evaluations = 0
+        self.matches = 0
+        self.evaluation_ns = 0
+        
+    def load(self, rules: Iterable[CompiledRule]) -> int:
+        """
+        Replace the active rules.
+        
+        Args:
+            rules: Compiled rules
+            
+        Returns:
+            Number of rules loaded
+        """
+        rules = list(rules)
+        leaves = {}
+        for rule in rules:
+            for event_type in rule.event_types or (None,):
+                for app_name in rule.app_names or (None,):
+                    leaves.setdefault(event_type, {}).setdefault(app_name, []).append(rule)
+                    
+        index = {}
+        for event_type, by_app in leaves.items():
+            for app_name, leaf in by_app.items():
+                leaf.sort(key=lambda rule: rule.min_score)
+                index.setdefault(event_type, {})[app_name] = (
+                    [rule.min_score for rule in leaf],
+                    leaf,
+                )
+        self._rules, self._index = rules, index
+        return len(rules)
+        
+    def evaluate(self, event: dict, agent_id: Optional[int] = None, now: Optional[float] = None) -> List[CompiledRule]:
+        """
+        Return the rules an event matches.
+        
+        Args:
+            event: Event from build_event
+            agent_id: Agent the event belongs to (for count windows)
+            now: Optional monotonic time (for count windows)
+            
+        Returns:
+            Matching rules
+        """
+        started = time.perf_counter_ns()
+        now = time.monotonic() if now is None else now
+        index = self._index
+        score = event["risk_score"]
+        matched = []
+        
+        for event_type in (event["event_type"], None) if event["event_type"] is not None else (None,):
+            by_app = index.get(event_type)
+            if by_app is None:
+                continue
+            for app_name in (event["app_name"], None) if event["app_name"] is not None else (None,):
+                leaf = by_app.get(app_name)
+                if leaf is None:
+                    continue
+                thresholds, rules = leaf
+                for position in range(bisect.bisect_right(thresholds, score)):
+                    rule = rules[position]
+                    for predicate in rule.predicates:
+                        if not predicate(event):
+                            break
+                    else:
+                        if rule.check_window(agent_id, now):
+                            matched.append(rule)
+                            
+        self.evaluations += 1
+        self.matches += len(matched)
+        self.evaluation_ns += time.perf_counter_ns() - started
+        return matched
+        
+    def rules(self) -> List[dict]:
+        """Return the active rule definitions."""
+        return [rule.describe() for rule in self._rules]
+        
+    def stats(self) -> dict:
+        """Return engine metrics."""
+        return {
+            "rules": len(self._rules),
+            "evaluations": self.evaluations,
+            "matches": self.matches,
+            "avg_evaluation_us": round(self.evaluation_ns / self.evaluations / 1000, 2) if self.evaluations else 0.0,
+        }
+
+
+rule_engine = RuleEngine()
+
+
+def compile_rule(definition: dict, source: str = "database") -> CompiledRule:
+    """
+    Compile a rule definition.
+    
+    Args:
+        definition: Rule with name, optional event_type, conditions,
+            severity, alert_type and message template
+        source: Where the rule came from (builtin, file, database)
+        
+    Returns:
+        The compiled rule
+        
+    Raises:
+        ValueError: If the rule is invalid
+    """
+    return CompiledRule(definition, source)
+
+
+def rule_to_dict(rule: AlertRule) -> dict:
+    """Convert a stored rule to a definition dictionary."""
+    return {
+        "id": rule.id,
+        "name": rule.name,
+        "event_type": rule.event_type,
+        "conditions": json.loads(rule.conditions or "[]"),
+        "severity": rule.severity,
+        "alert_type": rule.alert_type,
+        "message": rule.message,
+        "enabled": rule.enabled,
+        "created_at": rule.created_at,
+    }
+
+
+def load_alert_rules(db: Session) -> int:
+    """
+    Compile the built-in, file and database rules and load them.
+    
+    Invalid file or database rules are skipped with a message so one
+    bad rule does not disable alerting.
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        Number of rules loaded
+    """
+    compiled = []
+    if settings.ALERT_RULES_BUILTIN:
+        compiled += [compile_rule(definition, "builtin") for definition in BUILTIN_RULES]
+        
+    definitions = []
+    if settings.ALERT_RULES_FILE:
+        try:
+            with open(settings.ALERT_RULES_FILE, encoding="utf-8") as f:
+                definitions += [(definition, "file") for definition in json.load(f)]
+        except (OSError, ValueError) as e:
+            print(f"Could not read alert rules file {settings.ALERT_RULES_FILE}: {e}")
+    definitions += [
+        (rule_to_dict(rule), "database")
+        for rule in db.query(AlertRule).filter(AlertRule.enabled == True).all()
+    ]
+    
+    for definition, source in definitions:
+        if definition.get("enabled", True) is False:
+            continue
+        try:
+            compiled.append(compile_rule(definition, source))
+        except (ValueError, TypeError) as e:
+            print(f"Skipping alert rule {definition.get('name')!r}: {e}")
+            
+    return rule_engine.load(compiled)
@@ -0,0 +1,321 @@
+# services/search_service.py
+# Full-text search over activity log descriptions and application names
+
+import base64
+import json
+import re
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import column, func, literal_column, or_, and_, select, table, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.core.config import settings, is_postgresql
+from app.models.activity_log import activity_log_view
+
+
+# Orderings accepted by search_activity
+SEARCH_ORDERS = ("rank", "recent")
+
+# Columns returned per result (plus ``score``)
+SEARCH_COLUMNS = [
+    "id", "agent_id", "activity_type", "app_name", "description",
+    "risk_level", "risk_score", "timestamp",
+]
+
+# Query terms beyond this are ignored
+MAX_TERMS = 8
+
+# Indexed text of an activity log row (``new``/``old`` in triggers): its
+# app name and description, the generated one if none is stored
+_APP_NAME = "(SELECT name FROM activity_apps WHERE id = {row}.app_id)"
+_DESCRIPTION = "COALESCE({row}.description, 'Activity in ' || " + _APP_NAME + ")"
+
+
+def _fts_values(row: str) -> str:
+    """Trigger VALUES for the FTS row of ``row``: rowid, app_name, description."""
+    return f"{row}.id, {_APP_NAME.format(row=row)}, {_DESCRIPTION.format(row=row)}"
+
+
+# SQLite: external-content FTS5 table over activity_log_view (the text is
+# not stored twice) with prefix indexes for short prefix queries, kept in
+# sync by triggers on every insert, delete and app/description update.
+# ensure_search_index compares this DDL with sqlite_master and rebuilds
+# the index when it changed
+FTS_TABLE = "activity_logs_fts"
+FTS_TABLE_DDL = (
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "app_name, description, content='activity_log_view', content_rowid='id', prefix='2 3')"
+)
+FTS_TRIGGERS = {
+    "activity_logs_fts_insert": (
+        "CREATE TRIGGER activity_logs_fts_insert AFTER INSERT ON activity_logs BEGIN "
+        "INSERT INTO activity_logs_fts(rowid, app_name, description) "
+        f"VALUES ({_fts_values('new')}); END"
+    ),
+    "activity_logs_fts_delete": (
+        "CREATE TRIGGER activity_logs_fts_delete AFTER DELETE ON activity_logs BEGIN "
+        "INSERT INTO activity_logs_fts(activity_logs_fts, rowid, app_name, description) "
+        f"VALUES ('delete', {_fts_values('old')}); END"
+    ),
+    "activity_logs_fts_update": (
+        "CREATE TRIGGER activity_logs_fts_update "
+        "AFTER UPDATE OF app_id, description ON activity_logs BEGIN "
+        "INSERT INTO activity_logs_fts(activity_logs_fts, rowid, app_name, description) "
+        f"VALUES ('delete', {_fts_values('old')}); "
+        "INSERT INTO activity_logs_fts(rowid, app_name, description) "
+        f"VALUES ({_fts_values('new')}); END"
+    ),
+}
+
+# PostgreSQL: a search_vector column set by a trigger from the same text,
+# split on punctuation like the FTS5 tokenizer so "chrome.exe" matches
+# "exe", with a GIN index on it. The text spans the lookup tables, so
+# it cannot be an expression index
+PG_INDEX = "ix_activity_logs_search_vector"
+PG_FUNCTION = "activity_logs_search_vector"
+PG_VECTOR = (
+    "to_tsvector('simple', regexp_replace("
+    f"coalesce({_APP_NAME}, '') || ' ' || coalesce({_DESCRIPTION}, ''), "
+    "'[^[:alnum:]_]+', ' ', 'g'))"
+)
+PG_DDL = [
+    "ALTER TABLE activity_logs ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    f"CREATE OR REPLACE FUNCTION {PG_FUNCTION}() RETURNS trigger AS $$ BEGIN "
+    f"NEW.search_vector := {PG_VECTOR.format(row='NEW')}; RETURN NEW; END $$ LANGUAGE plpgsql",
+    f"DROP TRIGGER IF EXISTS {PG_FUNCTION} ON activity_logs",
+    f"CREATE TRIGGER {PG_FUNCTION} BEFORE INSERT OR UPDATE OF app_id, description ON activity_logs "
+    f"FOR EACH ROW EXECUTE FUNCTION {PG_FUNCTION}()",
+    f"UPDATE activity_logs SET search_vector = {PG_VECTOR.format(row='activity_logs')}",
+    f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON activity_logs USING GIN (search_vector)",
+]
+
+_available = False
+
+
+def search_available() -> bool:
+    """True once ensure_search_index has found or built the index."""
+    return _available
+
+
+def ensure_search_index(db: Session) -> bool:
+    """
+    Create the full-text index if missing, or drop it when search is disabled.
+    
+    The existence check is a single catalog lookup, so this is cheap on
+    startup. Creating the index backfills it from every activity log,
+    which happens once per database (or after re-enabling search).
+    
+    Args:
+        db: Database session
+        
+    Returns:
+        True if the index was created
+    """
+    global _available
+    _available = False
+    if not settings.ACTIVITY_SEARCH_ENABLED:
+        drop_search_index(db)
+        return False
+        
+    if is_postgresql():
+        exists = db.execute(text("SELECT to_regclass(:name)"), {"name": PG_INDEX}).scalar() is not None
+        if not exists:
+            for ddl in PG_DDL:
+                db.execute(text(ddl))
+            db.commit()
+            print("Built activity search index")
+        _available = True
+        return not exists
+        
+    expected = {FTS_TABLE: FTS_TABLE_DDL, **FTS_TRIGGERS}
+    found = dict(db.execute(
+        text("SELECT name, sql FROM sqlite_master WHERE name IN (%s)" % ", ".join(f"'{name}'" for name in expected))
+    ).all())
+    if found == expected:
+        _available = True
+        return False
+        
+    try:
+        # Missing or outdated: recreate everything and re-read every row,
+        # which also repairs an index that missed writes meanwhile
+        drop_search_index(db, commit=False)
+        db.execute(text(FTS_TABLE_DDL))
+        for ddl in FTS_TRIGGERS.values():
+            db.execute(text(ddl))
+        rebuild_search_index(db)
+        db.commit()
+    except OperationalError as e:
+        db.rollback()
+        print(f"Activity search unavailable (SQLite built without FTS5?): {e}")
+        return False
+    print("Built activity search index")
+    _available = True
+    return True
+
+
+def rebuild_search_index(db: Session) -> None:
+    """
+    Re-read every activity log into the SQLite FTS5 index.
+    
+    For bulk loads that bypass the triggers. A no-op on PostgreSQL,
+    whose search_vector trigger cannot be bypassed. The caller commits.
+    """
+    if not is_postgresql():
+        db.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def drop_search_index(db: Session, commit: bool = True) -> None:
+    """Remove the full-text index and its triggers, so ingest stops paying for them."""
+    if is_postgresql():
+        db.execute(text(f"DROP TRIGGER IF EXISTS {PG_FUNCTION} ON activity_logs"))
+        db.execute(text(f"DROP FUNCTION IF EXISTS {PG_FUNCTION}()"))
+        db.execute(text("ALTER TABLE activity_logs DROP COLUMN IF EXISTS search_vector"))
+    else:
+        for name in FTS_TRIGGERS:
+            db.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+        db.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+    if commit:
+        db.commit()
+
+
+def parse_search_terms(q: str) -> List[str]:
+    """
+    Split a search string into lowercase word terms.
+    
+    Only letters, digits and underscores are kept, so user input never
+    reaches the FTS5 or tsquery syntax; every term is matched as a prefix
+    and all terms must match.
+    """
+    return re.findall(r"\w+", q.lower())[:MAX_TERMS]
+
+
+def encode_cursor(values: dict) -> str:
+    """Opaque keyset cursor for the next page."""
+    raw = json.dumps(values, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str) -> dict:
+    """
+    Decode a cursor returned by search_activity.
+    
+    Raises:
+        ValueError: If the cursor is malformed or from another ordering
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        keys = {"s", "id"} if order == "rank" else {"id"}
+        if not isinstance(values, dict) or set(values) != keys:
+            raise ValueError
+        values["id"] = int(values["id"])
+        if "s" in values:
+            values["s"] = float(values["s"])
+        return values
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def search_activity(
+    db: Session,
+    q: str,
+    order: str = "rank",
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    risk_levels: Optional[List[str]] = None,
+    agent_id: Optional[int] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None
+) -> dict:
+    """
+    Search activity logs by app name and description text.
+    
+    With ``order="rank"`` results are best match first (BM25 on SQLite,
+    ts_rank on PostgreSQL), ties broken by id; with ``order="recent"``
+    they are newest first. Pages are keyset-paginated: pass the returned
+    ``next_cursor`` to continue. Ranks are recomputed on every page, so
+    rows ingested between pages can shift rank-ordered results slightly.
+    
+    Args:
+        db: Database session
+        q: Search text; every word must match, as a prefix
+        order: "rank" or "recent"
+        start: Optional inclusive lower bound on timestamp
+        end: Optional exclusive upper bound on timestamp
+        risk_levels: Optional risk levels to include
+        agent_id: Optional agent filter
+        limit: Maximum results per page
+        cursor: Cursor from the previous page
+        
+    Returns:
+        Dict with ``items`` (SEARCH_COLUMNS plus ``score``) and ``next_cursor``
+        
+    Raises:
+        ValueError: On empty search text, an unknown order or a bad cursor
+    """
+    if order not in SEARCH_ORDERS:
+        raise ValueError(f"order must be one of: {', '.join(SEARCH_ORDERS)}")
+    terms = parse_search_terms(q)
+    if not terms:
+        raise ValueError("q must contain at least one word")
+    after = decode_cursor(cursor, order) if cursor else None
+    
+    activity = activity_log_view
+    columns = [activity.c[name] for name in SEARCH_COLUMNS]
+    if is_postgresql():
+        # ts_rank is higher-is-better
+        logs = table("activity_logs", column("id"), column("search_vector"))
+        query = func.to_tsquery("simple", " & ".join(f"{term}:*" for term in terms))
+        score = func.ts_rank(logs.c.search_vector, query)
+        stmt = (
+            select(*columns, score.label("score"))
+            .select_from(logs.join(activity, activity.c.id == logs.c.id))
+            .where(logs.c.search_vector.op("@@")(query))
+        )
+        row_id = logs.c.id
+        if order == "rank":
+            if after:
+                stmt = stmt.where(or_(score < after["s"], and_(score == after["s"], row_id > after["id"])))
+            stmt = stmt.order_by(score.desc(), row_id)
+    else:
+        # bm25 is lower-is-better; scores are reported negated
+        fts = table(FTS_TABLE, column("rowid"))
+        match = " ".join(f'"{term}"*' for term in terms)
+        score = func.bm25(literal_column(FTS_TABLE))
+        stmt = (
+            select(*columns, score.label("score"))
+            .select_from(fts.join(activity, activity.c.id == fts.c.rowid))
+            .where(literal_column(FTS_TABLE).op("MATCH")(match))
+        )
+        row_id = fts.c.rowid
+        if order == "rank":
+            if after:
+                stmt = stmt.where(or_(score > after["s"], and_(score == after["s"], row_id > after["id"])))
+            stmt = stmt.order_by(score, row_id)
+            
+    if order == "recent":
+        if after:
+            stmt = stmt.where(row_id < after["id"])
+        stmt = stmt.order_by(row_id.desc())
+    if start is not None:
+        stmt = stmt.where(activity.c.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(activity.c.timestamp < end)
+    if risk_levels:
+        stmt = stmt.where(activity.c.risk_level.in_(risk_levels))
+    if agent_id is not None:
+        stmt = stmt.where(activity.c.agent_id == agent_id)
+        
+    rows = db.execute(stmt.limit(limit + 1)).all()
+    items = []
+    for row in rows[:limit]:
+        item = dict(zip(SEARCH_COLUMNS, row))
+        raw = row.score
+        item["score"] = round(raw if is_postgresql() else -raw, 6)
+        items.append(item)
+        
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor({"s": last.score, "id": last.id} if order == "rank" else {"id": last.id})
+    return {"items": items, "next_cursor": next_cursor}
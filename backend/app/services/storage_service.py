@@ -0,0 +1,194 @@
+# services/storage_service.py
+# Activity log storage: migration to lookup-encoded strings and size reporting
+
+import time
+from typing import Optional
+
+from sqlalchemy import case, column, inspect, insert, literal, select, table, text, String
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.core.config import is_postgresql
+from app.core.database import Base, engine, insert_on_conflict
+from app.models.activity_log import ActivityLog, RISK_LEVEL_CODES
+from app.models.activity_lookup import LOOKUP_FIELDS, LOOKUP_MODELS, activity_lookups
+
+
+LEGACY_TABLE = "activity_logs_legacy"
+
+# activity_logs before strings were moved to lookup tables
+_legacy = table(
+    LEGACY_TABLE,
+    column("id"),
+    column("agent_id"),
+    column("user_id", String),
+    column("activity_type", String),
+    column("description", String),
+    column("app_name", String),
+    column("risk_level", String),
+    column("risk_score"),
+    column("timestamp"),
+)
+
+
+def table_storage(conn, name: str) -> dict:
+    """
+    Row count and on-disk bytes of a table and its indexes.
+    
+    Sizes come from dbstat on SQLite and pg_relation_size on PostgreSQL
+    (including TOAST); they are None if the SQLite build lacks dbstat.
+    
+    Args:
+        conn: Connection or session
+        name: Table name
+    """
+    rows = conn.execute(text(f"SELECT COUNT(*) FROM {name}")).scalar()
+    if is_postgresql():
+        table_bytes, index_bytes = conn.execute(
+            text("SELECT pg_total_relation_size(:t) - pg_indexes_size(:t), pg_indexes_size(:t)"),
+            {"t": name}
+        ).one()
+    else:
+        try:
+            sizes = dict(conn.execute(text(
+                "SELECT name, SUM(pgsize) FROM dbstat WHERE aggregate = TRUE AND name IN "
+                "(SELECT name FROM sqlite_master WHERE tbl_name = :t AND type IN ('table', 'index')) "
+                "GROUP BY name"
+            ), {"t": name}).all())
+        except SQLAlchemyError:
+            return {"rows": rows, "table_bytes": None, "index_bytes": None, "bytes_per_row": None}
+        table_bytes = sizes.pop(name, 0)
+        index_bytes = sum(sizes.values())
+    return {
+        "rows": rows,
+        "table_bytes": table_bytes,
+        "index_bytes": index_bytes,
+        "bytes_per_row": round((table_bytes + index_bytes) / rows, 1) if rows else None,
+    }
+
+
+def storage_report(db: Session) -> dict:
+    """
+    Report activity log storage, lookup table sizes and intern cache counters.
+    
+    ``bytes_per_row`` counts the activity_logs table and its indexes;
+    ``bytes_per_row_with_lookups`` adds the lookup tables, which are
+    shared by all rows.
+    """
+    activity = table_storage(db, ActivityLog.__tablename__)
+    lookups = {kind: table_storage(db, model.__tablename__) for kind, model in LOOKUP_MODELS.items()}
+    with_lookups = None
+    if activity["rows"] and activity["table_bytes"] is not None:
+        total = activity["table_bytes"] + activity["index_bytes"] + sum(
+            lookup["table_bytes"] + lookup["index_bytes"] for lookup in lookups.values()
+        )
+        with_lookups = round(total / activity["rows"], 1)
+    return {
+        "activity_logs": activity,
+        "bytes_per_row_with_lookups": with_lookups,
+        "lookups": lookups,
+        "intern_cache": activity_lookups.stats(),
+    }
+
+
+def _copy_legacy_rows(conn) -> int:
+    """Fill the lookup tables and activity_logs from the legacy table; returns rows copied."""
+    for field, (kind, _) in LOOKUP_FIELDS.items():
+        lookup = LOOKUP_MODELS[kind].__table__
+        names = select(_legacy.c[field]).where(_legacy.c[field].isnot(None)).distinct()
+        conn.execute(insert_on_conflict(lookup).from_select(["name"], names).on_conflict_do_nothing())
+        
+    users, types, apps = (LOOKUP_MODELS[kind].__table__.alias() for kind in ("user", "activity_type", "app"))
+    generated = literal("Activity in ") + _legacy.c.app_name
+    rows = (
+        select(
+            _legacy.c.id,
+            _legacy.c.agent_id,
+            users.c.id,
+            types.c.id,
+            apps.c.id,
+            case((_legacy.c.description == generated, None), else_=_legacy.c.description),
+            case(RISK_LEVEL_CODES, value=_legacy.c.risk_level, else_=0),
+            _legacy.c.risk_score,
+            _legacy.c.timestamp,
+        )
+        .select_from(
+            _legacy
+            .outerjoin(users, users.c.name == _legacy.c.user_id)
+            .join(types, types.c.name == _legacy.c.activity_type)
+            .outerjoin(apps, apps.c.name == _legacy.c.app_name)
+        )
+    )
+    # Indexes are built after the copy: faster, and packed full
+    activity = ActivityLog.__table__
+    for index in activity.indexes:
+        index.drop(bind=conn, checkfirst=True)
+    result = conn.execute(insert(activity).from_select([
+        "id", "agent_id", "activity_user_id", "activity_type_id", "app_id",
+        "description", "risk_level", "risk_score", "timestamp",
+    ], rows))
+    for index in activity.indexes:
+        index.create(bind=conn)
+    conn.execute(text(f"DROP TABLE {LEGACY_TABLE}"))
+    for name in [activity.name] + [model.__tablename__ for model in LOOKUP_MODELS.values()]:
+        conn.execute(text(f"ANALYZE {name}"))
+    if is_postgresql():
+        conn.execute(text(
+            "SELECT setval(pg_get_serial_sequence('activity_logs', 'id'), "
+            "COALESCE((SELECT MAX(id) FROM activity_logs), 0) + 1, false)"
+        ))
+    return result.rowcount
+
+
+def migrate_activity_logs() -> bool:
+    """
+    Move activity log strings into lookup tables, if the table predates them.
+    
+    A table with an ``app_name`` column is renamed to activity_logs_legacy,
+    the new table and lookup tables are created, distinct strings are
+    loaded into the lookups and every row is copied across with its
+    strings replaced by ids, its risk level by a code and a generated
+    description dropped. The copy and the drop of the legacy table run in
+    one transaction; if the process stops before it commits, the next
+    start finds activity_logs_legacy and copies again. Ids are kept, so
+    rollups, alerts and search cursors stay valid.
+    
+    Returns:
+        True if a legacy table was migrated
+    """
+    tables = set(inspect(engine).get_table_names())
+    if LEGACY_TABLE not in tables:
+        if ActivityLog.__tablename__ not in tables:
+            return False
+        columns = {c["name"] for c in inspect(engine).get_columns(ActivityLog.__tablename__)}
+        if "app_name" not in columns:
+            return False
+            
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        before: Optional[dict] = None
+        if LEGACY_TABLE not in tables:
+            before = table_storage(conn, ActivityLog.__tablename__)
+            # The new table's indexes and PostgreSQL serial take the same names
+            for index in ActivityLog.__table__.indexes:
+                conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+            if is_postgresql():
+                conn.execute(text(f"ALTER INDEX IF EXISTS activity_logs_pkey RENAME TO {LEGACY_TABLE}_pkey"))
+                conn.execute(text(f"ALTER SEQUENCE IF EXISTS activity_logs_id_seq RENAME TO {LEGACY_TABLE}_id_seq"))
+            conn.execute(text(f"ALTER TABLE activity_logs RENAME TO {LEGACY_TABLE}"))
+        lookups = [model.__table__ for model in LOOKUP_MODELS.values()]
+        Base.metadata.create_all(bind=conn, tables=lookups + [ActivityLog.__table__])
+        
+    with engine.begin() as conn:
+        # Resumed copies start over: the earlier attempt never committed
+        conn.execute(ActivityLog.__table__.delete())
+        rows = _copy_legacy_rows(conn)
+    activity_lookups.clear()
+    
+    with engine.connect() as conn:
+        after = table_storage(conn, ActivityLog.__tablename__)
+    message = f"Migrated {rows} activity logs to lookup-encoded strings in {time.perf_counter() - started:.1f}s"
+    if before and before["bytes_per_row"] and after["bytes_per_row"]:
+        message += f" ({before['bytes_per_row']:.0f} -> {after['bytes_per_row']:.0f} bytes/row)"
+    print(message)
+    return True
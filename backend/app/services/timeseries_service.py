@@ -0,0 +1,326 @@
+# services/timeseries_service.py
+# Time-series aggregation of activity with SQL-side bucketing
+
+import calendar
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import Integer, cast, func, literal, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings, is_postgresql
+from app.models.activity_log import ActivityLog
+from app.models.activity_lookup import ActivityApp
+from app.models.activity_rollup import ActivityRollup
+
+
+# Bucket sizes in seconds
+BUCKETS = {
+    "1m": 60,
+    "5m": 300,
+    "1h": 3600,
+}
+
+METRICS = ("count", "avg_risk")
+
+GROUP_BYS = ("risk_level", "agent", "app")
+
+# Series beyond TIMESERIES_MAX_SERIES are folded into this one
+OTHER_SERIES = "other"
+
+
+def _to_epoch(timestamp: datetime) -> int:
+    """Seconds since the epoch for a naive UTC datetime."""
+    return calendar.timegm(timestamp.utctimetuple())
+
+
+def _bucket_epoch(column, seconds: int):
+    """
+    SQL expression for the epoch second at which ``column``'s bucket starts.
+    
+    SQLite buckets with ``strftime('%s')`` and integer division.
+    PostgreSQL uses ``date_trunc`` for minute and hour buckets and epoch
+    arithmetic for other widths.
+    """
+    if is_postgresql():
+        if seconds == 60:
+            return cast(func.extract("epoch", func.date_trunc("minute", column)), Integer)
+        if seconds == 3600:
+            return cast(func.extract("epoch", func.date_trunc("hour", column)), Integer)
+        return cast(func.floor(func.extract("epoch", column) / seconds) * seconds, Integer)
+    return (cast(func.strftime("%s", column), Integer) // seconds) * seconds
+
+
+def _source_query(group_by: Optional[str], seconds: int, start: datetime, end: datetime):
+    """
+    Build the per-bucket, per-series aggregate query for [start, end).
+    
+    Reads the activity rollups when they can answer the query (grouping
+    by nothing, risk level or agent), otherwise the raw activity logs.
+    """
+    use_rollups = settings.ACTIVITY_ROLLUPS_ENABLED and group_by != "app"
+    
+    if use_rollups:
+        granularity = "hour" if seconds % 3600 == 0 else "minute"
+        bucket = _bucket_epoch(ActivityRollup.bucket_start, seconds)
+        keys = {
+            None: literal("all"),
+            "risk_level": ActivityRollup.risk_level,
+            "agent": ActivityRollup.agent_id,
+        }
+        return select(
+            bucket,
+            keys[group_by],
+            func.sum(ActivityRollup.activity_count),
+            func.sum(ActivityRollup.risk_score_sum),
+        ).where(
+            ActivityRollup.granularity == granularity,
+            ActivityRollup.bucket_start >= start,
+            ActivityRollup.bucket_start < end
+        ).group_by(bucket, keys[group_by])
+        
+    bucket = _bucket_epoch(ActivityLog.timestamp, seconds)
+    # Same NULL handling as the rollup buckets
+    keys = {
+        None: literal("all"),
+        "risk_level": ActivityLog.risk_level,
+        "agent": func.coalesce(ActivityLog.agent_id, 0),
+        "app": ActivityApp.name,
+    }
+    stmt = select(
+        bucket,
+        keys[group_by],
+        func.count(ActivityLog.id),
+        func.sum(ActivityLog.risk_score),
+    ).where(
+        ActivityLog.timestamp >= start,
+        ActivityLog.timestamp < end
+    ).group_by(bucket, keys[group_by])
+    if group_by == "app":
+        stmt = stmt.outerjoin(ActivityApp, ActivityApp.id == ActivityLog.app_id)
+    return stmt
+
+
+class ClosedBucketCache:
+    """
+    Cache of aggregates for buckets that have already ended.
+    
+    Activity timestamps are assigned at ingest, so once a bucket has
+    ended (plus TIMESERIES_CACHE_GRACE_SECONDS for transactions still
+    committing) its aggregates only change when rows are purged or
+    rollups rebuilt; retention and the rollup backfill call ``clear``.
+    For each (bucket size, group_by) the cache holds a contiguous range
+    of closed buckets; requests only query SQL for the part of the
+    window outside it. At most ``max_cells`` (bucket, series) values are
+    kept, dropping the least recently stored ranges and then the oldest
+    buckets of a range.
+    """
+    
+    def __init__(self, max_buckets: int, max_cells: int):
+        self.max_buckets = max_buckets
+        self.max_cells = max_cells
+        self._ranges = OrderedDict()
+        self._cells = 0
+        self._lock = threading.Lock()
+        
+    def get(self, key, start_epoch: int, closed_epoch: int):
+        """
+        Return cached buckets and the cached range for a request.
+        
+        Returns:
+            Tuple of (buckets dict, cached_start, cached_end), or
+            ({}, None, None) if nothing usable is cached
+        """
+        with self._lock:
+            entry = self._ranges.get(key)
+            if entry is None:
+                return {}, None, None
+            cached_start, cached_end, buckets, _ = entry
+            lo = max(start_epoch, cached_start)
+            hi = min(closed_epoch, cached_end)
+            if lo >= hi:
+                return {}, None, None
+            return (
+                {epoch: data for epoch, data in buckets.items() if lo <= epoch < hi},
+                lo,
+                hi,
+            )
+            
+    def put(self, key, start_epoch: int, end_epoch: int, buckets: dict, seconds: int) -> None:
+        """Store closed buckets covering [start_epoch, end_epoch)."""
+        if start_epoch >= end_epoch:
+            return
+        with self._lock:
+            buckets = dict(buckets)
+            entry = self._ranges.pop(key, None)
+            if entry is not None:
+                cached_start, cached_end, cached, cells = entry
+                self._cells -= cells
+                # Extend the cached range if contiguous, otherwise replace it
+                if start_epoch <= cached_end and end_epoch >= cached_start:
+                    cached.update(buckets)
+                    start_epoch = min(start_epoch, cached_start)
+                    end_epoch = max(end_epoch, cached_end)
+                    buckets = cached
+                    
+            oldest = end_epoch - self.max_buckets * seconds
+            if start_epoch < oldest:
+                buckets = {epoch: data for epoch, data in buckets.items() if epoch >= oldest}
+                start_epoch = oldest
+                
+            cells = sum(len(series) for series in buckets.values())
+            for epoch in sorted(buckets):
+                if cells <= self.max_cells:
+                    break
+                cells -= len(buckets.pop(epoch))
+                start_epoch = epoch + seconds
+            if start_epoch >= end_epoch:
+                return
+                
+            while self._ranges and self._cells + cells > self.max_cells:
+                _, (_, _, _, evicted) = self._ranges.popitem(last=False)
+                self._cells -= evicted
+            self._ranges[key] = (start_epoch, end_epoch, buckets, cells)
+            self._cells += cells
+            
+    def clear(self) -> None:
+        """Drop all cached buckets."""
+        with self._lock:
+            self._ranges.clear()
+            self._cells = 0
+
+
+closed_bucket_cache = ClosedBucketCache(
+    max_buckets=settings.TIMESERIES_MAX_POINTS,
+    max_cells=settings.TIMESERIES_CACHE_MAX_CELLS
+)
+
+
+def _query_buckets(db: Session, group_by: Optional[str], seconds: int, start_epoch: int, end_epoch: int) -> dict:
+    """Aggregate [start_epoch, end_epoch) into {bucket: {series: [count, sum]}}."""
+    buckets = {}
+    if start_epoch >= end_epoch:
+        return buckets
+    stmt = _source_query(
+        group_by,
+        seconds,
+        datetime.utcfromtimestamp(start_epoch),
+        datetime.utcfromtimestamp(end_epoch)
+    )
+    for epoch, key, count, score_sum in db.execute(stmt):
+        series = buckets.setdefault(int(epoch), {})
+        entry = series.setdefault(str(key) if key is not None else "unknown", [0, 0.0])
+        entry[0] += count or 0
+        entry[1] += score_sum or 0.0
+    return buckets
+
+
+def get_activity_timeseries(
+    db: Session,
+    bucket: str = "5m",
+    metric: str = "count",
+    group_by: Optional[str] = None,
+    hours: int = 24,
+    now: Optional[datetime] = None
+) -> dict:
+    """
+    Get activity counts or average risk over time.
+    
+    Buckets are computed in SQL, missing buckets are filled with 0
+    (count) or None (avg_risk), and buckets that ended more than
+    TIMESERIES_CACHE_GRACE_SECONDS ago are served from an in-process
+    cache on later calls.
+    
+    Args:
+        db: Database session
+        bucket: Bucket size (1m, 5m, 1h)
+        metric: count or avg_risk
+        group_by: Optional series split (risk_level, agent, app)
+        hours: Number of hours to look back
+        now: Optional reference time (defaults to the current UTC time)
+        
+    Returns:
+        Dictionary with bucket timestamps and one value list per series
+        
+    Raises:
+        ValueError: If a parameter is invalid or too many points are requested
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"bucket must be one of: {', '.join(BUCKETS)}")
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of: {', '.join(METRICS)}")
+    if group_by is not None and group_by not in GROUP_BYS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_BYS)}")
+        
+    seconds = BUCKETS[bucket]
+    now = now or datetime.utcnow()
+    now_epoch = _to_epoch(now)
+    start_epoch = (_to_epoch(now - timedelta(hours=hours)) // seconds) * seconds
+    open_epoch = (now_epoch // seconds) * seconds  # start of the current, still-open bucket
+    
+    points = (open_epoch - start_epoch) // seconds + 1
+    if points > settings.TIMESERIES_MAX_POINTS:
+        raise ValueError(
+            f"Requested {points} points; the maximum is {settings.TIMESERIES_MAX_POINTS}. "
+            f"Use a larger bucket or fewer hours."
+        )
+        
+    # Buckets that ended within the grace period may still gain rows
+    # from transactions that have not committed yet, so are not cached
+    settled_epoch = ((now_epoch - settings.TIMESERIES_CACHE_GRACE_SECONDS) // seconds) * seconds
+    settled_epoch = max(start_epoch, min(open_epoch, settled_epoch))
+    
+    cache_key = (bucket, group_by, settings.ACTIVITY_ROLLUPS_ENABLED and group_by != "app")
+    buckets, cached_start, cached_end = closed_bucket_cache.get(cache_key, start_epoch, settled_epoch)
+    
+    if cached_start is None:
+        closed = _query_buckets(db, group_by, seconds, start_epoch, settled_epoch)
+        closed_bucket_cache.put(cache_key, start_epoch, settled_epoch, closed, seconds)
+        buckets = closed
+    else:
+        before = _query_buckets(db, group_by, seconds, start_epoch, cached_start)
+        after = _query_buckets(db, group_by, seconds, cached_end, settled_epoch)
+        closed_bucket_cache.put(cache_key, start_epoch, cached_start, before, seconds)
+        closed_bucket_cache.put(cache_key, cached_end, settled_epoch, after, seconds)
+        buckets = {**before, **buckets, **after}
+        
+    buckets = {**buckets, **_query_buckets(db, group_by, seconds, settled_epoch, open_epoch + seconds)}
+    
+    # Keep the largest series; fold the rest into "other"
+    totals = {}
+    for series in buckets.values():
+        for key, (count, _) in series.items():
+            totals[key] = totals.get(key, 0) + count
+    ranked = sorted(totals, key=totals.get, reverse=True)
+    kept = set(ranked[:settings.TIMESERIES_MAX_SERIES])
+    names = [key for key in ranked if key in kept]
+    if len(ranked) > len(kept):
+        names.append(OTHER_SERIES)
+        
+    epochs = list(range(start_epoch, open_epoch + seconds, seconds))
+    values = {name: [] for name in names}
+    for epoch in epochs:
+        merged = {}
+        for key, (count, score_sum) in buckets.get(epoch, {}).items():
+            name = key if key in kept else OTHER_SERIES
+            entry = merged.setdefault(name, [0, 0.0])
+            entry[0] += count
+            entry[1] += score_sum
+        for name in names:
+            count, score_sum = merged.get(name, (0, 0.0))
+            if metric == "count":
+                values[name].append(count)
+            else:
+                values[name].append(round(score_sum / count, 2) if count else None)
+                
+    return {
+        "bucket": bucket,
+        "metric": metric,
+        "group_by": group_by,
+        "start": datetime.utcfromtimestamp(start_epoch),
+        "end": datetime.utcfromtimestamp(open_epoch + seconds),
+        "timestamps": [datetime.utcfromtimestamp(epoch) for epoch in epochs],
+        "series": values,
+    }
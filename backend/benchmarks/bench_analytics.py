@@ -0,0 +1,143 @@
+# benchmarks/bench_analytics.py
+# Benchmark for the vectorized agent risk trend analytics
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench_analytics
+#   python -m benchmarks.bench_analytics --rows 10000000 --agents 1000 --db-rows 1000000
+
+import argparse
+import calendar
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services.analytics_service import compute_agent_trends, load_activity_arrays
+
+
+HOURS = 30 * 24
+
+
+def synthetic_arrays(rows: int, agents: int, start_epoch: int, seed: int = 42):
+    """Random (agent_id, epoch, risk_score) arrays spread over 30 days."""
+    rng = np.random.default_rng(seed)
+    agent_ids = rng.integers(1, agents + 1, size=rows, dtype=np.int64)
+    epochs = start_epoch + rng.random(rows) * HOURS * 3600
+    scores = np.clip(rng.gamma(2.0, 1.2, size=rows), 0.0, 10.0)
+    return agent_ids, epochs, scores
+
+
+def python_baseline(agent_ids, epochs, scores, start_epoch: int, alpha: float = 0.1) -> dict:
+    """Per-row Python equivalent of the EWMA part, for comparison."""
+    buckets = {}
+    for agent_id, epoch, score in zip(agent_ids.tolist(), epochs.tolist(), scores.tolist()):
+        hour = int((epoch - start_epoch) // 3600)
+        entry = buckets.setdefault(agent_id, {}).setdefault(hour, [0, 0.0])
+        entry[0] += 1
+        entry[1] += score
+    ewma = {}
+    for agent_id, hours in buckets.items():
+        value = None
+        for hour in sorted(hours):
+            count, total = hours[hour]
+            mean = total / count
+            value = mean if value is None else alpha * mean + (1 - alpha) * value
+        ewma[agent_id] = value
+    return ewma
+
+
+def best_of(repeats: int, func, *args):
+    """Best wall time of ``repeats`` calls and the last result."""
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def bench_database(rows: int, agents: int, start: datetime) -> float:
+    """Seed a temporary SQLite database and time load_activity_arrays."""
+    from sqlalchemy import create_engine, insert
+    from sqlalchemy.orm import sessionmaker
+    from app.core.database import Base
+    from app.models.activity_log import ActivityLog
+    from app.models.activity_lookup import ActivityType
+    import app.models  # noqa: F401  (register all tables)
+    
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    
+    start_epoch = calendar.timegm(start.utctimetuple())
+    agent_ids, epochs, scores = synthetic_arrays(rows, agents, start_epoch)
+    batch = 50_000
+    with engine.begin() as conn:
+        conn.execute(insert(ActivityType.__table__).values(id=1, name="app"))
+        for offset in range(0, rows, batch):
+            conn.execute(insert(ActivityLog.__table__), [
+                {
+                    "agent_id": int(agent_id),
+                    "activity_type_id": 1,
+                    "risk_level": "low",
+                    "risk_score": float(score),
+                    "timestamp": datetime.utcfromtimestamp(float(epoch)),
+                }
+                for agent_id, epoch, score in zip(
+                    agent_ids[offset:offset + batch],
+                    epochs[offset:offset + batch],
+                    scores[offset:offset + batch]
+                )
+            ])
+            
+    db = sessionmaker(bind=engine)()
+    try:
+        started = time.perf_counter()
+        loaded = load_activity_arrays(db, start, start + timedelta(hours=HOURS))
+        elapsed = time.perf_counter() - started
+    finally:
+        db.close()
+        engine.dispose()
+        os.remove(path)
+    assert len(loaded[0]) == rows
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent risk trend analytics benchmark")
+    parser.add_argument("--rows", type=int, default=10_000_000, help="Rows for the NumPy benchmark")
+    parser.add_argument("--agents", type=int, default=1000, help="Number of distinct agents")
+    parser.add_argument("--python-rows", type=int, default=500_000, help="Rows for the per-row Python baseline")
+    parser.add_argument("--db-rows", type=int, default=0, help="Also time loading this many rows from SQLite")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+    
+    start = datetime(2024, 1, 1)
+    start_epoch = calendar.timegm(start.utctimetuple())
+    
+    agent_ids, epochs, scores = synthetic_arrays(args.rows, args.agents, start_epoch)
+    elapsed, trends = best_of(
+        args.repeats, compute_agent_trends, agent_ids, epochs, scores, start_epoch, HOURS
+    )
+    print(f"numpy: {args.rows:,} rows, {len(trends['agents'])} agents x {HOURS} hours "
+          f"in {elapsed:.3f}s ({elapsed / args.rows * 1e9:.1f} ns/row)")
+          
+    sample = slice(0, args.python_rows)
+    py_elapsed, _ = best_of(
+        1, python_baseline, agent_ids[sample], epochs[sample], scores[sample], start_epoch
+    )
+    per_row = py_elapsed / args.python_rows
+    print(f"python: {args.python_rows:,} rows in {py_elapsed:.3f}s ({per_row * 1e9:.1f} ns/row, "
+          f"~{per_row * args.rows:.1f}s extrapolated to {args.rows:,} rows)")
+          
+    if args.db_rows:
+        load_elapsed = bench_database(args.db_rows, args.agents, start)
+        print(f"sqlite load: {args.db_rows:,} rows in {load_elapsed:.3f}s "
+              f"({load_elapsed / args.db_rows * 1e9:.1f} ns/row)")
+
+
+if __name__ == "__main__":
+    main()
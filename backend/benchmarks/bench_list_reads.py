@@ -0,0 +1,148 @@
+# benchmarks/bench_list_reads.py
+# Benchmark for the activity/alert list read path: ORM + Pydantic vs Core rows
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench_list_reads
+#   python -m benchmarks.bench_list_reads --rows 200000 --limit 1000
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.cache import encode_json
+from app.core.database import Base, create_views
+from app.models.activity_log import ActivityLog
+from app.models.activity_lookup import ActivityApp, ActivityType, ActivityUser
+from app.models.alert import Alert
+from app.schemas.activity_log import ActivityLogListResponse
+from app.schemas.alert import AlertListResponse
+from app.services.activity_service import list_activity_rows
+from app.services.alert_service import list_alert_rows
+import app.models  # noqa: F401  (register all tables)
+
+
+def seed(engine, rows: int, seed_value: int = 11) -> None:
+    """Insert ``rows`` activity logs and ``rows // 10`` alerts."""
+    rng = random.Random(seed_value)
+    start = datetime(2024, 1, 1)
+    activity_types = ["app", "browser", "usb", "file"]
+    with engine.begin() as conn:
+        # Lookup ids: pc-N and appN.exe are id N, activity types in list order
+        conn.execute(insert(ActivityUser.__table__), [{"id": i, "name": f"pc-{i}"} for i in range(1, 201)])
+        conn.execute(insert(ActivityType.__table__), [
+            {"id": i, "name": name} for i, name in enumerate(activity_types, start=1)
+        ])
+        conn.execute(insert(ActivityApp.__table__), [{"id": i, "name": f"app{i}.exe"} for i in range(1, 301)])
+        conn.execute(insert(ActivityLog.__table__), [
+            {
+                "agent_id": rng.randint(1, 200),
+                "activity_user_id": rng.randint(1, 200),
+                "activity_type_id": rng.randint(1, len(activity_types)),
+                "app_id": rng.randint(1, 300),
+                "risk_level": rng.choice(["low", "medium", "high"]),
+                "risk_score": round(rng.uniform(0, 10), 2),
+                "timestamp": start + timedelta(seconds=i),
+            }
+            for i in range(rows)
+        ])
+        conn.execute(insert(Alert.__table__), [
+            {
+                "agent_id": rng.randint(1, 200),
+                "alert_type": "high_risk",
+                "message": f"High risk activity detected #{i}",
+                "severity": rng.choice(["medium", "high", "critical"]),
+                "is_resolved": rng.random() < 0.5,
+                "created_at": start + timedelta(seconds=i * 10),
+                "occurrence_count": 1,
+            }
+            for i in range(max(rows // 10, 1))
+        ])
+
+
+def orm_path(fetch, schema):
+    """Previous path: ORM entities, Pydantic validation, jsonable_encoder, json."""
+    def run(db, limit):
+        items = [schema.model_validate(item) for item in fetch(db, limit)]
+        return json.dumps(jsonable_encoder(items), separators=(",", ":")).encode("utf-8")
+    return run
+
+
+def rows_path(fetch):
+    """New path: Core column projection to dicts, encoded directly."""
+    def run(db, limit):
+        return encode_json(fetch(db, limit))
+    return run
+
+
+def time_path(session_factory, run, limit: int, repeats: int) -> float:
+    """Best seconds per call over ``repeats`` calls, each in a fresh session."""
+    best = float("inf")
+    for _ in range(repeats):
+        db = session_factory()
+        try:
+            started = time.perf_counter()
+            run(db, limit)
+            best = min(best, time.perf_counter() - started)
+        finally:
+            db.close()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List endpoint read path benchmark")
+    parser.add_argument("--rows", type=int, default=100_000, help="Activity rows to seed")
+    parser.add_argument("--limit", type=int, default=1000, help="Rows per list call")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+    
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    create_views(engine)
+    seed(engine, args.rows)
+    session_factory = sessionmaker(bind=engine)
+    
+    cases = [
+        (
+            "activity",
+            orm_path(
+                lambda db, limit: db.query(ActivityLog).order_by(ActivityLog.timestamp.desc()).limit(limit).all(),
+                ActivityLogListResponse
+            ),
+            rows_path(lambda db, limit: list_activity_rows(db, 0, limit)),
+        ),
+        (
+            "alerts",
+            orm_path(
+                lambda db, limit: db.query(Alert).order_by(Alert.created_at.desc()).limit(limit).all(),
+                AlertListResponse
+            ),
+            rows_path(lambda db, limit: list_alert_rows(db, 0, limit)),
+        ),
+    ]
+    try:
+        for name, before, after in cases:
+            db = session_factory()
+            try:
+                assert json.loads(before(db, args.limit)) == json.loads(after(db, args.limit))
+            finally:
+                db.close()
+            before_s = time_path(session_factory, before, args.limit, args.repeats)
+            after_s = time_path(session_factory, after, args.limit, args.repeats)
+            print(f"{name:8s} limit={args.limit}: orm+pydantic {before_s / args.limit * 1e6:.2f} us/row, "
+                  f"core rows {after_s / args.limit * 1e6:.2f} us/row ({before_s / after_s:.1f}x)")
+    finally:
+        engine.dispose()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
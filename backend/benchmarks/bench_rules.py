@@ -0,0 +1,123 @@
+# benchmarks/bench_rules.py
+# Benchmark for per-event alert rule evaluation
+#
+# Usage (from backend/):
+#   python -m benchmarks.bench_rules
+#   python -m benchmarks.bench_rules --rules 1000 --events 200000
+
+import argparse
+import operator
+import random
+import time
+
+from app.services.rule_engine import RuleEngine, compile_rule
+
+
+EVENT_TYPES = ["app", "keyboard", "browser", "usb", "file", "network", "clipboard", "print"]
+
+NAIVE_OPS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "in": lambda actual, values: actual in values,
+}
+
+
+def random_rules(count: int, apps: list, rng: random.Random) -> list:
+    """Rules mixing event type, app, score and count-window conditions."""
+    rules = []
+    for i in range(count):
+        conditions = []
+        roll = rng.random()
+        if roll < 0.6:
+            conditions.append({"field": "app_name", "op": "==", "value": rng.choice(apps)})
+        elif roll < 0.8:
+            conditions.append({"field": "app_name", "op": "in", "value": rng.sample(apps, 3)})
+        if rng.random() < 0.7:
+            conditions.append({"field": "risk_score", "op": ">=", "value": round(rng.uniform(2, 9.5), 1)})
+        if rng.random() < 0.2:
+            conditions.append({"field": "risk_level", "op": "!=", "value": "low"})
+        if rng.random() < 0.1:
+            conditions.append({"field": "count", "op": ">=", "value": rng.randint(2, 10), "window_seconds": 300})
+        rules.append({
+            "name": f"rule-{i}",
+            "event_type": rng.choice(EVENT_TYPES) if rng.random() < 0.8 else None,
+            "conditions": conditions,
+            "severity": rng.choice(["low", "medium", "high", "critical"]),
+        })
+    return rules
+
+
+def random_events(count: int, apps: list, rng: random.Random) -> list:
+    """Events shaped like rule_engine.build_event output."""
+    events = []
+    for _ in range(count):
+        score = round(min(rng.expovariate(0.5), 10.0), 2)
+        events.append({
+            "event_type": rng.choice(EVENT_TYPES),
+            "app_name": rng.choice(apps),
+            "risk_level": "low" if score < 3 else "medium" if score < 6 else "high",
+            "user_id": f"pc-{rng.randint(1, 200)}",
+            "risk_score": score,
+        })
+    return events
+
+
+def naive_evaluate(rules: list, event: dict) -> int:
+    """Interpret every rule's conditions against the event (no compilation or index)."""
+    matched = 0
+    for rule in rules:
+        if rule["event_type"] is not None and rule["event_type"] != event["event_type"]:
+            continue
+        ok = True
+        for condition in rule["conditions"]:
+            if condition["field"] == "count":
+                continue
+            if not NAIVE_OPS[condition["op"]](event[condition["field"]], condition["value"]):
+                ok = False
+                break
+        matched += ok
+    return matched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Alert rule engine benchmark")
+    parser.add_argument("--rules", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--apps", type=int, default=300, help="Distinct application names")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    
+    rng = random.Random(args.seed)
+    apps = [f"app{i}.exe" for i in range(args.apps)]
+    definitions = random_rules(args.rules, apps, rng)
+    events = random_events(args.events, apps, rng)
+    
+    started = time.perf_counter()
+    engine = RuleEngine()
+    engine.load(compile_rule(definition, "benchmark") for definition in definitions)
+    compile_ms = (time.perf_counter() - started) * 1000
+    
+    started = time.perf_counter()
+    matches = 0
+    for number, event in enumerate(events):
+        matches += len(engine.evaluate(event, agent_id=number % 200))
+    elapsed = time.perf_counter() - started
+    print(f"compiled: {args.rules} rules compiled in {compile_ms:.1f}ms; "
+          f"{args.events:,} events in {elapsed:.3f}s "
+          f"({elapsed / args.events * 1e6:.2f} us/event, {matches:,} matches)")
+          
+    sample = events[:max(args.events // 20, 1)]
+    started = time.perf_counter()
+    for event in sample:
+        naive_evaluate(definitions, event)
+    naive_elapsed = time.perf_counter() - started
+    print(f"naive:    {len(sample):,} events in {naive_elapsed:.3f}s "
+          f"({naive_elapsed / len(sample) * 1e6:.2f} us/event)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+# benchmarks/suite.py
+# End-to-end benchmark scenarios over a seeded dataset, with a JSON baseline
+#
+# Usage (from backend/):
+#   python -m benchmarks.suite                                # seed a temporary 1M-row database
+#   python -m benchmarks.suite --db /tmp/kopu-bench.db        # reuse (or seed) a database file
+#   python -m benchmarks.suite --activities 20000000 --output results.json
+#   python -m benchmarks.suite --save-baseline                # record benchmarks/baseline.json
+#
+# Exits with status 1 when a scenario regresses past its threshold.
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Allowed slowdown of a scenario's median before it counts as a regression,
+# and the absolute slack that keeps sub-millisecond jitter from failing a run
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA_MS = 1.0
+
+# Settings for a quiet, comparable run; anything already set in the
+# environment wins. The response cache is off so scenarios measure the work
+# behind each endpoint rather than cache hits.
+BENCH_ENVIRONMENT = {
+    "DEBUG": "false",
+    "RESPONSE_CACHE_ENABLED": "false",
+    "INGEST_RATE_LIMIT_ENABLED": "false",
+    "RETENTION_ENABLED": "false",
+    "AGENT_OFFLINE_ENABLED": "false",
+    "QUERY_SLOW_MS": "1000000",
+}
+
+
+class Scenario:
+    """A named request (or request mix) timed ``repeats`` times."""
+    
+    def __init__(self, name: str, run: Callable[[], None], repeats: int = 20, warmup: int = 2):
+        self.name = name
+        self.run = run
+        self.repeats = repeats
+        self.warmup = warmup
+        
+    def measure(self, scale: float = 1.0) -> dict:
+        """Run the scenario and return latency percentiles in milliseconds."""
+        for _ in range(self.warmup):
+            self.run()
+        samples = []
+        for _ in range(max(int(self.repeats * scale), 3)):
+            started = time.perf_counter()
+            self.run()
+            samples.append((time.perf_counter() - started) * 1000)
+        samples.sort()
+        return {
+            "runs": len(samples),
+            "min_ms": round(samples[0], 3),
+            "p50_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(samples[min(int(len(samples) * 0.95), len(samples) - 1)], 3),
+            "mean_ms": round(statistics.fmean(samples), 3),
+        }
+
+
+def _check(response, expected: int = 200):
+    if response.status_code != expected:
+        raise RuntimeError(f"{response.request.method} {response.request.url} -> "
+                           f"{response.status_code}: {response.text[:200]}")
+    return response
+
+
+def build_scenarios(client, dataset: dict) -> List[Scenario]:
+    """Ingest, stats, listing, search and export scenarios against ``client``."""
+    get = lambda path: lambda: _check(client.get(path))
+    agents = min(dataset["agents"], 200)
+    counter = {"n": 0}
+    
+    # Ingest as the seeded agents (matched by name), spread over many of them
+    def ingest(score: float) -> Callable[[], None]:
+        def run():
+            counter["n"] += 1
+            agent = counter["n"] % agents
+            _check(client.post(
+                "/api/activity/log",
+                json={
+                    "userId": f"bench-agent-{agent:05d}",
+                    "appName": "chrome.exe",
+                    "eventType": "app",
+                    "riskScore": score,
+                },
+                headers={"X-API-Key": f"bench-key-{agent:05d}"}
+            ), 201)
+        return run
+        
+    # Export the last seeded day so the scenario is the same size on every run
+    end = datetime.fromisoformat(dataset["end"])
+    window = f"start={(end - timedelta(days=1)).isoformat()}&end={end.isoformat()}"
+    
+    def export(query: str) -> Callable[[], None]:
+        def run():
+            with client.stream("GET", f"/api/activity/export?{window}&{query}") as response:
+                _check(response)
+                for _ in response.iter_bytes():
+                    pass
+        return run
+        
+    return [
+        Scenario("ingest.low_risk", ingest(1.5), repeats=200),
+        Scenario("ingest.high_risk", ingest(8.5), repeats=200),
+        Scenario("stats.activity_24h", get("/api/activity/stats?hours=24")),
+        Scenario("stats.activity_7d", get("/api/activity/stats?hours=168")),
+        Scenario("stats.activity_percentiles", get("/api/activity/stats?hours=24&percentiles=50,95,99"), repeats=5),
+        Scenario("stats.alerts", get("/api/alerts/stats")),
+        Scenario("stats.dashboard_summary", get("/api/dashboard/summary")),
+        Scenario("stats.timeseries_1h_7d", get("/api/activity/timeseries?bucket=1h&hours=168&group_by=risk_level")),
+        Scenario("stats.agent_trends", get("/api/agents/trends?limit=20"), repeats=3, warmup=1),
+        Scenario("list.activity_first_page", get("/api/activity/?limit=100")),
+        Scenario("list.activity_deep_page", get("/api/activity/?skip=100000&limit=100")),
+        Scenario("list.activity_high_risk", get("/api/activity/?risk_level=high&limit=100")),
+        Scenario("list.alerts", get("/api/alerts/?limit=100")),
+        Scenario("list.alerts_active", get("/api/alerts/active")),
+        Scenario("list.agents", get("/api/agents/")),
+        Scenario("search.rare_term", get("/api/activity/search?q=suspicious&limit=50")),
+        Scenario("search.rare_term_filtered", get(f"/api/activity/search?q=suspicious&risk_level=high,critical&{window}")),
+        Scenario("search.common_term_recent", get("/api/activity/search?q=chrome&order=recent&limit=50")),
+        Scenario("search.common_term_ranked", get("/api/activity/search?q=chrome&limit=50"), repeats=3, warmup=1),
+        Scenario("export.ndjson_1d", export("format=ndjson"), repeats=3, warmup=1),
+        Scenario("export.csv_gzip_1d", export("format=csv&gzip=true"), repeats=3, warmup=1),
+    ]
+
+
+def describe_database(path: str) -> Optional[dict]:
+    """
+    Dataset description of a seeded SQLite file, or None if it has no data.
+    
+    Reads the sidecar written by the seeder. Without one (a database seeded
+    some other way) the shape is read from the tables.
+    """
+    if not os.path.exists(path):
+        return None
+    sidecar = path + ".dataset.json"  # written by benchmarks.seed
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            return json.load(f)
+    conn = sqlite3.connect(path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if "activity_logs" not in tables:
+            return None
+        activities, end = conn.execute("SELECT count(*), max(timestamp) FROM activity_logs").fetchone()
+        if not activities:
+            return None
+        return {
+            "activities": activities,
+            "alerts": conn.execute("SELECT count(*) FROM alerts").fetchone()[0],
+            "agents": conn.execute("SELECT count(*) FROM agents").fetchone()[0],
+            "end": datetime.fromisoformat(end).replace(minute=0, second=0, microsecond=0).isoformat(),
+        }
+    finally:
+        conn.close()
+
+
+def compare(results: dict, baseline: dict) -> List[str]:
+    """
+    Return a line per scenario whose median regressed past its threshold.
+    
+    A scenario regresses when its p50 exceeds the baseline p50 by more
+    than ``thresholds[name]`` (default ``default_threshold``) and by more
+    than ``min_delta_ms``.
+    """
+    thresholds = baseline.get("thresholds", {})
+    default = baseline.get("default_threshold", DEFAULT_THRESHOLD)
+    min_delta = baseline.get("min_delta_ms", DEFAULT_MIN_DELTA_MS)
+    failures = []
+    for name, previous in baseline.get("scenarios", {}).items():
+        current = results["scenarios"].get(name)
+        if current is None:
+            continue
+        limit = previous["p50_ms"] * (1 + thresholds.get(name, default))
+        if current["p50_ms"] > limit and current["p50_ms"] - previous["p50_ms"] > min_delta:
+            failures.append(
+                f"{name}: p50 {current['p50_ms']:.2f}ms vs baseline {previous['p50_ms']:.2f}ms "
+                f"(+{(current['p50_ms'] / previous['p50_ms'] - 1) * 100:.0f}%, "
+                f"allowed +{thresholds.get(name, default) * 100:.0f}%)"
+            )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend benchmark suite")
+    parser.add_argument("--db", help="SQLite database to use; seeded first if empty (default: temporary)")
+    parser.add_argument("--activities", type=int, default=1_000_000, help="Rows to seed into an empty database")
+    parser.add_argument("--agents", type=int, default=500)
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply every scenario's repeat count")
+    parser.add_argument("--only", help="Comma-separated scenario name prefixes to run (e.g. stats,list)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--output", help="Also write results to this JSON file")
+    args = parser.parse_args()
+    
+    path = os.path.abspath(args.db) if args.db else os.path.join(tempfile.mkdtemp(), "bench.db")
+    for key, value in BENCH_ENVIRONMENT.items():
+        os.environ.setdefault(key, value)
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    
+    # The app reads DATABASE_URL at import, so import it (and the seeder) only now
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from benchmarks.seed import seed_database, write_dataset_file
+    
+    dataset = describe_database(path)
+    if dataset is None:
+        print(f"Seeding {args.activities:,} activities into {path}")
+        dataset = seed_database(os.environ["DATABASE_URL"], args.activities, agents=args.agents)
+        write_dataset_file(path, dataset)
+    age = datetime.utcnow() - datetime.fromisoformat(dataset["end"])
+    if age > timedelta(hours=2):
+        print(f"warning: dataset ends {age} ago; time-windowed stats will see less data than a fresh seed")
+        
+    started = time.perf_counter()
+    with TestClient(app) as client:
+        startup_ms = (time.perf_counter() - started) * 1000
+        token = _check(client.post("/api/auth/token", data={"username": "admin", "password": "admin123"}))
+        client.headers["Authorization"] = f"Bearer {token.json()['access_token']}"
+        
+        scenarios = build_scenarios(client, dataset)
+        if args.only:
+            prefixes = tuple(prefix.strip() for prefix in args.only.split(","))
+            scenarios = [scenario for scenario in scenarios if scenario.name.startswith(prefixes)]
+            
+        results = {
+            "dataset": {key: dataset[key] for key in ("activities", "alerts", "agents")},
+            "environment": {
+                "python": platform.python_version(),
+                "sqlite": sqlite3.sqlite_version,
+                "machine": platform.machine(),
+                "cpus": os.cpu_count(),
+                "recorded_at": datetime.utcnow().replace(microsecond=0).isoformat(),
+            },
+            "startup_ms": round(startup_ms, 1),
+            "scenarios": {},
+        }
+        # Read scenarios run before ingest so they see the seeded data only
+        for scenario in sorted(scenarios, key=lambda s: s.name.startswith("ingest")):
+            results["scenarios"][scenario.name] = measured = scenario.measure(args.scale)
+            print(f"{scenario.name:30s} p50 {measured['p50_ms']:9.2f}ms  p95 {measured['p95_ms']:9.2f}ms  "
+                  f"({measured['runs']} runs)")
+                  
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+            
+    if args.save_baseline:
+        previous = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                previous = json.load(f)
+        results["default_threshold"] = previous.get("default_threshold", DEFAULT_THRESHOLD)
+        results["min_delta_ms"] = previous.get("min_delta_ms", DEFAULT_MIN_DELTA_MS)
+        results["thresholds"] = previous.get("thresholds", {})
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+        
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (run with --save-baseline)")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("dataset") != results["dataset"]:
+        print(f"Baseline was recorded on a different dataset ({baseline.get('dataset')}); not comparing")
+        return
+    failures = compare(results, baseline)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+# tests/conftest.py
+# Test app on a throwaway SQLite database, with an admin-authenticated client
+
+import os
+import tempfile
+
+import pytest
+
+# Settings are read at import, so the database is chosen before the app loads
+_data_dir = tempfile.mkdtemp(prefix="kopu-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_data_dir}/test.db"
+os.environ["DEBUG"] = "false"
+# Cached responses would hide the statements the budgets are about
+os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+@pytest.fixture(scope="session")
+def client():
+    """TestClient logged in as the default admin user."""
+    with TestClient(app) as test_client:
+        response = test_client.post("/api/auth/token", data={"username": "admin", "password": "admin123"})
+        test_client.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+        yield test_client
@@ -0,0 +1,51 @@
+# tests/test_anomaly_detector.py
+# Streaming per-agent risk anomaly detection
+
+import math
+
+from app.core.config import settings
+from app.services.risk_service import AnomalyDetector
+
+
+def warm_up(detector: AnomalyDetector, agent_id: int, samples: int = None) -> None:
+    """Feed a steady baseline around 2.0."""
+    for n in range(samples or settings.ANOMALY_MIN_SAMPLES):
+        assert detector.observe(agent_id, 2.0 + (0.2 if n % 2 else -0.2), now=0.0) is None
+
+
+def test_a_spike_above_the_baseline_is_flagged_once_per_cooldown():
+    detector = AnomalyDetector()
+    warm_up(detector, 1)
+    warm_up(detector, 2)
+    
+    anomaly = detector.observe(1, 9.0, now=1.0)
+    assert anomaly is not None
+    assert anomaly["agent_id"] == 1
+    assert anomaly["zscore"] >= settings.ANOMALY_ZSCORE_THRESHOLD
+    assert detector.observe(1, 9.5, now=2.0) is None
+    # The cooldown is per agent
+    assert detector.observe(2, 9.0, now=2.0) is not None
+    assert detector.anomalies == 2
+
+
+def test_no_anomalies_before_enough_samples():
+    detector = AnomalyDetector()
+    warm_up(detector, 1, samples=settings.ANOMALY_MIN_SAMPLES - 1)
+    assert detector.observe(1, 9.0, now=1.0) is None
+
+
+def test_non_finite_scores_leave_the_state_untouched():
+    detector = AnomalyDetector()
+    warm_up(detector, 1)
+    before = detector.get_state(1)
+    for score in (math.inf, -math.inf, math.nan):
+        assert detector.observe(1, score) is None
+    assert detector.get_state(1) == before
+
+
+def test_ingest_rejects_non_finite_scores(client):
+    for score in ("Infinity", "-Infinity", "NaN"):
+        response = client.post("/api/activity/log", json={
+            "userId": "nan-agent", "appName": "x.exe", "eventType": "app", "riskScore": score,
+        })
+        assert response.status_code == 422, score
@@ -0,0 +1,30 @@
+# tests/test_auth.py
+# Login throttling counts wrong passwords, not server-side failures
+
+from fastapi import HTTPException
+
+from app.core.hashing import login_throttle, password_hasher
+
+
+def login(client, username: str, password: str):
+    return client.post("/api/auth/token", data={"username": username, "password": password})
+
+
+def test_wrong_passwords_lock_the_user_out(client):
+    for _ in range(login_throttle.max_failures):
+        assert login(client, "nobody", "wrong").status_code == 401
+    response = login(client, "nobody", "wrong")
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+
+def test_overloaded_hasher_is_not_a_failed_attempt(client, monkeypatch):
+    async def overloaded(password, hashed):
+        raise HTTPException(status_code=503, detail="Password hashing is overloaded")
+        
+    monkeypatch.setattr(password_hasher, "verify_and_update", overloaded)
+    for _ in range(login_throttle.max_failures + 2):
+        assert login(client, "admin", "admin123").status_code == 503
+    monkeypatch.undo()
+    
+    assert login(client, "admin", "admin123").status_code == 200
@@ -0,0 +1,65 @@
+# tests/test_query_budgets.py
+# Routes stay within the statement counts declared with @query_budget
+
+from itertools import count
+
+import pytest
+
+from app.core.profiler import capture_queries
+from app.main import app
+
+_agents = count()
+
+
+def budget(method: str, path: str) -> int:
+    """The @query_budget of the route serving ``method path``."""
+    for route in app.routes:
+        if getattr(route, "path", None) == path and method in getattr(route, "methods", ()):
+            return route.endpoint.__query_budget__
+    raise LookupError(f"no route for {method} {path}")
+
+
+def agent_activity(**overrides) -> dict:
+    """Agent ingest payload for a new agent, app and event type."""
+    n = next(_agents)
+    activity = {
+        "userId": f"budget-agent-{n}",
+        "appName": f"budget-app-{n}.exe",
+        "eventType": f"budget-event-{n}",
+        "riskScore": 80.0,
+    }
+    activity.update(overrides)
+    return activity
+
+
+def test_ingest_first_seen_within_budget(client):
+    # New agent and API key, first-seen lookup strings, high-risk alerting
+    with capture_queries() as profile:
+        response = client.post("/api/activity/log", json=agent_activity(), headers={"X-API-Key": "budget-key-new"})
+    assert response.status_code == 201, response.text
+    assert profile.count <= budget("POST", "/api/activity/log"), profile.statements
+
+
+def test_ingest_known_agent_within_budget(client):
+    activity = agent_activity()
+    headers = {"X-API-Key": "budget-key-known"}
+    assert client.post("/api/activity/log", json=activity, headers=headers).status_code == 201
+    with capture_queries() as profile:
+        response = client.post("/api/activity/log", json=activity, headers=headers)
+    assert response.status_code == 201, response.text
+    assert profile.count <= budget("POST", "/api/activity/log"), profile.statements
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/api/activity/", {"limit": 50}),
+    ("/api/activity/stats", {}),
+    ("/api/activity/stats", {"percentiles": "50,95,99"}),
+    ("/api/dashboard/summary", {}),
+])
+def test_reads_within_budget(client, path, params):
+    for _ in range(3):
+        client.post("/api/activity/log", json=agent_activity(riskScore=20.0))
+    with capture_queries() as profile:
+        response = client.get(path, params=params)
+    assert response.status_code == 200, response.text
+    assert profile.count <= budget("GET", path), profile.statements
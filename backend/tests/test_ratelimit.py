@@ -0,0 +1,48 @@
+# tests/test_ratelimit.py
+# Ingest token buckets: all-or-nothing charges and 429 responses
+
+from app.core.ratelimit import MAX_RETRY_AFTER_SECONDS, TokenBucketLimiter, acquire_all, retry_after_header
+
+
+def test_a_rejected_request_costs_nothing_in_the_other_limiter():
+    agents = TokenBucketLimiter(rate=1.0, burst=1)
+    keys = TokenBucketLimiter(rate=1.0, burst=5)
+    charges = [(agents, ["agent:a"]), (keys, ["key:k"])]
+    
+    assert acquire_all(charges, now=0.0) == 0.0
+    assert acquire_all(charges, now=0.0) > 0
+    assert keys._buckets["key:k"][0] == 4.0
+    assert (agents.allowed, agents.limited, keys.limited) == (1, 1, 0)
+
+
+def test_buckets_refill_at_the_configured_rate():
+    limiter = TokenBucketLimiter(rate=2.0, burst=1)
+    assert limiter.acquire(["a"], now=0.0) == 0.0
+    assert limiter.acquire(["a"], now=0.1) == 0.4
+    assert limiter.acquire(["a"], now=0.5) == 0.0
+
+
+def test_rejected_requests_do_not_store_buckets():
+    agents = TokenBucketLimiter(rate=1.0, burst=1, max_keys=3)
+    address = TokenBucketLimiter(rate=0.0, burst=1)
+    assert acquire_all([(agents, ["agent:real"]), (address, ["ip:1"])], now=0.0) == 0.0
+    for n in range(10):
+        assert acquire_all([(agents, [f"agent:fake-{n}"]), (address, ["ip:1"])], now=1.0) > 0
+    assert list(agents._buckets) == ["agent:real"]
+
+
+def test_retry_after_is_clamped_for_limiters_that_never_refill():
+    assert retry_after_header(0.2) == {"Retry-After": "1"}
+    assert retry_after_header(float("inf")) == {"Retry-After": str(MAX_RETRY_AFTER_SECONDS)}
+
+
+def test_ingest_over_the_agent_limit_gets_429(client, monkeypatch):
+    monkeypatch.setattr("app.routes.activity.ingest_limiter", TokenBucketLimiter(rate=0.0, burst=2))
+    activity = {"userId": "limited-agent", "appName": "x.exe", "eventType": "app", "riskScore": 1.0}
+    headers = {"X-API-Key": "limited-key"}
+    
+    assert client.post("/api/activity/log", json=activity, headers=headers).status_code == 201
+    assert client.post("/api/activity/log", json=activity, headers=headers).status_code == 201
+    response = client.post("/api/activity/log", json=activity, headers=headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(MAX_RETRY_AFTER_SECONDS)
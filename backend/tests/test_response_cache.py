@@ -0,0 +1,76 @@
+# tests/test_response_cache.py
+# Response cache: ETag revalidation, write invalidation and coalesced misses
+
+import threading
+import time
+
+from app.core.cache import ResponseCache
+from app.core.config import settings
+
+
+def test_etag_revalidates_until_a_write_bumps_the_topic(client, monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", True)
+    
+    first = client.get("/api/activity/stats")
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    
+    cached = client.get("/api/activity/stats", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.headers["ETag"] == etag
+    
+    client.post("/api/activity/log", json={
+        "userId": "cache-agent", "appName": "cache.exe", "eventType": "app", "riskScore": 2.0,
+    })
+    fresh = client.get("/api/activity/stats", headers={"If-None-Match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["ETag"] != etag
+
+
+def test_concurrent_misses_compute_once():
+    cache = ResponseCache(max_entries=10)
+    computing = threading.Event()
+    release = threading.Event()
+    calls = []
+    
+    def compute():
+        calls.append(1)
+        computing.set()
+        release.wait(5)
+        return b'{"ok": true}'
+        
+    results = []
+    
+    def worker():
+        results.append(cache.get_or_compute("key", 60, compute))
+        
+    leader = threading.Thread(target=worker)
+    leader.start()
+    assert computing.wait(5)
+    followers = [threading.Thread(target=worker) for _ in range(7)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+        
+    assert len(calls) == 1
+    assert len(results) == 8
+    assert len({entry.etag for entry in results}) == 1
+    assert cache.misses == 1
+    assert cache.coalesced + cache.hits == 7
+
+
+def test_a_failed_computation_is_not_cached():
+    cache = ResponseCache(max_entries=10)
+    
+    def fail():
+        raise RuntimeError("database unavailable")
+        
+    try:
+        cache.get_or_compute("key", 60, fail)
+    except RuntimeError:
+        pass
+    entry = cache.get_or_compute("key", 60, lambda: b"[]")
+    assert entry.body == b"[]"
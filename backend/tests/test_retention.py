@@ -0,0 +1,53 @@
+# tests/test_retention.py
+# Retention archives old activity logs to files and reads them back
+
+from datetime import datetime, timedelta
+
+from app.core.database import SessionLocal
+from app.models.activity_log import ActivityLog
+from app.models.activity_rollup import ActivityRollup
+from app.services.retention_service import archive_and_purge, list_archive_partitions, query_archive
+from app.services.rollup_service import record_activity
+
+
+def test_archive_round_trip(client, tmp_path):
+    start = datetime(2020, 6, 1, 23, 30)
+    db = SessionLocal()
+    try:
+        rows = [
+            ActivityLog(
+                agent_id=None,
+                user_id="archived-user",
+                activity_type="app",
+                app_name=f"archived{n}.exe",
+                description="kept" if n == 0 else None,
+                risk_level=("low", "high")[n % 2],
+                risk_score=float(n),
+                timestamp=start + timedelta(minutes=20 * n),
+            )
+            for n in range(5)
+        ]
+        db.add_all(rows)
+        db.flush()
+        for row in rows:
+            record_activity(db, row)
+        db.commit()
+        ids = [row.id for row in rows]
+        
+        cutoff = datetime(2020, 6, 3)
+        assert archive_and_purge(db, cutoff, str(tmp_path), chunk_size=2) == 5
+        assert db.query(ActivityLog).filter(ActivityLog.id.in_(ids)).count() == 0
+        assert db.query(ActivityRollup).filter(ActivityRollup.bucket_start < cutoff).count() == 0
+    finally:
+        db.close()
+        
+    assert [p["date"] for p in list_archive_partitions(str(tmp_path))] == ["2020-06-01", "2020-06-02"]
+    archived = query_archive(start, cutoff, archive_dir=str(tmp_path))
+    assert [row["id"] for row in archived] == ids
+    assert archived[0]["description"] == "kept"
+    assert archived[1]["description"] == "Activity in archived1.exe"
+    assert [row["risk_level"] for row in archived] == ["low", "high", "low", "high", "low"]
+    assert archived[3]["timestamp"] == start + timedelta(minutes=60)
+    
+    high = query_archive(start, cutoff, risk_level="high", archive_dir=str(tmp_path))
+    assert [row["id"] for row in high] == [ids[1], ids[3]]
@@ -0,0 +1,64 @@
+# tests/test_risk_level.py
+# Risk levels are stored as SMALLINT codes and read back as names
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import StatementError
+
+from app.core.database import SessionLocal
+from app.models.activity_log import ActivityLog, RISK_LEVEL_CODES
+
+
+@pytest.fixture
+def db(client):
+    """A session on the app's database (the client fixture creates the tables)."""
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def test_names_round_trip_through_codes(db):
+    row = ActivityLog(activity_type="app", risk_level="high", risk_score=7.0)
+    db.add(row)
+    db.commit()
+    stored = db.execute(text("SELECT risk_level FROM activity_logs WHERE id = :id"), {"id": row.id}).scalar()
+    assert stored == RISK_LEVEL_CODES["high"]
+    db.expire_all()
+    assert db.get(ActivityLog, row.id).risk_level == "high"
+    assert db.query(ActivityLog).filter(ActivityLog.id == row.id, ActivityLog.risk_level == "high").count() == 1
+    db.delete(row)
+    db.commit()
+
+
+def test_unknown_names_match_nothing_in_filters(db):
+    assert db.query(ActivityLog).filter(ActivityLog.risk_level == "severe").count() == 0
+    assert db.query(ActivityLog).filter(ActivityLog.risk_level.in_(["severe"])).count() == 0
+
+
+def test_unknown_names_are_not_written(db):
+    db.add(ActivityLog(activity_type="app", risk_level="severe", risk_score=1.0))
+    with pytest.raises(StatementError, match="risk_level must be one of"):
+        db.flush()
+
+
+def test_unknown_codes_read_back_as_none(client, db):
+    row = ActivityLog(activity_type="app", risk_level="low", risk_score=1.0)
+    db.add(row)
+    db.commit()
+    try:
+        db.execute(text("UPDATE activity_logs SET risk_level = 9 WHERE id = :id"), {"id": row.id})
+        db.commit()
+        db.expire_all()
+        assert db.get(ActivityLog, row.id).risk_level is None
+        response = client.get(f"/api/activity/{row.id}")
+        assert response.status_code == 200, response.text
+        assert response.json()["risk_level"] is None
+    finally:
+        db.execute(text("DELETE FROM activity_logs WHERE id = :id"), {"id": row.id})
+        db.commit()
+
+
+def test_the_api_rejects_unknown_levels(client):
+    response = client.post("/api/activity/", json={"activity_type": "app", "risk_level": "severe"})
+    assert response.status_code == 422
@@ -0,0 +1,92 @@
+# tests/test_rollups.py
+# Rollup buckets agree with the raw activity logs they summarize
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from app.core.database import SessionLocal
+from app.models.activity_log import ActivityLog
+from app.models.activity_rollup import ActivityRollup
+from app.services.rollup_service import backfill_rollups, discard_rollups_before, floor_bucket, record_activity
+
+
+def rollup_rows(db) -> set:
+    return set(db.execute(select(
+        ActivityRollup.granularity,
+        ActivityRollup.bucket_start,
+        ActivityRollup.agent_id,
+        ActivityRollup.risk_level,
+        ActivityRollup.activity_count,
+        func.round(ActivityRollup.risk_score_sum, 6),
+    )).all())
+
+
+def test_stats_count_matches_raw_rows_after_ingest(client):
+    for score in (1.0, 4.5, 7.0, 9.0):
+        response = client.post("/api/activity/log", json={
+            "userId": "rollup-agent", "appName": "rollup.exe", "eventType": "app", "riskScore": score,
+        })
+        assert response.status_code == 201, response.text
+        
+    db = SessionLocal()
+    try:
+        since = datetime.utcnow() - timedelta(hours=24)
+        raw = db.query(func.count(ActivityLog.id)).filter(ActivityLog.timestamp >= since).scalar()
+    finally:
+        db.close()
+    stats = client.get("/api/activity/stats", params={"hours": 24}).json()
+    assert stats["total_activities"] == raw
+
+
+def test_incremental_rollups_match_a_backfill(client):
+    client.post("/api/activity/log", json={
+        "userId": "rollup-agent", "appName": "rollup.exe", "eventType": "app", "riskScore": 6.5,
+    })
+    db = SessionLocal()
+    try:
+        incremental = rollup_rows(db)
+        backfill_rollups(db)
+        assert rollup_rows(db) == incremental
+    finally:
+        db.close()
+
+
+def test_discarding_before_a_cutoff_recomputes_the_boundary_bucket(client):
+    start = datetime(2019, 3, 1, 10, 0)
+    db = SessionLocal()
+    try:
+        rows = [
+            ActivityLog(agent_id=None, activity_type="app", risk_level="low", risk_score=1.0,
+                        timestamp=start + timedelta(minutes=minutes))
+            for minutes in (5, 20, 40)
+        ]
+        db.add_all(rows)
+        db.flush()
+        for row in rows:
+            record_activity(db, row)
+        cutoff = start + timedelta(minutes=30)
+        db.delete(rows[0])
+        db.delete(rows[1])
+        db.flush()
+        discard_rollups_before(db, cutoff)
+        db.commit()
+        
+        hour = db.query(ActivityRollup).filter(
+            ActivityRollup.granularity == "hour",
+            ActivityRollup.bucket_start == floor_bucket(start, "hour"),
+        ).one()
+        assert hour.activity_count == 1
+        minutes = db.query(func.sum(ActivityRollup.activity_count)).filter(
+            ActivityRollup.granularity == "minute",
+            ActivityRollup.bucket_start < cutoff,
+            ActivityRollup.bucket_start >= start,
+        ).scalar()
+        assert not minutes
+        
+        db.delete(rows[2])
+        db.flush()
+        discard_rollups_before(db, start + timedelta(hours=1))
+        db.commit()
+    finally:
+        db.close()
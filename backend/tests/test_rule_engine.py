@@ -0,0 +1,84 @@
+# tests/test_rule_engine.py
+# Alert rule compilation errors and count-window matching
+
+import pytest
+
+from app.services.rule_engine import RuleEngine, compile_rule
+
+
+def count_rule(count: int = 3, window_seconds: float = 60.0):
+    """Rule matching ``count`` chrome.exe events from one agent within the window."""
+    return compile_rule({
+        "name": "burst",
+        "conditions": [
+            {"field": "app_name", "op": "==", "value": "chrome.exe"},
+            {"field": "count", "op": ">=", "value": count, "window_seconds": window_seconds},
+        ],
+    })
+
+
+def event(app_name: str = "chrome.exe", risk_score: float = 1.0) -> dict:
+    return {
+        "event_type": "app",
+        "app_name": app_name,
+        "risk_level": "low",
+        "user_id": None,
+        "risk_score": risk_score,
+    }
+
+
+@pytest.mark.parametrize("condition, message", [
+    ({"field": "app_name", "op": "matches", "value": "("}, "Invalid pattern"),
+    ({"field": "app_name", "op": "like", "value": "x"}, "unknown operator"),
+    ({"field": "hostname", "op": "==", "value": "x"}, "unknown field"),
+    ({"field": "count", "op": "<", "value": 3, "window_seconds": 60}, "count conditions"),
+    ({"field": "risk_score", "op": "contains", "value": 3}, "risk_score supports"),
+])
+def test_invalid_conditions_raise_value_error(condition, message):
+    with pytest.raises(ValueError, match=message):
+        compile_rule({"name": "bad", "conditions": [condition]})
+
+
+def test_invalid_pattern_is_rejected_by_the_api(client):
+    response = client.post("/api/alerts/rules", json={
+        "name": "bad-pattern",
+        "conditions": [{"field": "appName", "op": "matches", "value": "("}],
+    })
+    assert response.status_code == 400, response.text
+    assert "Invalid pattern" in response.json()["detail"]
+
+
+def test_count_window_needs_n_matches_within_the_window():
+    engine = RuleEngine()
+    engine.load([count_rule(count=3, window_seconds=60)])
+    
+    assert engine.evaluate(event(), agent_id=1, now=0) == []
+    assert engine.evaluate(event(), agent_id=1, now=10) == []
+    assert engine.evaluate(event("notepad.exe"), agent_id=1, now=15) == []
+    assert [rule.name for rule in engine.evaluate(event(), agent_id=1, now=20)] == ["burst"]
+    # The window starts over after an alert
+    assert engine.evaluate(event(), agent_id=1, now=21) == []
+    
+    # Three matches spread over more than the window do not fire
+    assert engine.evaluate(event(), agent_id=2, now=0) == []
+    assert engine.evaluate(event(), agent_id=2, now=40) == []
+    assert engine.evaluate(event(), agent_id=2, now=80) == []
+    assert engine.evaluate(event(), agent_id=2, now=100) != []
+
+
+def test_count_windows_are_kept_per_agent():
+    engine = RuleEngine()
+    engine.load([count_rule(count=2, window_seconds=60)])
+    
+    assert engine.evaluate(event(), agent_id=1, now=0) == []
+    assert engine.evaluate(event(), agent_id=2, now=1) == []
+    assert engine.evaluate(event(), agent_id=1, now=2) != []
+
+
+def test_agents_outside_the_window_are_dropped():
+    rule = count_rule(count=2, window_seconds=60)
+    for agent_id in range(1000):
+        rule.check_window(agent_id, now=float(agent_id))
+    # Only agents whose match is within 60 s of the latest one are held
+    assert len(rule._windows) == 61
+    assert rule.check_window(999, now=1000.0) is True
@@ -0,0 +1,52 @@
+# tests/test_search.py
+# Full-text activity search and its keyset pagination
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def searchable(client):
+    """Seven activities whose app name only these tests use."""
+    for n in range(7):
+        response = client.post("/api/activity/log", json={
+            "userId": f"search-agent-{n % 2}", "appName": "quokkapager.exe", "eventType": "app", "riskScore": n,
+        })
+        assert response.status_code == 201, response.text
+    return 7
+
+
+def all_pages(client, **params) -> list:
+    items, cursor = [], None
+    while True:
+        page = client.get("/api/activity/search", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert page.status_code == 200, page.text
+        body = page.json()
+        assert len(body["items"]) <= params["limit"]
+        items += body["items"]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return items
+
+
+@pytest.mark.parametrize("order", ["rank", "recent"])
+def test_pages_cover_every_match_once(client, searchable, order):
+    items = all_pages(client, q="quokka", order=order, limit=3)
+    ids = [item["id"] for item in items]
+    assert len(ids) == searchable
+    assert len(set(ids)) == searchable
+    if order == "recent":
+        assert ids == sorted(ids, reverse=True)
+    else:
+        scores = [item["score"] for item in items]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_filters_apply_to_every_page(client, searchable):
+    items = all_pages(client, q="quokkapager", order="recent", limit=2, risk_level="low")
+    assert items
+    assert {item["risk_level"] for item in items} == {"low"}
+
+
+def test_bad_cursor_and_empty_query_are_400(client, searchable):
+    assert client.get("/api/activity/search", params={"q": "quokka", "cursor": "garbage"}).status_code == 400
+    assert client.get("/api/activity/search", params={"q": "  "}).status_code == 400
@@ -4,10 +4,17 @@
  */
 
 const POLLING_INTERVAL = 10000; // 10 seconds
+const STREAM_RESYNC_INTERVAL = 60000; // 60 seconds while the event stream is connected
+const RECENT_ACTIVITY_LIMIT = 10;
+const DASHBOARD_FIELDS = 'risk_stats,recent_activity,alert_stats';
 
 // State
 let currentPage = 'dashboard';
 let pollingTimer = null;
+let eventSource = null;
+let lastActivityStats = null;
+let lastAlertStats = null;
+let recentActivities = [];
 
 // Initialize dashboard
 function initDashboard() {
@@ -29,8 +36,8 @@ function initDashboard() {
     loadAlerts();
     loadLogs();
 
-    // Start polling
-    startPolling();
+    // Subscribe to pushed updates (falls back to polling)
+    startEventStream();
 
     // Update connection status
     updateConnectionStatus(true);
@@ -85,17 +92,95 @@ function switchPage(page) {
 }
 
 // Start polling for updates
-function startPolling() {
+function startPolling(interval = POLLING_INTERVAL) {
     if (pollingTimer) {
         clearInterval(pollingTimer);
     }
     
     pollingTimer = setInterval(() => {
         if (currentPage === 'dashboard') {
+            // The summary already includes alert stats
             loadDashboardData();
+        } else {
+            loadAlertsCount();
+        }
+    }, interval);
+}
+
+// Subscribe to the server-sent event stream
+function startEventStream() {
+    // Poll until the stream is connected (or forever if unsupported)
+    startPolling();
+    
+    if (!window.EventSource) {
+        return;
+    }
+    
+    eventSource = new EventSource(
+        `${API_BASE_URL}/api/events/stream?token=${encodeURIComponent(getToken())}`
+    );
+    
+    eventSource.onopen = () => {
+        // Pushed events keep the dashboard current; only resync occasionally
+        startPolling(STREAM_RESYNC_INTERVAL);
+        updateConnectionStatus(true);
+    };
+    
+    eventSource.onerror = () => {
+        // EventSource reconnects on its own; poll in the meantime
+        startPolling();
+    };
+    
+    eventSource.addEventListener('activity', (e) => handleActivityEvent(JSON.parse(e.data)));
+    eventSource.addEventListener('alert', (e) => handleAlertEvent(JSON.parse(e.data)));
+    eventSource.addEventListener('resync', () => {
+        loadDashboardData();
+        loadAlerts();
+    });
+}
+
+// Apply a pushed activity to the recent activity table and stats
+function handleActivityEvent(event) {
+    recentActivities = [event.activity, ...recentActivities].slice(0, RECENT_ACTIVITY_LIMIT);
+    updateRecentActivity(recentActivities);
+    
+    if (lastActivityStats) {
+        const stats = lastActivityStats;
+        const delta = event.delta;
+        stats.total_activities = (stats.total_activities || 0) + delta.total_activities;
+        stats.total_risk_score = (stats.total_risk_score || 0) + (delta.risk_score || 0);
+        stats.average_risk_score = stats.total_risk_score / stats.total_activities;
+        stats.risk_distribution = stats.risk_distribution || {};
+        stats.risk_distribution[delta.risk_level] = (stats.risk_distribution[delta.risk_level] || 0) + 1;
+        updateDashboardStats(stats);
+    }
+    
+    updateLastUpdated();
+}
+
+// Apply a pushed alert change to the alert stats and list
+function handleAlertEvent(event) {
+    if (lastAlertStats) {
+        const stats = lastAlertStats;
+        const delta = event.delta;
+        stats.total = (stats.total || 0) + delta.total;
+        stats.active = (stats.active || 0) + delta.active;
+        stats.resolved = (stats.resolved || 0) + delta.resolved;
+        stats.by_severity = stats.by_severity || {};
+        stats.by_severity[delta.severity] = (stats.by_severity[delta.severity] || 0) + delta.active;
+        if (delta.previous_severity) {
+            // A repeat escalated an open alert
+            stats.by_severity[delta.previous_severity] = (stats.by_severity[delta.previous_severity] || 0) - 1;
+            stats.by_severity[delta.severity] = (stats.by_severity[delta.severity] || 0) + 1;
         }
-        loadAlertsCount();
-    }, POLLING_INTERVAL);
+        updateAlertStats(stats);
+    }
+    
+    if (currentPage === 'alerts') {
+        loadAlerts();
+    }
+    
+    updateLastUpdated();
 }
 
 // Update connection status
@@ -117,28 +202,17 @@ function updateLastUpdated() {
         `Last updated: ${now.toLocaleTimeString()}`;
 }
 
-// Load dashboard data
+// Load dashboard data (one round-trip via the summary endpoint)
 async function loadDashboardData() {
     try {
-        // Load activity stats
-        const statsResponse = await apiRequest('/api/activity/stats?hours=24');
-        if (statsResponse && statsResponse.ok) {
-            const stats = await statsResponse.json();
-            updateDashboardStats(stats);
-        }
-
-        // Load recent activities
-        const activitiesResponse = await apiRequest('/api/activity/?limit=10');
-        if (activitiesResponse && activitiesResponse.ok) {
-            const activities = await activitiesResponse.json();
-            updateRecentActivity(activities);
-        }
-
-        // Load alert stats
-        const alertStatsResponse = await apiRequest('/api/alerts/stats');
-        if (alertStatsResponse && alertStatsResponse.ok) {
-            const alertStats = await alertStatsResponse.json();
-            updateAlertStats(alertStats);
+        const response = await apiRequest(
+            `/api/dashboard/summary?fields=${DASHBOARD_FIELDS}&hours=24&activity_limit=${RECENT_ACTIVITY_LIMIT}`
+        );
+        if (response && response.ok) {
+            const summary = await response.json();
+            updateDashboardStats(summary.risk_stats);
+            updateRecentActivity(summary.recent_activity);
+            updateAlertStats(summary.alert_stats);
         }
 
         updateConnectionStatus(true);
@@ -151,6 +225,7 @@ async function loadDashboardData() {
 
 // Update dashboard stats
 function updateDashboardStats(stats) {
+    lastActivityStats = stats;
     document.getElementById('total-activities').textContent = stats.total_activities || 0;
     document.getElementById('avg-risk-score').textContent = stats.average_risk_score?.toFixed(1) || '0.0';
 
@@ -173,6 +248,7 @@ function updateDashboardStats(stats) {
 
 // Update alert stats
 function updateAlertStats(stats) {
+    lastAlertStats = stats;
     const activeAlerts = stats.active || 0;
     document.getElementById('active-alerts').textContent = activeAlerts;
     
@@ -192,6 +268,7 @@ function updateAlertStats(stats) {
 
 // Update recent activity table
 function updateRecentActivity(activities) {
+    recentActivities = activities || [];
     const tbody = document.getElementById('recent-activity-table');
     
     if (!activities || activities.length === 0) {
@@ -249,8 +326,8 @@ function updateAlertsList(alerts) {
     container.innerHTML = alerts.map(alert => `
         <div class="alert-item alert-${alert.severity}">
             <div class="alert-header">
-                <span class="alert-title">${alert.alert_type}</span>
-                <span class="alert-time">${formatDate(alert.created_at)}</span>
+                <span class="alert-title">${alert.alert_type}${alert.occurrence_count > 1 ? ` (x${alert.occurrence_count})` : ''}</span>
+                <span class="alert-time">${formatDate(alert.last_seen_at || alert.created_at)}</span>
             </div>
             <p class="alert-message">${alert.message}</p>
             <div class="alert-actions">